@@ -0,0 +1,20 @@
+import logging
+
+from alacrity.version import __version__
+
+# Library use stays silent unless the application configures logging
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def scaffold(name, answers=None, options=None):
+    """
+    Create a package without prompting or printing anything, see
+    alacrity.api.scaffold (imported on first use)
+    :param name: The name of the package (and the directory)
+    :param answers: Dictionary of answers, missing ones take their defaults
+    :param options: Dictionary of run options (root, venv_cache, ...)
+    :return: Dictionary with the per step status, timings and files written
+    """
+
+    from alacrity import api
+    return api.scaffold(name, answers, options)
@@ -0,0 +1,98 @@
+import os
+import time
+
+from alacrity import core
+from alacrity import lib
+
+
+def written_paths(path, exclude=()):
+    """
+    List the files of a generated package
+    :param path: The path of the package
+    :param exclude: Top level names to leave out besides .git (e.g. the
+                    virtualenv)
+    :return: Sorted list of paths relative to the package, / separated
+    """
+
+    skipped = set(exclude) | {'.git'}
+    paths = []
+    for root, dirs, names in os.walk(path):
+        relative_root = os.path.relpath(root, path).replace(os.sep, '/')
+        prefix = '' if relative_root == '.' else relative_root + '/'
+        if not prefix:
+            dirs[:] = [name for name in dirs if name not in skipped]
+        paths.extend(prefix + name for name in names)
+    return sorted(paths)
+
+
+def scaffold(name, answers=None, options=None):
+    """
+    Create a package without prompting or printing anything
+    :param name: The name of the package (and the directory)
+    :param answers: Dictionary of answers (version, desc, author,
+                    author_email, license, git, venv, venv_name, sphinx),
+                    missing answers take their defaults
+    :param options: Dictionary of run options, as accepted by the command
+                    line (root, venv_cache, snapshot, durability, update,
+                    ...)
+    :return: Dictionary with the package_name, path, ok, error, per step
+             status, timings in seconds and the files written
+    """
+
+    answers = dict(answers or {}, package_name=name)
+    options = dict(options or {})
+    path = os.path.abspath(core.target_path(name, options))
+
+    status = core.new_status()
+    timings = {}
+    result = {'package_name': name, 'path': path, 'ok': False,
+              'error': None, 'status': status, 'timings': timings,
+              'files': []}
+
+    # Updates leave git, venv and sphinx alone
+    updating = os.path.isdir(path) and options.get('update')
+    if os.path.exists(path) and not updating:
+        result['error'] = "A package by that name already exists"
+        return result
+
+    start = time.perf_counter()
+    with lib.quiet():
+        try:
+            core.generate(name, status, answers=answers, options=options,
+                          timings=timings)
+        except Exception as e:
+            lib.logger.exception("[!] Package {} failed".format(name))
+            result['error'] = str(e) or type(e).__name__
+    timings['total'] = time.perf_counter() - start
+
+    if os.path.isdir(path):
+        venv = [lib.ask('', answers, 'venv_name', 'venv')] \
+            if lib.ask('', answers, 'venv', 'n') == 'y' else []
+        result['files'] = written_paths(path, venv)
+
+    skipped = set(core.external_tasks) if updating else \
+        skipped_tasks(answers)
+    result['ok'] = result['error'] is None and \
+        all(done for task, done in status.items() if task not in skipped)
+    return result
+
+
+def skipped_tasks(answers):
+    """
+    List the external tasks that were never meant to run: declined, or their
+    tool is not installed
+    :param answers: Dictionary of answers of the package
+    :return: Set of status keys
+    """
+
+    from alacrity import probes
+    from alacrity import quickstart
+
+    tools = (
+        ('git_initialized', 'git', lambda: lib.find_tool('git') is not None),
+        ('venv_created', 'venv', lambda: probes.venv()['available']),
+        ('sphinx_created', 'sphinx',
+         lambda: quickstart.available() or probes.sphinx()['available']),
+    )
+    return {task for task, key, available in tools
+            if lib.ask('', answers, key, 'n') != 'y' or not available()}
@@ -0,0 +1,310 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import logging
+import os
+import sys
+from clint.textui import colored
+
+from alacrity import api
+from alacrity import core
+from alacrity import lib
+from alacrity import quickstart
+from alacrity import trace
+from alacrity import venvs
+
+
+def load_manifest(path):
+    """
+    Read the per-package answers from a JSON, JSON-lines or CSV manifest
+    :param path: The path of the manifest file
+    :return: List of answer dictionaries, one per package
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+
+    with open(path, "r", newline="") as manifest:
+        if extension == '.csv':
+            entries = list(csv.DictReader(manifest))
+        elif extension == '.jsonl':
+            entries = [json.loads(line) for line in manifest if line.strip()]
+        else:
+            entries = json.load(manifest)
+            if isinstance(entries, dict):
+                entries = entries.get('packages', [])
+
+    packages = []
+    for index, entry in enumerate(entries):
+        entry = dict(entry)
+        name = (entry.get('package_name') or entry.get('name') or '').strip()
+        if not name:
+            raise ValueError("Manifest entry {} has no "
+                             "package_name".format(index + 1))
+        entry['package_name'] = name
+        packages.append(entry)
+
+    return packages
+
+
+def run_entry(answers, options=None):
+    """
+    Generate a single package from its manifest answers
+    :param answers: Dictionary of answers for the package
+    :param options: Dictionary of run options shared by every package
+    :return: Status record of the package
+    """
+
+    package_name = answers['package_name']
+    status = core.new_status()
+    record = {'package_name': package_name, 'status': status, 'error': None,
+              'timings': {}, 'skipped': [], 'ok': False}
+
+    updating = os.path.exists(core.target_path(package_name, options))
+    if updating and not (options or {}).get('update'):
+        record['error'] = "A package by that name already exists"
+        return record
+
+    try:
+        core.generate(package_name, status, answers=answers, options=options,
+                      timings=record['timings'])
+    except Exception as e:
+        logging.exception(colored.red("[!] Package {} failed".format(
+            package_name)))
+        record['error'] = str(e)
+
+    # Declined or unavailable tools are not failures of the package
+    skipped = set(core.external_tasks) if updating else \
+        api.skipped_tasks(answers)
+    record['skipped'] = sorted(skipped)
+    record['ok'] = record['error'] is None and \
+        all(done for task, done in status.items() if task not in skipped)
+    return record
+
+
+def run_traced_entry(answers, options=None):
+    """
+    Generate a single package in a worker process, recording its spans
+    :param answers: Dictionary of answers for the package
+    :param options: Dictionary of run options shared by every package
+    :return: Status record of the package, list of its trace events
+    """
+
+    trace.enable()
+    # Forked workers inherit the events the parent recorded so far
+    trace.drain()
+    record = run_entry(answers, options)
+    return record, trace.drain()
+
+
+def failed_record(answers, error):
+    """
+    Build the status record of a package that could not be generated
+    :param answers: Dictionary of answers for the package
+    :param error: Description of the failure
+    :return: Status record of the package
+    """
+
+    return {'package_name': answers['package_name'],
+            'status': core.new_status(), 'error': error, 'timings': {},
+            'skipped': [], 'ok': False}
+
+
+def run_batch(entries, jobs=1, options=None):
+    """
+    Generate every package of a manifest, optionally across processes
+    :param entries: List of answer dictionaries, one per package
+    :param jobs: Number of worker processes to generate packages with
+    :param options: Dictionary of run options shared by every package
+    :return: List of status records in manifest order
+    """
+
+    records = [None] * len(entries)
+    pending = []
+    seen = set()
+
+    # Duplicate names would race each other across workers, reject them
+    # up front so the outcome does not depend on scheduling
+    for index, answers in enumerate(entries):
+        if answers['package_name'] in seen:
+            records[index] = failed_record(answers, "Duplicate package name "
+                                                    "in manifest")
+        else:
+            seen.add(answers['package_name'])
+            pending.append(index)
+
+    # Build the template environment once rather than in every worker
+    if (options or {}).get('venv_cache') and \
+            any(lib.ask('', entries[i], 'venv', 'n') == 'y' for i in pending):
+        try:
+            venvs.ensure_template(**venvs.settings(options))
+        except Exception:
+            logging.exception(colored.red("[!] Template environment could "
+                                          "not be built"))
+
+    # Import Sphinx once, forked workers inherit the loaded module
+    if any(lib.ask('', entries[i], 'sphinx', 'n') == 'y' for i in pending) \
+            and quickstart.available():
+        quickstart.load()
+
+    if jobs <= 1 or len(pending) <= 1:
+        for index in pending:
+            records[index] = run_entry(entries[index], options)
+        return records
+
+    # Traced workers send their events back with the status record
+    traced = trace.enabled()
+    worker = run_traced_entry if traced else run_entry
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [(index, executor.submit(worker, entries[index], options))
+                   for index in pending]
+        for index, future in futures:
+            try:
+                if traced:
+                    records[index], events = future.result()
+                    trace.merge(events)
+                else:
+                    records[index] = future.result()
+            except Exception as e:
+                # A worker died before it could report back
+                logging.exception(colored.red("[!] Worker failed"))
+                records[index] = failed_record(entries[index], str(e) or
+                                               type(e).__name__)
+
+    return records
+
+
+def report_batch(records):
+    """
+    Print a one line summary per package of a batch run
+    :param records: List of status records
+    :return: Number of packages that did not complete every task they
+    were meant to run
+    """
+
+    failures = 0
+    for record in records:
+        failed = [task for task, done in record['status'].items()
+                  if not done and task not in record['skipped']]
+        if not record['ok']:
+            failures += 1
+        if record['error']:
+            print(colored.red("[!] {} : {}".format(record['package_name'],
+                                                   record['error'])))
+        elif failed:
+            print(colored.yellow("[!] {} : failed {}".format(
+                record['package_name'], ", ".join(failed))))
+        else:
+            print(colored.green("[*] {} : created".format(
+                record['package_name'])))
+
+        if 'requirements_install' in record['timings']:
+            print("    requirements installed in {:.2f}s".format(
+                record['timings']['requirements_install']))
+    return failures
+
+
+def report_plans(entries, jobs=1, options=None):
+    """
+    Print the plan of every package of a manifest and the budget of the run
+    :param entries: List of answer dictionaries, one per package
+    :param jobs: Number of worker processes the run would use
+    :param options: Dictionary of run options shared by every package
+    :return: Number of packages that could not be planned
+    """
+
+    from alacrity import plan
+
+    failures = 0
+    total_bytes = 0
+    total_time = longest = 0.0
+    for answers in entries:
+        try:
+            result = plan.plan(answers['package_name'], answers, options)
+        except Exception as e:
+            failures += 1
+            print(colored.red("[!] {} : {}".format(answers['package_name'],
+                                                   e)))
+            continue
+
+        slow = [item['step'] for item in result['external'] if item['slow']]
+        print("[*] {} : {} files, {} bytes, ~{:.2f}s{}".format(
+            result['package_name'], len(result['files']), result['bytes'],
+            result['estimate'],
+            " (slow: {})".format(", ".join(slow)) if slow else ""))
+        total_bytes += result['bytes']
+        total_time += result['estimate']
+        longest = max(longest, result['estimate'])
+
+    # Packages are spread evenly over the workers
+    print(colored.green("[*] {} packages, {} bytes, ~{:.2f}s with {} "
+                        "job(s)".format(len(entries) - failures, total_bytes,
+                                        max(longest, total_time / jobs),
+                                        jobs)))
+    return failures
+
+
+def main(argv=None):
+    """
+    Entry point for alacrity batch <manifest>
+    :param argv: The command line arguments after the batch keyword
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(prog="alacrity batch",
+                                     description="Alacrity : Create every "
+                                                 "package listed in a "
+                                                 "manifest")
+    parser.add_argument('--debug', action='store_true', help="Display verbose "
+                                                             "debug messages")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of packages to generate in parallel")
+    core.add_options(parser)
+    parser.add_argument('--report', help="Write the status records as JSON "
+                                         "to this file")
+    parser.add_argument('manifest', help="JSON, JSON-lines or CSV file with "
+                                         "the answers of each package")
+
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.CRITICAL)
+
+    try:
+        entries = load_manifest(args.manifest)
+    except (IOError, ValueError) as e:
+        print(colored.red("[!] Could not read manifest : {}".format(e)))
+        sys.exit(1)
+
+    if args.plan:
+        if report_plans(entries, jobs=max(1, args.jobs), options=vars(args)):
+            sys.exit(1)
+        return
+
+    if args.trace:
+        trace.enable()
+
+    try:
+        records = run_batch(entries, jobs=max(1, args.jobs),
+                            options=vars(args))
+    finally:
+        if args.trace:
+            trace.export(args.trace)
+
+    from alacrity import plan
+    plan.record([record['timings'] for record in records
+                 if not record['error']], vars(args))
+
+    if args.report:
+        with open(args.report, "w") as report:
+            json.dump(records, report, indent=2)
+
+    failures = report_batch(records)
+    print(colored.green("[*] {} of {} packages created successfully.".format(
+        len(records) - failures, len(records))))
+
+    if failures:
+        sys.exit(1)
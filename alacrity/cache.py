@@ -0,0 +1,51 @@
+import contextlib
+import os
+import threading
+from os.path import join, expanduser
+
+_local = threading.local()
+
+
+def is_read_only():
+    """
+    Check whether the cache must be left untouched by the current thread
+    :return: True or False
+    """
+
+    return getattr(_local, 'read_only', False)
+
+
+@contextlib.contextmanager
+def read_only(enabled=True):
+    """
+    Resolve cache paths without creating them and skip cache writes for the
+    enclosed block in the current thread (e.g. while planning a run)
+    :param enabled: Whether to leave the cache untouched
+    :return: None
+    """
+
+    previous = is_read_only()
+    _local.read_only = enabled
+    try:
+        yield
+    finally:
+        _local.read_only = previous
+
+
+def cache_dir(*parts):
+    """
+    Resolve (and create, unless read_only() is active) a directory in the
+    per-user alacrity cache
+    :param parts: Sub-directories below the cache root
+    :return: The full path of the directory
+    """
+
+    root = os.environ.get('ALACRITY_CACHE_DIR')
+    if not root:
+        base = os.environ.get('XDG_CACHE_HOME') or expanduser('~/.cache')
+        root = join(base, 'alacrity')
+
+    path = join(root, *parts)
+    if not is_read_only():
+        os.makedirs(path, exist_ok=True)
+    return path
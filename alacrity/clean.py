@@ -0,0 +1,135 @@
+import argparse
+import logging
+import os
+import sys
+from clint.textui import colored
+
+from alacrity import core
+from alacrity import incremental
+from alacrity import lib
+
+
+def leftovers(paths):
+    """
+    List the trash directories interrupted deletions of some packages left
+    beside them. The trash of other packages is left alone, another process
+    may still be deleting it
+    :param paths: The package directories
+    :return: List of paths
+    """
+
+    found = []
+    for root in sorted({os.path.dirname(path) for path in paths}):
+        prefixes = tuple('.{}.trash-'.format(os.path.basename(path))
+                         for path in paths if os.path.dirname(path) == root)
+        try:
+            found.extend(entry.path for entry in os.scandir(root)
+                         if entry.name.startswith(prefixes))
+        except OSError:
+            pass
+    return found
+
+
+def check_name(name, path, force=False):
+    """
+    Check that a package may be removed by name
+    :param name: The name given on the command line
+    :param path: The path it resolves to
+    :param force: Whether packages alacrity did not generate may be removed
+    :return: The reason to refuse it, None when it may be removed
+    """
+
+    if name in ('.', '..') or os.path.isabs(name) or \
+            os.path.normpath(name).split(os.sep)[0] == os.pardir:
+        return "not a directory below the root"
+    if force:
+        return None
+    if not lib.valid_name(name):
+        return "not a valid package name (pass --force to remove it)"
+    if not incremental.load_manifest(path):
+        return "not generated by alacrity (pass --force to remove it)"
+    return None
+
+
+def clean(paths, workers=None):
+    """
+    Remove packages in parallel and forget their manifests
+    :param paths: The package directories
+    :param workers: Number of concurrent deletions
+    :return: List of the paths that could not be removed
+    """
+
+    failed = lib.purge(paths, workers)
+    for path in paths:
+        if path not in failed:
+            incremental.forget(path)
+    return failed
+
+
+def main(argv=None):
+    """
+    Entry point for alacrity clean
+    :param argv: The command line arguments after the clean keyword
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(prog="alacrity clean",
+                                     description="Alacrity : Remove "
+                                                 "generated packages")
+    parser.add_argument('--debug', action='store_true', help="Display verbose "
+                                                             "debug messages")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of packages removed in parallel")
+    parser.add_argument('--root', metavar='DIR',
+                        help="Directory the packages were created in "
+                             "(default: the current directory)")
+    parser.add_argument('--generated', action='store_true',
+                        help="Remove every package alacrity generated in the "
+                             "root directory")
+    parser.add_argument('--force', action='store_true',
+                        help="Also remove named directories alacrity did not "
+                             "generate")
+    parser.add_argument('package_names', nargs='*',
+                        help="Packages to remove")
+
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.CRITICAL)
+
+    if not args.package_names and not args.generated:
+        parser.error("name the packages to remove or pass --generated")
+
+    root = args.root or os.curdir
+    paths = []
+    refused = False
+    for name in args.package_names:
+        path = os.path.abspath(core.target_path(name, vars(args)))
+        reason = check_name(name, path, args.force)
+        if reason is None:
+            paths.append(path)
+        else:
+            refused = True
+            print(colored.red("[!] Not removing {} : {}".format(name,
+                                                                reason)))
+    if args.generated:
+        paths.extend(path for path in incremental.recorded(root)
+                     if path not in paths)
+
+    missing = [path for path in paths if not os.path.lexists(path)]
+    for path in missing:
+        print(colored.yellow("[!] {} does not exist".format(path)))
+    paths = [path for path in paths if path not in missing]
+
+    failed = clean(paths + leftovers(paths), args.jobs)
+    for path in failed:
+        print(colored.red("[!] {} could not be removed".format(path)))
+
+    removed = len([path for path in paths if path not in failed])
+    print(colored.green("[*] {} of {} packages removed.".format(
+        removed, len(paths))))
+
+    if failed or missing or refused:
+        sys.exit(1)
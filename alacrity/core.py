@@ -1,17 +1,267 @@
 #!/bin/python
 
-import importlib
-import logging
-import os
 import sys
-import argparse
-import shutil
-from clint.textui import colored
 
-try:
+# Heavier modules (argparse, logging, clint, alacrity.lib) are imported by
+# the functions that need them so that trivial invocations stay cheap
+
+# Status keys of the steps run in the published package, which updates skip
+external_tasks = ('git_initialized', 'venv_created', 'sphinx_created')
+
+
+def new_status():
+    """
+    Build the dictionary used to track the workflow status of a package
+    :return: Dictionary with every task marked as not done
+    """
+
+    return {
+        'structure_created': False,
+        'gitignore_created': False,
+        'setup_created': False,
+        'license_created': False,
+        'manifest_created': False,
+        'readme_created': False,
+        'requirements_created': False,
+        'tests_created': False,
+        'git_initialized': False,
+        'venv_created': False,
+        'sphinx_created': False
+    }
+
+
+def target_path(package_name, options=None):
+    """
+    Resolve where a package is created
+    :param package_name: The name of the package (and the directory)
+    :param options: Dictionary of run options (root to create packages
+                    below a directory other than the current one)
+    :return: The path of the package
+    """
+
+    import os
+
+    return os.path.join((options or {}).get('root') or '', package_name)
+
+
+def template_store(options=None):
+    """
+    Resolve the templates a package is rendered from
+    :param options: Dictionary of run options (template to select a user
+                    template set)
+    :return: TemplateStore of the selected set, None for the starters
+    """
+
+    if not (options or {}).get('template'):
+        return None
+
+    from alacrity import registry
+    return registry.default().store(options['template'])
+
+
+def generate(package_name, status, answers=None, options=None,
+             timings=None):
+    """
+    Run the package creation workflow for a single package
+    :param package_name: The name of the package (and the directory)
+    :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options shared by every package
+    :param timings: Dictionary receiving the duration of timed steps
+    :return: With the update option and an existing package, the
+             incremental.apply() summary of written, unchanged and kept
+             files (git, venv and sphinx are left alone), None otherwise
+    """
+
+    import logging
+    import os
+    import time
+    from alacrity import incremental
     from alacrity import lib
-except ImportError:
-    lib = importlib.import_module('lib', '../alacrity')
+    from alacrity import steps
+    from alacrity import templates
+    from alacrity import trace
+    from alacrity.tree import TreeWriter, fsync_directory
+
+    logger = logging.getLogger(__name__)
+
+    if timings is None:
+        timings = {}
+
+    # Files are rendered from a user template set if one is selected, the
+    # starters fill in whatever it leaves out
+    store = template_store(options)
+
+    with trace.span('generate', package=package_name), \
+            templates.use(store):
+        start = time.perf_counter()
+
+        target = target_path(package_name, options)
+        # An existing package is updated in place, file by file
+        update = bool((options or {}).get('update')) and \
+            os.path.isdir(target)
+
+        # Snapshots need every answer up front
+        use_snapshot = answers is not None and not update and \
+            (options or {}).get('snapshot')
+        if use_snapshot:
+            from alacrity import snapshots
+
+        # Files are assembled in a hidden sibling directory and published
+        # with one rename, so a failed or interrupted run never leaves a
+        # partial tree
+        staging = os.path.abspath(target) if update else \
+            lib.staging_path(target)
+        # Rendered files are buffered and written to staging in one pass
+        tree = TreeWriter((options or {}).get('durability') or 'none')
+
+        # Every answer is gathered before the steps run concurrently
+        file_steps = steps.registry.stage('files')
+        context = {'package_name': package_name, 'path': staging,
+                   'status': status, 'options': options, 'tree': tree,
+                   'timings': timings,
+                   'answers': steps.ask_questions(file_steps, answers)}
+
+        try:
+            provided = set()
+            # Keyed on the resolved answers, the author and email defaults
+            # come from the git identity at the time of the run
+            if use_snapshot and snapshots.materialize(context['answers'],
+                                                      staging, package_name,
+                                                      status):
+                # Only the steps a snapshot does not cover are run
+                logger.debug("[-] Rendering name dependent files from "
+                             "snapshot")
+                for step in file_steps:
+                    if step.snapshot:
+                        provided.update(step.provides)
+                file_steps = [step for step in file_steps
+                              if not step.snapshot]
+                use_snapshot = False
+            else:
+                logger.debug("[-] Creating package structure and starter "
+                             "files")
+
+            failures = steps.run(file_steps, context, provided=provided)
+            for step in file_steps:
+                error = failures.get(step.name)
+                if error is not None and \
+                        not isinstance(error, steps.StepSkipped):
+                    raise error
+
+            if update:
+                logger.debug("[-] Comparing {} planned files with the "
+                             "package".format(len(tree.written())))
+                result = incremental.apply(tree, staging, status)
+            else:
+                logger.debug("[-] Writing {} planned files".format(
+                    len(tree.written())))
+                if staging in tree.flush(status):
+                    status['structure_created'] = False
+                else:
+                    incremental.record(tree, staging, target)
+
+            if use_snapshot and status['structure_created']:
+                snapshots.store(context['answers'], staging, package_name,
+                                status)
+        except BaseException:
+            if not update:
+                lib.discard(staging)
+            raise
+
+        if store is not None:
+            from alacrity import registry
+            registry.default().save(store)
+
+        timings['files'] = time.perf_counter() - start
+
+        if update:
+            return result
+
+        if not status['structure_created']:
+            lib.discard(staging)
+            return
+
+        logger.debug("[-] Publishing staged package")
+        start = time.perf_counter()
+        lib.publish(staging, target)
+        if tree.durability != 'none':
+            # The rename is only durable once the parent directory is
+            fsync_directory(os.path.dirname(os.path.abspath(target)))
+        timings['publish'] = time.perf_counter() - start
+
+        # Initialize git, venv and sphinx docs concurrently if required and
+        # available
+        logger.debug("[-] Launching git, venv and sphinx init submodules")
+        try:
+            lib.run_external_steps(target, context.get('author', ''),
+                                   context.get('version', ''), status,
+                                   answers=answers, options=options,
+                                   timings=timings)
+        except KeyboardInterrupt:
+            # Roll back the published package without waiting on the delete
+            logger.debug("[-] Rolling back committed changes, deleting "
+                         "files")
+            lib.discard(target)
+            raise
+
+
+def add_options(parser):
+    """
+    Register the run options shared by single and batch package creation
+    :param parser: The argparse parser to extend
+    :return: None
+    """
+
+    parser.add_argument('--venv-cache', action='store_true',
+                        help="Clone virtual environments from a cached "
+                             "template instead of running python -m venv")
+    parser.add_argument('--venv-without-pip', action='store_true',
+                        help="Skip the ensurepip bootstrap of new virtual "
+                             "environments (ignored with --wheelhouse, which "
+                             "needs pip)")
+    parser.add_argument('--venv-copies', action='store_true',
+                        help="Copy the interpreter into new virtual "
+                             "environments instead of symlinking it")
+    parser.add_argument('--venv-system-site-packages', action='store_true',
+                        help="Give new virtual environments access to the "
+                             "global site-packages")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Reuse the rendered tree of packages generated "
+                             "with the same answers (non-interactive runs)")
+    parser.add_argument('--git-template', metavar='DIR',
+                        help="Template directory (hooks, config) passed to "
+                             "git init")
+    parser.add_argument('--git-commit', action='store_true',
+                        help="Record the generated files as the first commit "
+                             "of the new git repository")
+    parser.add_argument('--wheelhouse', metavar='DIR',
+                        help="Install requirements.txt into the new virtual "
+                             "environment from the wheels in DIR, offline")
+    parser.add_argument('--durability', choices=('none', 'tree', 'file'),
+                        default='none',
+                        help="Flush nothing (none), fsync the tree once it "
+                             "is written (tree) or every file as it is "
+                             "written (file)")
+    parser.add_argument('--template', metavar='NAME[@VERSION]',
+                        help="Render files from a user template set (see "
+                             "alacrity templates), the latest version unless "
+                             "one is given")
+    parser.add_argument('--update', action='store_true',
+                        help="Rewrite only the changed files of an existing "
+                             "package, keeping files you edited, .git and "
+                             "the virtual environment")
+    parser.add_argument('--plan', action='store_true',
+                        help="Show the files, tools and caches a run would "
+                             "use and estimate its time, without creating "
+                             "anything")
+    parser.add_argument('--root', metavar='DIR',
+                        help="Create packages below DIR instead of the "
+                             "current directory")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Record the duration of every step as Chrome "
+                             "trace JSON, or JSON-lines if FILE ends in "
+                             ".jsonl")
 
 
 def main():
@@ -20,14 +270,37 @@ def main():
     :return: None
     """
 
-    # Start the process
-    try:
-        from alacrity import version
-    except ImportError:
-        version = importlib.import_module('version', '../alacrity')
+    argv = sys.argv[1:]
+
+    # Fast path: answer --version without loading the workflow modules
+    if argv == ['--version']:
+        from alacrity.version import __version__
+        print(__version__)
+        return
+
+    # Dispatch the batch sub-command before parsing single package options
+    if argv[:1] == ['batch']:
+        from alacrity import batch
+        batch.main(argv[1:])
+        return
+
+    if argv[:1] == ['serve']:
+        from alacrity import serve
+        serve.main(argv[1:])
+        return
 
-    # Get version information from version.py
-    v = version.__version__
+    if argv[:1] == ['clean']:
+        from alacrity import clean
+        clean.main(argv[1:])
+        return
+
+    if argv[:1] == ['templates']:
+        from alacrity import registry
+        registry.main(argv[1:])
+        return
+
+    import argparse
+    from alacrity.version import __version__ as v
 
     parser = argparse.ArgumentParser(description="Alacrity : "
                                                  "Quickstart your Python "
@@ -37,9 +310,15 @@ def main():
     parser.add_argument('--debug', action='store_true', help="Display verbose "
                                                              "debug messages")
     parser.add_argument('--version', action="version", version=v)
+    add_options(parser)
     parser.add_argument('package_name')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    import logging
+    import os
+    from clint.textui import colored
+    from alacrity import lib
 
     if args.make:
         lib.rebuild_persistence()
@@ -54,20 +333,20 @@ def main():
     else:
         logging.basicConfig(level=logging.CRITICAL)
 
+    if args.plan:
+        from alacrity import plan
+        try:
+            plan.report(plan.plan(args.package_name, options=vars(args)))
+        except (KeyboardInterrupt, EOFError):
+            print(colored.yellow("\n[!] Ctrl+C : Aborting the plan."))
+        return
+
+    if args.trace:
+        from alacrity import trace
+        trace.enable()
+
     # Initialise status dictionary
-    status = {
-        'structure_created': False,
-        'gitignore_created': False,
-        'setup_created': False,
-        'license_created': False,
-        'manifest_created': False,
-        'readme_created': False,
-        'requirements_created': False,
-        'tests_created': False,
-        'git_initialized': False,
-        'venv_created': False,
-        'sphinx_created': False
-    }
+    status = new_status()
 
     try:
         try:
@@ -75,11 +354,12 @@ def main():
 
             # Check if the package already exists
             logging.debug("[-] Checking if the package already exists")
+            target = target_path(package_name, vars(args))
             check_is_file = os.path.isfile(
-                "{0}/{0}/__init__.py".format(package_name))
+                os.path.join(target, package_name, "__init__.py"))
 
-            # Check for clean_make
-            if os.path.isdir(package_name) or check_is_file:
+            # Check for clean_make, updates reuse the existing package
+            if (os.path.isdir(target) or check_is_file) and not args.update:
                 logging.debug("[-] Package already exists, "
                               "launching clean make prompt")
                 print(colored.red("[!] A package by that name already exists, "
@@ -88,8 +368,9 @@ def main():
 
                 logging.debug("[-] Choice prompt input : {}".format(choice))
                 if choice == 'y':
-                    logging.debug("[-] Removing existing package")
-                    lib.remove_package(package_name)
+                    # The existing package is replaced once the new one is
+                    # fully staged
+                    logging.debug("[-] Replacing existing package")
                 elif choice == 'n':
                     logging.debug("[-] Clean make cancelled")
                     print(colored.red("[!] Please pick a different package "
@@ -100,45 +381,46 @@ def main():
                     print(colored.red("[!] Invalid choice, aborting"))
                     sys.exit()
 
-            # Create the initial structure
-            logging.debug("[-] Creating package structure")
-            lib.create_package_structure(package_name, status)
-            # Create starter files
-            logging.debug("[-] Creating starter files in package")
-            author, version = lib.create_starter_files(package_name, status)
-            # Create tests directory
-            logging.debug("[-] Creating tests package in structure")
-            lib.create_tests_package(package_name, status)
-            # Initialize git if required and available
-            logging.debug("[-] Launching git init submodule")
-            lib.git_init(package_name, status)
-            # Initialize venv if required and available
-            logging.debug("[-] Launching venv init submodule")
-            lib.venv_init(package_name, status)
-            # Initialize sphinx docs if required and available
-            logging.debug("[-] Launching sphinx init submodule")
-            lib.sphinx_init(package_name, author, version, status)
+            timings = {}
+            result = generate(package_name, status, options=vars(args),
+                              timings=timings)
+
+            from alacrity import plan
+            plan.record([timings], vars(args))
 
             logging.debug("[-] Launching status reporter submodule")
-            lib.report_status(status)
+            if result is None:
+                lib.report_status(status)
 
-            print(colored.green("[|]"))
-            print(colored.green("[*] Package {} was created "
-                                "successfully.".format(package_name)))
+                print(colored.green("[|]"))
+                print(colored.green("[*] Package {} was created "
+                                    "successfully.".format(package_name)))
+            else:
+                lib.report_status({task: done for task, done in status.items()
+                                   if task not in external_tasks})
+                for name in result['kept']:
+                    print(colored.yellow("[!] Kept {}, it was modified since "
+                                         "it was generated".format(name)))
+
+                print(colored.green("[|]"))
+                print(colored.green("[*] Package {} was updated : {} written, "
+                                    "{} unchanged, {} kept.".format(
+                                        package_name, len(result['written']),
+                                        len(result['unchanged']),
+                                        len(result['kept']))))
         except EOFError:
             # Catch error thrown by clint.main
             print(colored.yellow("\n[!] Ctrl+C : Aborting package creation."))
             sys.exit()
     except KeyboardInterrupt:
+        # generate() has already discarded whatever it created
         print(colored.yellow("\n[!] Ctrl+C : Aborting package creation."))
 
-        # Rollback changes
-        if os.path.isdir(args.package_name):
-            logging.debug("[-] Rolling back committed changes, deleting files")
-            shutil.rmtree(args.package_name)
-
         logging.debug("[-] Alacrity is exiting")
         sys.exit()
+    finally:
+        if args.trace:
+            trace.export(args.trace)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,393 @@
+import fnmatch
+import hashlib
+import os
+import stat
+import struct
+import time
+import zlib
+from os.path import join
+
+# Written without a git process: loose objects, the branch ref and the index
+# of the initial commit of a freshly initialised repository
+
+object_formats = ('sha1', 'sha256')
+
+# Hooks git commit would run, the fast path cannot run them
+commit_hooks = ('pre-commit', 'prepare-commit-msg', 'commit-msg',
+                'post-commit')
+
+
+def read_config(git_dir):
+    """
+    Read the repository config, enough for the keys used here
+    :param git_dir: The path of the .git directory
+    :return: Dictionary of lower case section.key to value
+    """
+
+    config = {}
+    section = ''
+    try:
+        with open(join(git_dir, 'config'), "r") as obj:
+            for line in obj:
+                line = line.split('#', 1)[0].split(';', 1)[0].strip()
+                if line.startswith('['):
+                    section = line.strip('[]').split()[0].lower()
+                elif '=' in line:
+                    key, value = line.split('=', 1)
+                    config['{}.{}'.format(section, key.strip().lower())] = \
+                        value.strip().strip('"')
+    except IOError:
+        pass
+    return config
+
+
+def object_format(git_dir):
+    """
+    :param git_dir: The path of the .git directory
+    :return: The hash algorithm of the repository (sha1 or sha256)
+    """
+
+    algorithm = read_config(git_dir).get('extensions.objectformat',
+                                         'sha1').lower()
+    if algorithm not in object_formats:
+        raise ValueError("Unsupported object format {}".format(algorithm))
+    return algorithm
+
+
+def git_settings(path, git='git'):
+    """
+    Read the settings that decide whether git commit would differ from the
+    fast commit, from every config git reads (repository, global, system)
+    :param path: The path of the working tree
+    :param git: The git executable
+    :return: Dictionary of lower case core.hookspath / core.excludesfile to
+             the expanded path
+    """
+
+    import subprocess
+
+    command = [git, 'config', '--path', '--get-regexp',
+               r'^core\.(hookspath|excludesfile)$']
+    try:
+        out = subprocess.check_output(command, cwd=path,
+                                      stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        # Neither key is set
+        return {}
+
+    settings = {}
+    for line in out.decode('utf-8').splitlines():
+        key, _, value = line.partition(' ')
+        settings[key.lower()] = value
+    return settings
+
+
+def hooks(path, settings):
+    """
+    List the commit hooks installed for a repository (e.g. by --git-template
+    or a global core.hooksPath)
+    :param path: The path of the working tree
+    :param settings: Dictionary returned by git_settings()
+    :return: List of the hook names git commit would run
+    """
+
+    hooks_dir = join(path, settings.get('core.hookspath') or
+                     join('.git', 'hooks'))
+    return [name for name in commit_hooks
+            if os.access(join(hooks_dir, name), os.X_OK)]
+
+
+def has_patterns(path):
+    """
+    :param path: The path of an ignore file
+    :return: Whether the file exists and holds any pattern
+    """
+
+    try:
+        with open(path, "r") as obj:
+            return any(line.strip() and not line.startswith('#')
+                       for line in obj)
+    except (IOError, UnicodeDecodeError):
+        return False
+
+
+def ignore_sources(path, settings, exclude=()):
+    """
+    List the ignore rules git add would apply that ignore_patterns() does
+    not: .git/info/exclude, core.excludesFile, nested .gitignore files and
+    negated or ** patterns in the root .gitignore
+    :param path: The path of the working tree
+    :param settings: Dictionary returned by git_settings()
+    :param exclude: Top level names left out of the commit
+    :return: List of the paths of those ignore files
+    """
+
+    excludes_file = settings.get('core.excludesfile')
+    if excludes_file is None:
+        config_home = os.environ.get('XDG_CONFIG_HOME') or \
+            os.path.expanduser(join('~', '.config'))
+        excludes_file = join(config_home, 'git', 'ignore')
+    sources = [source for source in (join(path, '.git', 'info', 'exclude'),
+                                     join(path, excludes_file))
+               if has_patterns(source)]
+
+    root_ignore = join(path, '.gitignore')
+    try:
+        with open(root_ignore, "r") as gitignore:
+            if any(line.startswith('!') or '**' in line
+                   for line in gitignore):
+                sources.append(root_ignore)
+    except IOError:
+        pass
+
+    skipped = set(exclude) | {'.git'}
+    for root, dirs, names in os.walk(path):
+        if root == path:
+            dirs[:] = [name for name in dirs if name not in skipped]
+        elif '.gitignore' in names:
+            sources.append(join(root, '.gitignore'))
+    return sources
+
+
+def write_object(git_dir, kind, data, algorithm='sha1'):
+    """
+    Store a loose object in the repository
+    :param git_dir: The path of the .git directory
+    :param kind: The object type (blob, tree or commit)
+    :param data: The raw contents of the object
+    :param algorithm: The object format of the repository
+    :return: Hex digest of the object
+    """
+
+    raw = '{} {}\0'.format(kind, len(data)).encode('utf-8') + data
+    sha = hashlib.new(algorithm, raw).hexdigest()
+
+    directory = join(git_dir, 'objects', sha[:2])
+    path = join(directory, sha[2:])
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as obj:
+            obj.write(zlib.compress(raw, 1))
+        os.replace(temp_path, path)
+
+    return sha
+
+
+def ignore_patterns(path):
+    """
+    Read the simple patterns of the .gitignore at the root of path
+    :param path: The path of the working tree
+    :return: List of (pattern, directory_only, anchored) tuples
+    """
+
+    patterns = []
+    try:
+        with open(join(path, '.gitignore'), "r") as gitignore:
+            for line in gitignore:
+                line = line.strip()
+                if not line or line.startswith(('#', '!')):
+                    continue
+                # A slash anywhere but at the end anchors the pattern
+                patterns.append((line.strip('/'), line.endswith('/'),
+                                 '/' in line.rstrip('/')))
+    except IOError:
+        pass
+    return patterns
+
+
+def is_ignored(relative, is_dir, patterns):
+    """
+    Match a path against .gitignore patterns (no negation support)
+    :param relative: The path relative to the working tree, / separated
+    :param is_dir: Whether the path is a directory
+    :param patterns: List of (pattern, directory_only, anchored) tuples
+    :return: True or False
+    """
+
+    name = relative.rsplit('/', 1)[-1]
+    for pattern, directory_only, anchored in patterns:
+        if directory_only and not is_dir:
+            continue
+        target = relative if anchored else name
+        if fnmatch.fnmatchcase(target, pattern):
+            return True
+    return False
+
+
+def collect(path, exclude=()):
+    """
+    List the files of a working tree that belong in the initial commit
+    :param path: The path of the working tree
+    :param exclude: Top level names to leave out (e.g. the virtualenv)
+    :return: Sorted list of (relative path, full path, os.stat_result)
+    """
+
+    patterns = ignore_patterns(path)
+    skipped = set(exclude) | {'.git'}
+    files = []
+
+    for root, dirs, names in os.walk(path):
+        relative_root = os.path.relpath(root, path).replace(os.sep, '/')
+        prefix = '' if relative_root == '.' else relative_root + '/'
+
+        for directory in list(dirs):
+            relative = prefix + directory
+            if (not prefix and directory in skipped) or \
+                    is_ignored(relative, True, patterns):
+                dirs.remove(directory)
+
+        for name in names:
+            relative = prefix + name
+            full_path = join(root, name)
+            if not prefix and name in skipped:
+                continue
+            if is_ignored(relative, False, patterns):
+                continue
+            files.append((relative, full_path, os.lstat(full_path)))
+
+    files.sort(key=lambda item: item[0].encode('utf-8'))
+    return files
+
+
+def file_mode(stat_result):
+    """
+    Map a stat result to the git file mode
+    :param stat_result: The os.stat_result of the file
+    :return: The mode as an integer
+    """
+
+    if stat.S_ISLNK(stat_result.st_mode):
+        return 0o120000
+    if stat_result.st_mode & stat.S_IXUSR:
+        return 0o100755
+    return 0o100644
+
+
+def write_tree(git_dir, entries, algorithm='sha1'):
+    """
+    Store the tree objects of a list of blobs
+    :param git_dir: The path of the .git directory
+    :param entries: List of (relative path, mode, blob sha)
+    :param algorithm: The object format of the repository
+    :return: Hex digest of the root tree
+    """
+
+    root = {}
+    for relative, mode, sha in entries:
+        node = root
+        parts = relative.split('/')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = (mode, sha)
+
+    def store(node):
+        items = []
+        for name, value in node.items():
+            if isinstance(value, dict):
+                items.append((name + '/', name, 0o40000, store(value)))
+            else:
+                items.append((name, name, value[0], value[1]))
+
+        # git orders tree entries as if directory names ended with /
+        items.sort(key=lambda item: item[0].encode('utf-8'))
+        data = b''.join('{:o} {}'.format(mode, name).encode('utf-8') + b'\0' +
+                        bytes.fromhex(sha) for _, name, mode, sha in items)
+        return write_object(git_dir, 'tree', data, algorithm)
+
+    return store(root)
+
+
+def write_index(git_dir, entries, algorithm='sha1'):
+    """
+    Write the index matching the initial commit so the tree is clean
+    :param git_dir: The path of the .git directory
+    :param entries: List of (relative path, mode, blob sha, os.stat_result)
+    :param algorithm: The object format of the repository
+    :return: None
+    """
+
+    mask = 0xFFFFFFFF
+    data = [b'DIRC', struct.pack('>II', 2, len(entries))]
+
+    for relative, mode, sha, st in entries:
+        name = relative.encode('utf-8')
+        entry = struct.pack(
+            '>IIIIIIIIII',
+            int(st.st_ctime) & mask, st.st_ctime_ns % 10 ** 9,
+            int(st.st_mtime) & mask, st.st_mtime_ns % 10 ** 9,
+            st.st_dev & mask, st.st_ino & mask, mode,
+            st.st_uid & mask, st.st_gid & mask, st.st_size & mask
+        ) + bytes.fromhex(sha) + struct.pack('>H', min(len(name), 0xFFF))
+        entry += name
+        # Entries are NUL padded to a multiple of eight bytes
+        entry += b'\0' * (8 - len(entry) % 8)
+        data.append(entry)
+
+    body = b''.join(data)
+    with open(join(git_dir, 'index'), "wb") as index:
+        index.write(body + hashlib.new(algorithm, body).digest())
+
+
+def timezone_offset():
+    """
+    Format the local UTC offset the way git records it
+    :return: The offset as +HHMM or -HHMM
+    """
+
+    offset = time.localtime().tm_gmtoff
+    sign = '+' if offset >= 0 else '-'
+    offset = abs(offset) // 60
+    return '{}{:02d}{:02d}'.format(sign, offset // 60, offset % 60)
+
+
+def initial_commit(path, author, email, message="Initial commit",
+                   exclude=()):
+    """
+    Record every file of the working tree as the first commit of HEAD.
+    Hooks are not run and only the root .gitignore is read, use git commit
+    when hooks() or ignore_sources() list anything
+    :param path: The path of a freshly initialised working tree
+    :param author: The name of the author and committer
+    :param email: The email of the author and committer
+    :param message: The commit message
+    :param exclude: Top level names to leave out (e.g. the virtualenv)
+    :return: Hex digest of the commit
+    """
+
+    git_dir = join(path, '.git')
+    algorithm = object_format(git_dir)
+
+    with open(join(git_dir, 'HEAD'), "r") as head:
+        ref = head.read().strip()
+    if not ref.startswith('ref: '):
+        raise ValueError("HEAD of {} is detached".format(path))
+    ref = ref[len('ref: '):]
+
+    entries = []
+    for relative, full_path, st in collect(path, exclude):
+        mode = file_mode(st)
+        if mode == 0o120000:
+            data = os.readlink(full_path).encode('utf-8')
+        else:
+            with open(full_path, "rb") as blob:
+                data = blob.read()
+        entries.append((relative, mode,
+                        write_object(git_dir, 'blob', data, algorithm), st))
+
+    tree = write_tree(git_dir, [entry[:3] for entry in entries], algorithm)
+
+    signature = '{} <{}> {} {}'.format(author, email, int(time.time()),
+                                       timezone_offset())
+    commit = 'tree {}\nauthor {}\ncommitter {}\n\n{}\n'.format(
+        tree, signature, signature, message)
+    sha = write_object(git_dir, 'commit', commit.encode('utf-8'), algorithm)
+
+    ref_path = join(git_dir, *ref.split('/'))
+    os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+    with open(ref_path, "w") as ref_file:
+        ref_file.write(sha + '\n')
+
+    write_index(git_dir, entries, algorithm)
+
+    return sha
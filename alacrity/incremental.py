@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+
+from alacrity.cache import cache_dir
+from alacrity.trace import traced
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_path(target):
+    """
+    Locate the manifest of a generated package in the cache
+    :param target: The path of the package
+    :return: The path of its manifest
+    """
+
+    key = hashlib.sha256(os.path.abspath(target).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir('manifests'), key[:32] + '.json')
+
+
+def load_manifest(target):
+    """
+    Read the hashes of the files last generated for a package
+    :param target: The path of the package
+    :return: Dictionary of / separated relative path to sha256 hex digest
+    """
+
+    try:
+        with open(manifest_path(target), "r") as obj:
+            manifest = json.load(obj)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('files', {}) if isinstance(manifest, dict) else {}
+
+
+def save_manifest(target, hashes):
+    """
+    Record the hashes of the files generated for a package
+    :param target: The path of the package
+    :param hashes: Dictionary of relative path to sha256 hex digest
+    :return: None
+    """
+
+    path = manifest_path(target)
+    partial = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(partial, "w") as obj:
+            json.dump({'path': os.path.abspath(target), 'files': hashes}, obj,
+                      sort_keys=True)
+        os.replace(partial, path)
+    except OSError:
+        logger.debug("[-] Could not record the manifest of {}".format(
+            target), exc_info=True)
+
+
+def forget(target):
+    """
+    Delete the manifest of a removed package
+    :param target: The path of the package
+    :return: None
+    """
+
+    try:
+        os.remove(manifest_path(target))
+    except OSError:
+        pass
+
+
+def recorded(root):
+    """
+    List the generated packages directly below a directory, from their
+    manifests
+    :param root: The directory the packages were created in
+    :return: Sorted list of the package paths that still exist
+    """
+
+    root = os.path.abspath(root)
+    paths = []
+    try:
+        entries = list(os.scandir(cache_dir('manifests')))
+    except FileNotFoundError:
+        return paths
+    for entry in entries:
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, "r") as obj:
+                path = json.load(obj).get('path')
+        except (OSError, ValueError, AttributeError):
+            continue
+        if path and os.path.dirname(path) == root and os.path.isdir(path):
+            paths.append(path)
+    return sorted(paths)
+
+
+def file_digest(path):
+    """
+    Hash a file on disk
+    :param path: The path of the file
+    :return: sha256 hex digest, None if the file does not exist
+    """
+
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as obj:
+            for chunk in iter(lambda: obj.read(1 << 20), b''):
+                digest.update(chunk)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return digest.hexdigest()
+
+
+def relative(path, root):
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def record(tree, root, target):
+    """
+    Store the hashes of every file of a freshly generated package: the
+    files the tree writer planned, and those materialized from a snapshot
+    :param tree: The flushed TreeWriter
+    :param root: The directory the tree was planned in (e.g. staging)
+    :param target: The final path of the package
+    :return: None
+    """
+
+    planned = set(tree.written())
+    hashes = {relative(path, root): tree.digest(path) for path in planned}
+    for directory, dirs, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if path not in planned:
+                hashes[relative(path, root)] = file_digest(path)
+    save_manifest(target, hashes)
+
+
+def classify(tree, root):
+    """
+    Compare the planned files of a package with what is on disk
+    :param tree: TreeWriter planned with root as the package path
+    :param root: The path of the existing package
+    :return: Dictionary of planned path to (relative path, action, planned
+             digest), action being written (missing, or unchanged since it
+             was generated), unchanged or kept (modified by the user)
+    """
+
+    manifest = load_manifest(root)
+    plan = {}
+    for path in tree.written():
+        name = relative(path, root)
+        desired = tree.digest(path)
+        current = file_digest(path)
+
+        if current == desired:
+            action = 'unchanged'
+        elif current is None or current == manifest.get(name):
+            action = 'written'
+        else:
+            action = 'kept'
+        plan[path] = (name, action, desired)
+    return plan
+
+
+@traced('update')
+def apply(tree, root, status=None):
+    """
+    Bring an existing package in line with a planned tree, writing only the
+    files whose content changed. Files edited since they were generated are
+    kept as they are, and nothing outside the plan (.git, the virtualenv,
+    docs) is touched
+    :param tree: TreeWriter planned with root as the package path
+    :param root: The path of the existing package
+    :param status: Dictionary containing the workflow status
+    :return: Dictionary of written, unchanged and kept (modified by the
+             user) relative paths
+    """
+
+    hashes = load_manifest(root)
+    result = {'written': [], 'unchanged': [], 'kept': []}
+
+    plan = classify(tree, root)
+    for path, (name, action, desired) in plan.items():
+        result[action].append(name)
+        if action == 'unchanged':
+            hashes[name] = desired
+        elif action == 'kept':
+            logger.warning("[!] Keeping {}, it was modified since it was "
+                           "generated".format(path))
+        if action != 'written':
+            tree.drop(path)
+
+    tree.dirs = [path for path in tree.dirs if not os.path.isdir(path)]
+    failed = tree.flush(status, replace=True)
+
+    for path, (name, action, desired) in plan.items():
+        if action != 'written':
+            continue
+        if path in failed:
+            hashes.pop(name, None)
+        else:
+            hashes[name] = desired
+    save_manifest(root, hashes)
+    return result
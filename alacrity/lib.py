@@ -1,17 +1,74 @@
+import contextlib
 import logging
 import os
 from os.path import join, isfile, expanduser
-from configparser import ConfigParser
 import shutil
 import sys
-import subprocess
-import datetime
+import functools
+import threading
 from clint.textui import colored
 
+from alacrity import probes
+from alacrity import templates
+from alacrity import trace
+from alacrity.trace import traced
+
+# subprocess, datetime, configparser and concurrent.futures are imported by
+# the steps that use them to keep the import of this module cheap
+
 filepath = os.path.abspath(__file__)
 dirpath = os.path.dirname(filepath)
 pythonpath = sys.executable
 
+# Prompts of the external initialisation steps
+git_prompt = '[*] Do you want to initialize a Git repository? (y/n) : '
+venv_prompt = '[*] Do you want to initialize a virtual environment? (y/n): '
+venv_name_prompt = '[*] Enter a name for the virtual environment: '
+sphinx_prompt = '[*] Do you want to initialize Sphinx documentation? (y/n): '
+
+# Workflow messages go through a module logger (silent unless the host
+# configures logging) and echo(), which quiet() turns off per thread
+logger = logging.getLogger(__name__)
+_output = threading.local()
+
+
+def is_quiet():
+    """
+    Check whether terminal output is turned off for the current thread
+    :return: True or False
+    """
+
+    return getattr(_output, 'quiet', False)
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """
+    Turn the terminal output of the workflow off (or back on) for the
+    enclosed block in the current thread
+    :param enabled: Whether to silence the output
+    :return: None
+    """
+
+    previous = is_quiet()
+    _output.quiet = enabled
+    try:
+        yield
+    finally:
+        _output.quiet = previous
+
+
+def echo(message, end="\n"):
+    """
+    Print a workflow message unless the current thread is quiet
+    :param message: The message to print
+    :param end: The string appended after the message
+    :return: None
+    """
+
+    if not is_quiet():
+        print(message, end=end)
+
 
 def rebuild_persistence(name='persist.ini', silent=False):
     """
@@ -37,10 +94,14 @@ def rebuild_persistence(name='persist.ini', silent=False):
 
         if choice == 'y':
             os.remove(persist_path)
+            # A clean make also forces every tool to be probed again
+            probes.reset()
         elif choice == 'n':
             print(colored.green("[*] Clean make persistence cancelled"))
         else:
-            logging.error(colored.red(" Invalid choice"))
+            logger.error(colored.red(" Invalid choice"))
+    else:
+        probes.reset()
 
     try:
         with open(persist_path, "w") as file_object:
@@ -56,8 +117,8 @@ def rebuild_persistence(name='persist.ini', silent=False):
                                      "successfully."))
 
     except IOError:
-        logging.exception(colored.red("[!] The persist.ini file could "
-                                      "not be created."))
+        logger.exception(colored.red("[!] The persist.ini file could "
+                                     "not be created."))
 
     return persist_path, options
 
@@ -79,54 +140,382 @@ def read_from_paths(rel_path, abs_path):
     return doc
 
 
-def remove_package(path):
+def load_template(name):
     """
-    Remove the package present in path
-    :param path: The path to create the git repo at
+    Read a starter template through the template store of this thread
+    :param name: The file name of the template in alacrity/starters
+    :return: The contents of the template
+    """
+
+    with trace.span('template.load', template=name):
+        return templates.current().get(name)
+
+
+def render_template(name, context):
+    """
+    Render a starter template in a single pass over its compiled form
+    :param name: The file name of the template in alacrity/starters
+    :param context: Dictionary of values for the [@...] tokens
+    :return: The rendered text
+    """
+
+    with trace.span('template.render', template=name):
+        return templates.current().render(name, context)
+
+
+def copy_template(name, path, tree=None, task=None):
+    """
+    Emit a template without tokens as it is: a tree writer copies its bytes
+    in the kernel instead of holding them as text
+    :param name: The file name of the template in alacrity/starters
+    :param path: The path of the file to create
+    :param tree: TreeWriter buffering the output (None to write directly)
+    :param task: The status key reporting this file
     :return: None
     """
 
+    store = templates.current()
+    with trace.span('template.copy', template=name):
+        compiled = store.compiled(name)
+        # Text mode would translate newlines, a copy keeps them as they are
+        if tree is not None and compiled.verbatim and os.linesep == '\n':
+            tree.copy(path, store.locate(name), task)
+        else:
+            write_file(path, compiled.text, tree, task)
+
+
+def find_tool(name):
+    """
+    Locate an executable in the system path through the capability cache
+    :param name: The name of the executable
+    :return: The full path of the executable or None
+    """
+
+    if name == 'git':
+        return probes.git()['path']
+    return probes.probe(name)['path']
+
+
+@functools.lru_cache(maxsize=None)
+def git_identity():
+    """
+    Read the default author name and email from the user's git config
+    :return: default_author, default_email
+    """
+
+    default_author = ''
+    default_email = ''
+
+    gitconfig_path = ''
+
+    # Find git config file
+    for i in ['~/.gitconfig', '~/.config/git/config']:
+        config_path = expanduser(i)
+        if isfile(config_path):
+            gitconfig_path = config_path
+            break
+
+    if gitconfig_path:
+        from configparser import ConfigParser
+        config = ConfigParser()
+        config.read(gitconfig_path)
+        if 'user' in config:
+            user_section = config['user']
+            if 'name' in user_section:
+                default_author = user_section['name']
+            if 'email' in user_section:
+                default_email = user_section['email']
+
+    return default_author, default_email
+
+
+def ask(message, answers=None, key=None, default=''):
+    """
+    Prompt for a value, or take it from answers when running unattended
+    :param message: The prompt displayed on the terminal
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param key: The key of the value in answers
+    :param default: The value used when nothing is entered
+    :return: The answer as a string
+    """
+
+    if answers is not None:
+        value = answers.get(key)
+        if isinstance(value, bool):
+            return 'y' if value else 'n'
+        if value is None or value == '':
+            return default
+        return str(value)
+
+    if is_quiet():
+        raise ValueError("No answer for {} while running quietly".format(key))
+
+    echo(colored.green(message), end="")
+    return input() or default
+
+
+def valid_venv_name(venv_name):
+    """
+    Check that a virtual environment name stays a directory of the package
+    :param venv_name: The requested name (e.g. venv or .venv)
+    :return: True or False
+    """
+
+    return bool(venv_name) and os.path.basename(venv_name) == venv_name \
+        and venv_name not in ('.', '..')
+
+
+def valid_name(package_name):
+    """
+    Check that a requested name stays a single directory below the root
+    :param package_name: The requested package name
+    :return: True or False
+    """
+
+    return bool(package_name) and \
+        os.path.basename(package_name) == package_name and \
+        package_name not in ('.', '..') and not package_name.startswith('.')
+
+
+def staging_path(target):
+    """
+    Build the path of a hidden sibling directory to assemble target in
+    :param target: The final path of the package
+    :return: The staging path
+    """
+
+    import uuid
+
+    parent, name = os.path.split(os.path.abspath(target))
+    return join(parent, '.{}.staging-{}'.format(name, uuid.uuid4().hex[:12]))
+
+
+def trash_path(target):
+    """
+    Build the path of a hidden sibling directory to move target out of the way
+    :param target: The path being discarded
+    :return: The trash path
+    """
+
+    import uuid
+
+    parent, name = os.path.split(os.path.abspath(target))
+    return join(parent, '.{}.trash-{}'.format(name, uuid.uuid4().hex[:12]))
+
+
+@traced('discard')
+def move_to_trash(path):
+    """
+    Rename path into a hidden trash sibling, which takes no time whatever
+    its size
+    :param path: The file or directory to move
+    :return: The trash path, or None if path could not be moved
+    """
+
+    if '.trash-' in os.path.basename(path):
+        return path
+
+    trash = trash_path(path)
     try:
-        shutil.rmtree(path)
+        os.rename(path, trash)
     except OSError:
-        logging.exception(colored.red(
-            "The path {} could not be removed".format(path)))
+        logger.exception(colored.red(
+            "The path {} could not be moved to the trash".format(path)))
+        return None
+    return trash
 
 
-def create_package_structure(package_name, status):
+def discard(path):
+    """
+    Move path out of the way at once and delete it in a detached process
+    :param path: The directory to discard
+    :return: None
+    """
+
+    import subprocess
+
+    if not os.path.lexists(path):
+        return
+
+    path = move_to_trash(path)
+    if path is None:
+        return
+
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.remove(path)
+        return
+
+    # The deletion outlives this process so callers never wait on it
+    command = [pythonpath, '-c', 'import shutil, sys; '
+                                 'shutil.rmtree(sys.argv[1], True)', path]
+    kwargs = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL,
+              'stderr': subprocess.DEVNULL}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+
+    try:
+        subprocess.Popen(command, **kwargs)
+    except OSError:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def purge(paths, workers=None):
+    """
+    Remove many directories: every one is moved to the trash first, so they
+    all disappear at once, then the trash is deleted on a thread pool
+    :param paths: The directories to remove
+    :param workers: Number of concurrent deletions
+    :return: List of the paths that could not be removed
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    failed = []
+    moved = {}
+    for path in paths:
+        if not os.path.lexists(path):
+            continue
+        trash = move_to_trash(path)
+        if trash is None:
+            failed.append(path)
+        else:
+            moved[trash] = path
+
+    def vanished(function, path, exc_info):
+        if not issubclass(exc_info[0], FileNotFoundError):
+            raise exc_info[1]
+
+    def delete(trash):
+        # A concurrent sweep of the same trash leaves nothing to remove
+        try:
+            if os.path.islink(trash) or not os.path.isdir(trash):
+                os.remove(trash)
+            else:
+                shutil.rmtree(trash, onerror=vanished)
+        except FileNotFoundError:
+            pass
+
+    # Unlinking is spent in the kernel, threads delete trees side by side
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(pool.submit(delete, trash), path)
+                   for trash, path in moved.items()]
+        for future, path in futures:
+            if future.exception() is not None:
+                logger.error(colored.red(
+                    "The path {} could not be removed".format(path)),
+                    exc_info=future.exception())
+                failed.append(path)
+
+    return failed
+
+
+@traced('publish')
+def publish(staging, target):
+    """
+    Make a staged package visible at target with a rename, replacing (and
+    discarding) any package already there
+    :param staging: The directory the package was assembled in
+    :param target: The final path of the package
+    :return: None
+    """
+
+    trash = None
+    if os.path.lexists(target):
+        trash = trash_path(target)
+        os.rename(target, trash)
+
+    try:
+        os.rename(staging, target)
+    except OSError:
+        if trash is not None:
+            os.rename(trash, target)
+        raise
+
+    if trash is not None:
+        discard(trash)
+
+
+def remove_package(path, wait=False):
+    """
+    Remove the package present in path: it is moved to the trash at once and
+    deleted in the background
+    :param path: The path of the package
+    :param wait: Delete the package before returning
+    :return: None
+    """
+
+    if wait:
+        purge([path], workers=1)
+    else:
+        discard(path)
+
+
+def make_dir(path, tree=None):
+    """
+    Create a directory, or plan it when a tree writer is collecting output
+    :param path: The path of the directory
+    :param tree: TreeWriter buffering the output (None to write directly)
+    :return: None
+    """
+
+    if tree is not None:
+        tree.mkdir(path)
+    else:
+        os.mkdir(path)
+
+
+def write_file(path, data, tree=None, task=None):
+    """
+    Write a file, or plan it when a tree writer is collecting output
+    :param path: The path of the file
+    :param data: The text of the file
+    :param tree: TreeWriter buffering the output (None to write directly)
+    :param task: The status key reporting this file
+    :return: None
+    """
+
+    if tree is not None:
+        tree.write(path, data, task)
+    else:
+        with open(path, "w") as fobj:
+            fobj.write(data)
+
+
+@traced('scaffold.structure')
+def create_package_structure(package_name, status, root=None, tree=None):
     """
     Initialize a package structure in the current directory
     :param package_name: The name of the package (and the directory)
     :param status: Dictionary containing the workflow status
+    :param root: The directory to create instead of ./package_name
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
+    root = root or package_name
+
     try:
-        os.mkdir(package_name)
+        make_dir(root, tree)
 
         # Create package sub-directory
-        sub_directory = '{0}/{0}'.format(package_name)
-        os.mkdir(sub_directory)
-
-        # Create __init__.py in subdirectory
-        with open(join(sub_directory, "__init__.py"), 'w') as fobj:
-            fobj.close()
-
-        # Create core.py in subdirectory
-        with open(join(sub_directory, "core.py"), 'w') as fobj:
-            fobj.close()
+        sub_directory = join(root, package_name)
+        make_dir(sub_directory, tree)
 
-        # Create lib.py in subdirectory
-        with open(join(sub_directory, "lib.py"), 'w') as fobj:
-            fobj.close()
+        # Create empty __init__.py, core.py and lib.py in subdirectory
+        for name in ("__init__.py", "core.py", "lib.py"):
+            write_file(join(sub_directory, name), "", tree,
+                       'structure_created')
 
         status['structure_created'] = True
 
     except OSError:
-        logging.exception(colored.red("package directory already exists"))
-        logging.error(colored.red("Enable clean_make for complete "
-                                  "reconstruction"))
-        logging.error(colored.red(".py file creation failed at subdirectory."))
+        logger.exception(colored.red("package directory already exists"))
+        logger.error(colored.red("Enable clean_make for complete "
+                                 "reconstruction"))
+        logger.error(colored.red(".py file creation failed at subdirectory."))
 
 
 def create_docs_directory(path, status):
@@ -151,148 +540,121 @@ def create_docs_directory(path, status):
         status['docs_created'] = True
 
     except OSError:
-        logging.exception(
+        logger.exception(
             colored.red("%s/docs directory already exists", path)
         )
-        logging.error(colored.red("Enable clean_make for complete "
-                                  "reconstruction"))
+        logger.error(colored.red("Enable clean_make for complete "
+                                 "reconstruction"))
 
 
-def create_tests_package(path, status):
+@traced('scaffold.tests')
+def create_tests_package(path, status, tree=None):
     """
     Create a tests package at path
     :param path: The path to create the tests package at
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
     try:
         # Create tests directory
-        os.mkdir(join(path, "tests"))
+        make_dir(join(path, "tests"), tree)
         # Create __init__.py in tests directory
-        with open(join(path, "tests/__init__.py"), 'w') as fobj:
-            fobj.close()
+        write_file(join(path, "tests", "__init__.py"), "", tree,
+                   'tests_created')
         # Create test_lib.py in tests directory
-        with open(join(path, "tests/test_lib.py"), 'w') as fobj:
-            fobj.write("# Place tests for the lib.py functions here. ")
+        write_file(join(path, "tests", "test_lib.py"),
+                   "# Place tests for the lib.py functions here. ", tree,
+                   'tests_created')
         status['tests_created'] = True
 
     except IOError:
-        logging.exception(colored.red("py file creation failed at "
-                                      "tests directory"))
-        logging.error(colored.red("Enable clean_make for complete "
-                                  "reconstruction"))
+        logger.exception(colored.red("py file creation failed at "
+                                     "tests directory"))
+        logger.error(colored.red("Enable clean_make for complete "
+                                 "reconstruction"))
 
 
-def create_git_ignore(path, status):
+@traced('scaffold.gitignore')
+def create_git_ignore(path, status, tree=None):
     """
     Initialize a .gitignore file at path
     :param path: The path to create the gitignore at
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/gitignore.txt")
-    rel_path = join(dirpath, "gitignore.txt")
-
-    try:
-        with open(rel_path, "r") as git_read:
-            git_ignore = git_read.read()
-    except IOError:
-        with open(abs_path, "r") as git_read:
-            git_ignore = git_read.read()
-
     try:
-        with open(join(path, ".gitignore"), "w") as git:
-            git.write(git_ignore)
+        copy_template("gitignore.txt", join(path, ".gitignore"), tree,
+                      'gitignore_created')
         status['gitignore_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" .gitignore creation failed"))
+        logger.exception(colored.red(" .gitignore creation failed"))
 
 
-def create_manifest(path, status):
+@traced('scaffold.manifest')
+def create_manifest(path, status, tree=None):
     """
     Create a manifest at path
     :param path: The path to create the manifest at
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/MANIFEST.in")
-    rel_path = join(dirpath, "MANIFEST.in")
-
-    try:
-        with open(rel_path, "r") as man:
-            data = man.read()
-    except IOError:
-        with open(abs_path, "r") as man:
-            data = man.read()
-
     try:
-        with open(join(path, "MANIFEST.in"), "w") as git:
-            git.write(data)
+        copy_template("MANIFEST.in", join(path, "MANIFEST.in"), tree,
+                      'manifest_created')
         status['manifest_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" MANIFEST.in creation failed"))
+        logger.exception(colored.red(" MANIFEST.in creation failed"))
 
 
-def create_requirements(path, status):
+@traced('scaffold.requirements')
+def create_requirements(path, status, tree=None):
     """
     Create a requirements.txt file at path
     :param path: The path to create the requirements.txt at
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/requirements.txt")
-    rel_path = join(dirpath, "requirements.txt")
-
     try:
-        with open(rel_path, "r") as man:
-            data = man.read()
-    except IOError:
-        with open(abs_path, "r") as man:
-            data = man.read()
-
-    try:
-        with open(join(path, "requirements.txt"), "w") as git:
-            git.write(data)
+        copy_template("requirements.txt", join(path, "requirements.txt"),
+                      tree, 'requirements_created')
         status['requirements_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" requirements.txt creation failed"))
+        logger.exception(colored.red(" requirements.txt creation failed"))
 
 
-def create_readme(path, status):
+@traced('scaffold.readme')
+def create_readme(path, status, name=None, tree=None):
     """
     Create a README.md at path
     :param path: The path to create the README at
     :param status: Dictionary containing the workflow status
+    :param name: The name of the package (defaults to path)
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/README.rst")
-    rel_path = join(dirpath, "README.rst")
-
-    try:
-        with open(rel_path, "r") as man:
-            data = man.read()
-    except IOError:
-        with open(abs_path, "r") as man:
-            data = man.read()
+    name = name or path
 
-    data = data.replace("[@package_name]", path)
-    data = data.replace("^$^", "="*len(path), 2)
+    data = render_template("README.rst", {'package_name': name,
+                                          'underline': "=" * len(name)})
 
     try:
-        with open(join(path, "README.rst"), "w") as wr:
-            wr.write(data)
+        write_file(join(path, "README.rst"), data, tree, 'readme_created')
         status['readme_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" README.rst creation failed."))
+        logger.exception(colored.red(" README.rst creation failed."))
 
 
 def create_makefile(path, status):
@@ -303,220 +665,178 @@ def create_makefile(path, status):
         status['makefile_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" Makefile creation failed."))
+        logger.exception(colored.red(" Makefile creation failed."))
 
 
-def create_setup(path, status, test=False):
+@traced('scaffold.setup')
+def create_setup(path, status, test=False, answers=None, name=None,
+                 tree=None):
     """
     Create a setup.py in the package structure in path
     :param path: The path to create the setup at
     :param status: Dictionary containing the workflow status
     :param test: Whether to run in test mode
-    :return: None
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param name: The name of the package (defaults to path)
+    :param tree: TreeWriter buffering the output (None to write directly)
+    :return: author, version
     """
 
-    package_name = path
+    package_name = name or path
     version = desc = ""
     author = author_email = ""
 
     if not test:
-        print(colored.green("[*] Enter the initial version: "), end="")
-        version = input()
-
-        print(colored.green("[*] Enter a brief description: "), end="")
-        desc = input()
+        version = ask("[*] Enter the initial version: ", answers, 'version')
+        desc = ask("[*] Enter a brief description: ", answers, 'desc')
 
         # Attempt to get author and email from git config
-        default_author = ''
-        default_email = ''
-
-        gitconfig_path = ''
-
-        # Find git config file
-        for i in ['~/.gitconfig', '~/.config/git/config']:
-            config_path = expanduser(i)
-            if isfile(config_path):
-                gitconfig_path = config_path
-                break
-
-        if gitconfig_path:
-            config = ConfigParser()
-            config.read(gitconfig_path)
-            if 'user' in config:
-                user_section = config['user']
-                if 'name' in user_section:
-                    default_author = user_section['name']
-                if 'email' in user_section:
-                    default_email = user_section['email']
-
-        print(
-            colored.green(
-                "[*] Enter author name [{}]: ".format(default_author)
-            ),
-            end=""
-        )
-        author = input() or default_author
+        default_author, default_email = git_identity()
 
-        print(
-            colored.green(
-                "[*] Enter author email [{}]: ".format(default_email)
-            ),
-            end=""
+        author = ask("[*] Enter author name [{}]: ".format(default_author),
+                     answers, 'author', default_author)
+        author_email = ask(
+            "[*] Enter author email [{}]: ".format(default_email),
+            answers, 'author_email', default_email
         )
-        author_email = input() or default_email
-
-    abs_path = join(dirpath, "starters/setup.py")
-    rel_path = join(dirpath, "setup.py")
-
-    try:
-        with open(rel_path, "r") as man:
-            doc = man.read()
-    except IOError:
-        with open(abs_path, "r") as man:
-            doc = man.read()
 
     # Make the changes
-    if not test:
-        doc = doc.replace('[@package_name]', package_name)
-        doc = doc.replace('[@version]', version)
-        doc = doc.replace('[@desc]', desc)
-        doc = doc.replace('[@author]', author)
-        doc = doc.replace('[@author_email]', author_email)
+    if test:
+        doc = load_template("setup.py")
+    else:
+        doc = render_template("setup.py", {'package_name': package_name,
+                                           'version': version,
+                                           'desc': desc,
+                                           'author': author,
+                                           'author_email': author_email})
 
     try:
-        with open(join(path, "setup.py"), "w") as wr:
-            wr.write(doc)
+        write_file(join(path, "setup.py"), doc, tree, 'setup_created')
         status['setup_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" setup.py creation failed."))
+        logger.exception(colored.red(" setup.py creation failed."))
 
     return author, version
 
 
-def mit_lic(path, name, year, status):
+def mit_lic(path, name, year, status, tree=None):
     """
     Write a MIT license at the path
     :param path: The path to create the license at
     :param name: The name of the licensee
     :param year: The year of the license
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/MIT_LICENSE")
-    rel_path = join(dirpath, "MIT_LICENSE")
-
-    data = read_from_paths(rel_path, abs_path)
-
-    data = data.replace('[@fullname]', name)
-    data = data.replace('[@year]', year)
+    data = render_template("MIT_LICENSE", {'fullname': name, 'year': year})
 
     try:
-        with open(join(path, "LICENSE"), "w") as fobj:
-            fobj.write(data)
+        write_file(join(path, "LICENSE"), data, tree, 'license_created')
         status['license_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" LICENSE creation failed."))
+        logger.exception(colored.red(" LICENSE creation failed."))
 
 
-def apa_lic(path, name, year, status):
+def apa_lic(path, name, year, status, tree=None):
     """
     Write a Apache license at the path
     :param path: The path to create the license at
     :param name: The name of the licensee
     :param year: The year of the license
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/APACHE2_LICENSE")
-    rel_path = join(dirpath, "APACHE2_LICENSE")
-
-    data = read_from_paths(rel_path, abs_path)
-
-    data = data.replace('[@fullname]', name)
-    data = data.replace('[@year]', year)
+    data = render_template("APACHE2_LICENSE", {'fullname': name, 'year': year})
 
     try:
-        with open(join(path, "LICENSE"), "w") as fobj:
-            fobj.write(data)
+        write_file(join(path, "LICENSE"), data, tree, 'license_created')
         status['license_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" LICENSE creation failed."))
+        logger.exception(colored.red(" LICENSE creation failed."))
 
 
-def gpl_lic(path, status):
+def gpl_lic(path, status, tree=None):
     """
     Write a GPLv3 license at the path
     :param path: The path to create the license at
     :param status: Dictionary containing the workflow status
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    abs_path = join(dirpath, "starters/GPL_LICENSE")
-    rel_path = join(dirpath, "GPL_LICENSE")
-
-    data = read_from_paths(rel_path, abs_path)
-
     try:
-        with open(join(path, "LICENSE"), "w") as fobj:
-            fobj.write(data)
+        copy_template("GPL_LICENSE", join(path, "LICENSE"), tree,
+                      'license_created')
         status['license_created'] = True
 
     except IOError:
-        logging.exception(colored.red(" LICENSE creation failed."))
+        logger.exception(colored.red(" LICENSE creation failed."))
 
 
-def create_license(path, full_name, status):
+@traced('scaffold.license')
+def create_license(path, full_name, status, answers=None, tree=None):
     """
     Create a license file in the given file
     :param path: The path to create the license at
     :param full_name: The full name of the licensee
     :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: None
     """
 
-    print(colored.green("[*] Choose a license [mit/apache/gpl3]: "), end="")
-    license_name = input()
+    import datetime
+
+    license_name = ask("[*] Choose a license [mit/apache/gpl3]: ", answers,
+                       'license')
     fullname = full_name
     today = datetime.datetime.today()
 
     if license_name == 'mit':
-        mit_lic(path, fullname, str(today.year), status)
+        mit_lic(path, fullname, str(today.year), status, tree=tree)
     elif license_name == 'apache':
-        apa_lic(path, fullname, str(today.year), status)
+        apa_lic(path, fullname, str(today.year), status, tree=tree)
     elif license_name == 'gpl3':
-        gpl_lic(path, status)
+        gpl_lic(path, status, tree=tree)
     else:
-        print(colored.red("[!] Invalid license name."))
-        print(colored.yellow("[>] Skipping license creation"))
-        logging.error(colored.red("[!] Invalid license name."))
-        logging.info(colored.red("[>] Skipping license creation"))
+        echo(colored.red("[!] Invalid license name."))
+        echo(colored.yellow("[>] Skipping license creation"))
+        logger.error(colored.red("[!] Invalid license name."))
+        logger.info(colored.red("[>] Skipping license creation"))
 
 
-def create_starter_files(path, status):
+@traced('scaffold.starter_files')
+def create_starter_files(path, status, answers=None, name=None, tree=None):
     """
     Create and place various starter files in the structure
     :param path: The path to create the starter files at
     :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param name: The name of the package (defaults to path)
+    :param tree: TreeWriter buffering the output (None to write directly)
     :return: author_name, version
     """
 
     # Create standard Python .gitignore
-    create_git_ignore(path, status)
+    create_git_ignore(path, status, tree=tree)
     # setup.py
-    full_name, version = create_setup(path, status, test=False)
+    full_name, version = create_setup(path, status, test=False,
+                                      answers=answers, name=name, tree=tree)
     # LICENSE
-    create_license(path, full_name, status)
+    create_license(path, full_name, status, answers=answers, tree=tree)
     # MANIFEST.in
-    create_manifest(path, status)
+    create_manifest(path, status, tree=tree)
     # README.rst
-    create_readme(path, status)
+    create_readme(path, status, name=name, tree=tree)
     # requirements.txt
-    create_requirements(path, status)
+    create_requirements(path, status, tree=tree)
 
     return full_name, version
 
@@ -530,25 +850,32 @@ def report_status(status):
 
     for task in status.keys():
         if not status[task]:
-            print(colored.red("[!] WARN : Task {} failed".format(task)))
+            echo(colored.red("[!] WARN : Task {} failed".format(task)))
 
 
-def git_init(path, status, silent=False):
+@traced('git.init')
+def git_init(path, status, silent=False, answers=None, options=None):
     """
     Initialize a git repository at path (searches for git in system path)
     :param silent: Whether to run silently with no prompts
     :param path: The path to create the git repo at
     :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options (git_template for the
+                    directory passed to git init --template)
     :return: True or False only in silent mode
     """
 
-    git_path = shutil.which('git')
+    import subprocess
+
+    git_path = find_tool('git')
 
     if silent:
         if git_path is not None:
             command = [git_path, 'init']
             try:
-                subprocess.check_output(command, cwd=path).decode('utf-8')
+                subprocess.check_output(command, cwd=path,
+                                        stderr=subprocess.STDOUT)
             except subprocess.CalledProcessError:
                 return False
             else:
@@ -557,92 +884,232 @@ def git_init(path, status, silent=False):
             return False
 
     if git_path:
-        print(colored.green('[*] Do you want to initialize a Git repository? '
-                            '(y/n) : '), end="")
-        choice = input()
+        choice = ask(git_prompt, answers, 'git', 'n')
 
         if choice == 'y':
             command = [git_path, 'init', path]
+            if (options or {}).get('git_template'):
+                command.insert(2, '--template={}'.format(
+                    options['git_template']))
             try:
-                subprocess.check_output(command).decode("utf-8")
+                # git prints its hints on stderr
+                subprocess.check_output(command, stderr=subprocess.STDOUT)
             except subprocess.CalledProcessError:
-                print(colored.red("[!] git initialization subprocess failed, "
-                                  "check permissions"))
+                echo(colored.red("[!] git initialization subprocess failed, "
+                                 "check permissions"))
             else:
-                print(colored.green("[*] Initialized empty git repository "
-                                    "in {}/.git".format(path)))
+                echo(colored.green("[*] Initialized empty git repository "
+                                   "in {}/.git".format(path)))
         elif choice == 'n':
-            print(colored.yellow('[>] Skipping git initialization'))
+            echo(colored.yellow('[>] Skipping git initialization'))
         else:
-            logging.error(colored.red(" Invalid choice"))
-            print(colored.red("[!] Invalid choice"))
-            print(colored.yellow('[>] Skipping git initialization'))
+            logger.error(colored.red(" Invalid choice"))
+            echo(colored.red("[!] Invalid choice"))
+            echo(colored.yellow('[>] Skipping git initialization'))
 
     else:
-        print(colored.yellow('[!] git could not be detected on '
-                             'this machine'))
-        print(colored.yellow('[>] Skipping git initialization'))
+        echo(colored.yellow('[!] git could not be detected on '
+                            'this machine'))
+        echo(colored.yellow('[>] Skipping git initialization'))
 
     status['git_initialized'] = True
 
 
-def venv_init(path, status, silent=False):
+@traced('venv.init')
+def venv_init(path, status, silent=False, answers=None, options=None,
+              timings=None):
     """
     Initialize a virtual environment at path (defaults to venv in Python 3.3+)
     :param path: The path in which the virtualenv will exist
     :param status: Dictionary containing the workflow status
     :param silent: Whether to run the init without any prompts for input
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options (venv_cache to clone the
+                    environment from a cached template, wheelhouse to seed
+                    it with the package requirements, venv_without_pip,
+                    venv_copies and venv_system_site_packages)
+    :param timings: Dictionary receiving the duration of timed steps
     :return: True or False only in silent mode
     """
 
-    # Check if venv is available
-    is_python3_3 = sys.version_info.major == 3 and sys.version_info.minor >= 3
+    import subprocess
+    from alacrity import venvs
 
-    if is_python3_3:
-        command = [pythonpath, '-m', 'venv']
-    else:
-        logging.error(colored.red("[!] venv could not be detected or "
-                                  "executed."))
-        print(colored.yellow('[>] Skipping venv initialization'))
+    # Check if venv is available
+    if not probes.venv()['available']:
+        logger.error(colored.red("[!] venv could not be detected or "
+                                 "executed."))
+        echo(colored.yellow('[>] Skipping venv initialization'))
         return
 
+    settings = venvs.settings(options)
+
     if silent:
-        command = [pythonpath, '-m', 'venv', "testenv"]
         try:
-            subprocess.check_output(command, cwd=path).decode('utf-8')
-        except subprocess.CalledProcessError:
+            venvs.build(join(path, "testenv"), **settings)
+        except (subprocess.CalledProcessError, OSError):
             return False
         else:
             return True
 
     # Start process
-    print(colored.green('[*] Do you want to initialize a virtual environment? '
-                        '(y/n): '), end="")
-    choice = input()
+    choice = ask(venv_prompt, answers, 'venv', 'n')
 
     if choice == 'y':
         try:
-            print(colored.green('[*] Enter a name for the virtual '
-                                'environment: '), end="")
-            venv_name = input()
-            command.append(join(path, venv_name))
-            subprocess.check_output(command).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            logging.exception(e)
+            venv_name = ask(venv_name_prompt, answers, 'venv_name', 'venv')
+            if not valid_venv_name(venv_name):
+                raise ValueError("Invalid virtual environment name "
+                                 "{!r}".format(venv_name))
+            if (options or {}).get('venv_cache'):
+                venvs.create(join(path, venv_name), **settings)
+            else:
+                venvs.build(join(path, venv_name), **settings)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            logger.exception(e)
         else:
-            print(colored.green("[*] Virtual environment setup complete"))
+            echo(colored.green("[*] Virtual environment setup complete"))
             status['venv_created'] = True
+
+            if (options or {}).get('wheelhouse'):
+                seed_requirements(path, join(path, venv_name),
+                                  options['wheelhouse'], status, timings)
     elif choice == 'n':
-        print(colored.yellow('[>] Skipping virtual environment '
-                             'initialization'))
+        echo(colored.yellow('[>] Skipping virtual environment '
+                            'initialization'))
         status['venv_created'] = True
     else:
-        logging.error(colored.red(" Invalid choice"))
-        print(colored.red("[!] Invalid choice"))
-        print(colored.yellow('[>] Skipping venv initialization'))
+        logger.error(colored.red(" Invalid choice"))
+        echo(colored.red("[!] Invalid choice"))
+        echo(colored.yellow('[>] Skipping venv initialization'))
 
 
-def sphinx_init(path, author, version, status, silent=False):
+def git_commit_hooked(path, author, email, exclude=()):
+    """
+    Create the first commit through git add and git commit, running the
+    hooks and applying every ignore rule of the repository
+    :param path: The path of the package
+    :param author: The name of the author and committer
+    :param email: The email of the author and committer
+    :param exclude: Top level names to leave out (e.g. the virtualenv)
+    :return: Hex digest of the commit
+    """
+
+    import subprocess
+
+    git_path = find_tool('git')
+    if git_path is None:
+        raise OSError("git could not be detected")
+
+    environment = dict(os.environ, GIT_AUTHOR_NAME=author,
+                       GIT_AUTHOR_EMAIL=email, GIT_COMMITTER_NAME=author,
+                       GIT_COMMITTER_EMAIL=email)
+    pathspec = ['.'] + [':(exclude){}'.format(name) for name in exclude]
+    try:
+        for command in (['add', '-A', '--'] + pathspec,
+                        ['commit', '-q', '-m', "Initial commit"],
+                        ['rev-parse', 'HEAD']):
+            output = subprocess.check_output([git_path] + command, cwd=path,
+                                             env=environment,
+                                             stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError as error:
+        raise OSError("git {} failed: {}".format(
+            error.cmd[1], error.output.decode('utf-8', 'replace').strip()))
+    return output.decode('utf-8').strip()
+
+
+@traced('git.commit')
+def git_commit(path, author, status, answers=None, exclude=()):
+    """
+    Record the generated scaffold as the first commit of the repository,
+    writing the objects directly instead of running git add and git commit
+    (which still run when the repository has commit hooks or ignore rules
+    beyond its root .gitignore)
+    :param path: The path of the package
+    :param author: The name of the author
+    :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers
+    :param exclude: Top level names to leave out (e.g. the virtualenv)
+    :return: None
+    """
+
+    from alacrity import gitfast
+
+    status['git_committed'] = False
+
+    default_author, default_email = git_identity()
+    author = author or default_author or 'alacrity'
+    email = (answers or {}).get('author_email') or default_email or \
+        'alacrity@localhost'
+
+    try:
+        settings = gitfast.git_settings(path, find_tool('git') or 'git')
+        if gitfast.hooks(path, settings) or \
+                gitfast.ignore_sources(path, settings, exclude):
+            sha = git_commit_hooked(path, author, email, exclude)
+        else:
+            sha = gitfast.initial_commit(path, author, email,
+                                         exclude=exclude)
+    except (IOError, OSError, ValueError):
+        logger.exception(colored.red("[!] Initial commit failed"))
+        echo(colored.red("[!] Initial commit could not be created"))
+    else:
+        echo(colored.green("[*] Created initial commit {}".format(sha[:7])))
+        status['git_committed'] = True
+
+
+@traced('venv.requirements')
+def seed_requirements(path, venv_path, wheelhouse, status, timings=None):
+    """
+    Install the requirements.txt of the package into its virtual environment
+    from a local wheelhouse, without network access
+    :param path: The path of the package
+    :param venv_path: The path of the virtual environment
+    :param wheelhouse: The directory holding .whl files
+    :param status: Dictionary containing the workflow status
+    :param timings: Dictionary receiving the duration of the install
+    :return: None
+    """
+
+    import subprocess
+    from alacrity import wheels
+
+    status['requirements_installed'] = False
+
+    try:
+        elapsed = wheels.install_requirements(
+            venv_path, join(path, "requirements.txt"), wheelhouse)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.exception(e)
+        echo(colored.red("[!] Requirements could not be installed from "
+                         "{}".format(wheelhouse)))
+    else:
+        echo(colored.green("[*] Requirements installed in "
+                           "{:.2f}s".format(elapsed)))
+        status['requirements_installed'] = True
+        if timings is not None:
+            timings['requirements_install'] = elapsed
+
+
+def sphinx_available():
+    """
+    Check whether Sphinx is importable, or else through the capability cache
+    whether sphinx-quickstart runs
+    :return: True or False
+    """
+
+    from alacrity import quickstart
+
+    if quickstart.available() or probes.sphinx()['available']:
+        return True
+
+    logger.error(colored.red("[!] Sphinx could not be detected or "
+                             "executed."))
+    return False
+
+
+@traced('sphinx.init')
+def sphinx_init(path, author, version, status, silent=False, answers=None):
     """
     Initialize a Sphinx source dir at path (requires external package Sphinx)
     :param path: The path in which the source dir will exist
@@ -650,61 +1117,109 @@ def sphinx_init(path, author, version, status, silent=False):
     :param version: The version of the package
     :param status: Dictionary containing the workflow status
     :param silent: Whether to run without prompts or inputs
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
     :return: True or False only in silent mode
     """
 
-    is_sphinx = False
+    import subprocess
+    from alacrity import quickstart
 
     # Check if sphinx is available
-    try:
-        command = ['sphinx-quickstart', '--version']
-        out = subprocess.check_output(command).decode("utf-8")
-        if out.startswith('sphinx-quickstart'):
-            is_sphinx = True
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        logging.exception(colored.red("[!] Sphinx could not be detected "
-                                      "or executed."))
-        print(colored.red("[!] Sphinx could not be detected or executed."))
-        print(colored.yellow('[>] Skipping sphinx-docs initialization'))
-
-    if not is_sphinx:
+    if not sphinx_available():
+        echo(colored.red("[!] Sphinx could not be detected or executed."))
+        echo(colored.yellow('[>] Skipping sphinx-docs initialization'))
         return
 
     if silent:
-        command = ['sphinx-quickstart', '-q', '-p', path, '-a', author, '-v',
-                   version]
         try:
-            subprocess.check_output(command).decode('utf-8')
-        except subprocess.CalledProcessError:
+            quickstart.run(path, path, author, version)
+        except (subprocess.CalledProcessError, RuntimeError):
             return False
         else:
             return True
 
     # Start process
-    print(colored.green('[*] Do you want to initialize Sphinx documentation? '
-                        '(y/n): '), end="")
-    choice = input()
+    choice = ask(sphinx_prompt, answers, 'sphinx', 'n')
 
     if choice == 'y':
         try:
-            command = ['sphinx-quickstart', '-q', '-p', path,
-                       '-a', author, '-v', version]
-            subprocess.check_output(command, cwd=path).decode("utf-8")
-        except subprocess.CalledProcessError as e:
-            logging.exception(e)
-            print(colored.red("[!] Sphinx build failed : {}".format(e)))
+            # In-process when Sphinx is importable, the project is named
+            # after the package directory
+            quickstart.run(path, os.path.basename(os.path.abspath(path)),
+                           author, version)
+        except (subprocess.CalledProcessError, RuntimeError, OSError) as e:
+            logger.exception(e)
+            echo(colored.red("[!] Sphinx build failed : {}".format(e)))
         else:
-            print(colored.green("[*] Sphinx documentation setup complete"))
+            echo(colored.green("[*] Sphinx documentation setup complete"))
             status['sphinx_created'] = True
     elif choice == 'n':
-        print(colored.yellow('[>] Skipping Sphinx documentation '
-                             'initialization'))
+        echo(colored.yellow('[>] Skipping Sphinx documentation '
+                            'initialization'))
         status['sphinx_created'] = True
     else:
-        logging.error(colored.red(" Invalid choice"))
-        print(colored.red("[!] Invalid choice"))
-        print(colored.yellow('[>] Skipping Sphinx documentation '
-                             'initialization'))
+        logger.error(colored.red(" Invalid choice"))
+        echo(colored.red("[!] Invalid choice"))
+        echo(colored.yellow('[>] Skipping Sphinx documentation '
+                            'initialization'))
+
+
+@traced('prompt.external_steps')
+def ask_external_steps(answers=None):
+    """
+    Gather the answers of the git, venv and sphinx steps before running them
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :return: Dictionary of answers covering every external step
+    """
+
+    resolved = dict(answers or {})
+
+    # Only ask about tools that are available, like the steps themselves
+    if find_tool('git'):
+        resolved['git'] = ask(git_prompt, answers, 'git', 'n')
+
+    resolved['venv'] = ask(venv_prompt, answers, 'venv', 'n')
+    if resolved['venv'] == 'y':
+        resolved['venv_name'] = ask(venv_name_prompt, answers, 'venv_name',
+                                    'venv')
+
+    if sphinx_available():
+        resolved['sphinx'] = ask(sphinx_prompt, answers, 'sphinx', 'n')
+
+    return resolved
+
+
+@traced('external_steps')
+def run_external_steps(path, author, version, status, answers=None,
+                       options=None, timings=None):
+    """
+    Run the external steps (git, venv, sphinx and any custom ones) at path,
+    concurrently where their dependencies allow
+    :param path: The path of the package
+    :param author: The name of the author
+    :param version: The version of the package
+    :param status: Dictionary containing the workflow status
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options
+    :param timings: Dictionary receiving the duration of timed steps
+    :return: None
+    """
+
+    from alacrity import steps
+
+    external = steps.registry.stage('external')
+
+    # Every prompt is answered up front so the steps never wait on input()
+    resolved = steps.ask_questions(external, answers,
+                                   ask_external_steps(answers))
+
+    # git, venv and sphinx run concurrently, the first commit waits for
+    # every step providing tree
+    context = {'package_name': os.path.basename(os.path.abspath(path)),
+               'path': path, 'author': author, 'version': version,
+               'status': status, 'answers': resolved, 'options': options,
+               'timings': timings}
+    steps.run(external, context)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+from os.path import join, isdir
+
+from alacrity.cache import cache_dir, read_only
+from alacrity import core
+from alacrity import gitfast
+from alacrity import incremental
+from alacrity import lib
+from alacrity import quickstart
+from alacrity import steps
+from alacrity import templates
+from alacrity import venvs
+from alacrity.tree import TreeWriter
+
+logger = logging.getLogger(__name__)
+
+# Later runs weigh at least this much in the recorded mean of a step
+history_window = 20
+
+
+def history_path():
+    return join(cache_dir(), 'timings.json')
+
+
+def load_history():
+    """
+    Read the recorded step timings
+    :return: Dictionary of timing key to {'count', 'mean'} in seconds
+    """
+
+    try:
+        with open(history_path(), "r") as obj:
+            history = json.load(obj)
+    except (OSError, ValueError):
+        return {}
+    return history if isinstance(history, dict) else {}
+
+
+def variant(name, options=None):
+    """
+    Name the timing key of a step, split by the code path it takes so that
+    fast and slow runs are not averaged together
+    :param name: The timings key recorded by the workflow
+    :param options: Dictionary of run options
+    :return: The history key
+    """
+
+    options = options or {}
+    if name == 'venv':
+        if options.get('venv_cache'):
+            return 'venv:clone'
+        with_pip = venvs.settings(options)['with_pip']
+        return 'venv:build' if with_pip else 'venv:build-without-pip'
+    if name == 'sphinx':
+        return 'sphinx:in-process' if quickstart.available() else \
+            'sphinx:subprocess'
+    return name
+
+
+def record(runs, options=None):
+    """
+    Fold the timings of finished runs into the recorded history
+    :param runs: List of timings dictionaries, one per package
+    :param options: Dictionary of run options the packages were created with
+    :return: None
+    """
+
+    history = load_history()
+    for timings in runs:
+        for name, seconds in timings.items():
+            if not isinstance(seconds, (int, float)):
+                continue
+            entry = history.setdefault(variant(name, options),
+                                       {'count': 0, 'mean': 0.0})
+            entry['count'] += 1
+            # A running mean that keeps following recent runs
+            weight = min(entry['count'], history_window)
+            entry['mean'] += (seconds - entry['mean']) / weight
+
+    path = history_path()
+    partial = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(partial, "w") as obj:
+            json.dump(history, obj, indent=2, sort_keys=True)
+        os.replace(partial, path)
+    except OSError:
+        logger.debug("[-] Could not record timings", exc_info=True)
+
+
+def estimate(history, name, options=None):
+    """
+    :param history: Dictionary returned by load_history()
+    :param name: The timings key of a step
+    :param options: Dictionary of run options
+    :return: Mean duration in seconds, None without history
+    """
+
+    entry = history.get(variant(name, options))
+    return entry['mean'] if entry else None
+
+
+def plan_files(package_name, path, answers, options):
+    """
+    Render the files of a package into a tree writer without flushing it
+    :param package_name: The name of the package
+    :param path: The path of the package
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options
+    :return: TreeWriter, context of the file steps
+    """
+
+    tree = TreeWriter()
+    file_steps = steps.registry.stage('files')
+    context = {'package_name': package_name, 'path': path,
+               'status': core.new_status(), 'options': options,
+               'tree': tree, 'timings': {},
+               'answers': steps.ask_questions(file_steps, answers)}
+
+    with templates.use(core.template_store(options)), lib.quiet():
+        failures = steps.run(file_steps, context)
+    for step in file_steps:
+        error = failures.get(step.name)
+        if error is not None and not isinstance(error, steps.StepSkipped):
+            raise error
+
+    return tree, context
+
+
+def plan_external(path, answers, options, history, gathered=None):
+    """
+    Resolve what the external steps would run
+    :param path: The path of the package
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options
+    :param history: Dictionary returned by load_history()
+    :param gathered: Dictionary of the answers of the file steps
+    :return: List of {'step', 'how', 'command', 'slow', 'estimate'}
+    """
+
+    external = steps.registry.stage('external')
+    resolved = dict(gathered or {})
+    resolved.update(lib.ask_external_steps(answers))
+    resolved = steps.ask_questions(external, answers, resolved)
+    planned = []
+
+    def add(step, how, command=None, slow=False):
+        planned.append({'step': step, 'how': how, 'command': command,
+                        'slow': slow,
+                        'estimate': estimate(history, step, options)})
+
+    if resolved.get('git') == 'y':
+        command = [lib.find_tool('git'), 'init', path]
+        if options.get('git_template'):
+            command.insert(2, '--template={}'.format(options['git_template']))
+        add('git', "git init (subprocess)", command)
+        if options.get('git_commit'):
+            # Hooks come from the template (git init copies them over) or
+            # from a core.hooksPath the global config sets
+            parent = os.path.dirname(path)
+            settings = gitfast.git_settings(parent, command[0]) \
+                if command[0] and isdir(parent) else {}
+            hooked = (options.get('git_template') and any(
+                os.access(join(options['git_template'], 'hooks', name),
+                          os.X_OK) for name in gitfast.commit_hooks)) or \
+                (settings.get('core.hookspath') and
+                 gitfast.hooks(parent, settings))
+            if hooked or settings.get('core.excludesfile'):
+                add('git_commit', "git add and git commit (subprocess, "
+                    "commit hooks or ignore rules)", slow=True)
+            else:
+                add('git_commit', "initial commit written in-process")
+
+    if resolved.get('venv') == 'y':
+        settings = venvs.settings(options)
+        if options.get('venv_cache'):
+            if isdir(venvs.template_path(**settings)):
+                add('venv', "clone of the cached template")
+            else:
+                add('venv', "build of the cached template, then a clone",
+                    slow=True)
+        elif settings['with_pip']:
+            add('venv', "venv.EnvBuilder with the ensurepip subprocess",
+                slow=True)
+        else:
+            add('venv', "venv.EnvBuilder without pip")
+        if options.get('wheelhouse'):
+            add('requirements_install', "pip install from {} "
+                "(subprocess)".format(options['wheelhouse']),
+                ['pip', 'install', '--no-index', '--find-links',
+                 options['wheelhouse'], '-r', 'requirements.txt'])
+
+    if resolved.get('sphinx') == 'y':
+        if quickstart.available():
+            add('sphinx', "Sphinx quickstart in-process")
+        else:
+            add('sphinx', "sphinx-quickstart (subprocess)",
+                ['sphinx-quickstart', '-q', path], slow=True)
+
+    builtin = ('git', 'venv', 'sphinx', 'git_commit')
+    for step in external:
+        if step.name not in builtin:
+            add(step.name, "custom step")
+
+    return planned
+
+
+def plan(package_name, answers=None, options=None):
+    """
+    Work out what creating a package would do, without writing it: the
+    files with their sizes, the external tools and the caches involved, and
+    an estimate from the recorded timings of earlier runs. Custom file steps
+    must write through the tree writer of the context, as they should
+    :param package_name: The name of the package (and the directory)
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param options: Dictionary of run options
+    :return: Dictionary with the package path, files, bytes, external
+             steps, caches, estimate in seconds and the keys it lacks
+             history for
+    """
+
+    # Nothing is created, not even the cache directories or the probes
+    with read_only():
+        options = dict(options or {})
+        history = load_history()
+        path = os.path.abspath(core.target_path(package_name, options))
+        exists = os.path.exists(path)
+        update = bool(options.get('update')) and isdir(path)
+
+        tree, context = plan_files(package_name, path, answers, options)
+
+        caches = {}
+        if answers is not None and options.get('snapshot') and not update:
+            from alacrity import snapshots
+            with templates.use(core.template_store(options)):
+                key = snapshots.snapshot_key(context['answers'])
+            caches['snapshot'] = isdir(join(cache_dir('snapshots'), key))
+
+        actions = {}
+        if update:
+            actions = {planned: action for planned, (name, action, digest)
+                       in incremental.classify(tree, path).items()}
+
+        files = []
+        for planned in tree.written():
+            if planned in tree.copies:
+                size = os.path.getsize(tree.copies[planned])
+            else:
+                size = len(tree.encode(tree.files[planned]))
+            action = actions.get(planned) or ('replaced' if exists else
+                                              'created')
+            files.append({'path': incremental.relative(planned, path),
+                          'bytes': size, 'action': action,
+                          'copy': planned in tree.copies})
+
+        # The external questions are asked as a run would ask them, prompting
+        # when no answers were given
+        external = [] if update else \
+            plan_external(path, answers, options, history, context['answers'])
+        if options.get('venv_cache') and any(item['step'] == 'venv'
+                                             for item in external):
+            caches['venv_template'] = not any(item['slow'] for item in external
+                                              if item['step'] == 'venv')
+
+        # The file steps run together, then the external ones side by side
+        unknown = []
+        stages = []
+        for name in ('files',) if update else ('files', 'publish'):
+            seconds = estimate(history, name, options)
+            if seconds is None:
+                unknown.append(name)
+            stages.append(seconds or 0.0)
+        # The requirements are installed within the venv step and its timing
+        timed = [item for item in external
+                 if item['step'] != 'requirements_install']
+        concurrent = [item for item in timed if item['step'] != 'git_commit']
+        for item in timed:
+            if item['estimate'] is None:
+                unknown.append(variant(item['step'], options))
+        stages.append(max([item['estimate'] or 0.0 for item in concurrent] or
+                          [0.0]))
+        stages.extend(item['estimate'] or 0.0 for item in timed
+                      if item['step'] == 'git_commit')
+
+        return {'package_name': package_name, 'path': path, 'update': update,
+                'files': files,
+                'bytes': sum(item['bytes'] for item in files
+                             if item['action'] in ('created', 'replaced',
+                                                   'written')),
+                'external': external, 'caches': caches,
+                'estimate': sum(stages), 'unknown': unknown}
+
+
+def report(result):
+    """
+    Print a plan
+    :param result: Dictionary returned by plan()
+    :return: None
+    """
+
+    from clint.textui import colored
+
+    print(colored.green("[*] Plan for {} in {}{}".format(
+        result['package_name'], result['path'],
+        " (update)" if result['update'] else "")))
+    for item in result['files']:
+        print("    {:<9} {:>8}  {}{}".format(item['action'], item['bytes'],
+                                             item['path'],
+                                             " (copy)" if item['copy']
+                                             else ""))
+    print(colored.green("[*] {} files, {} bytes to write".format(
+        len(result['files']), result['bytes'])))
+
+    for item in result['external']:
+        line = "[*] {} : {}".format(item['step'], item['how'])
+        if item['command']:
+            line += " : {}".format(" ".join(str(part) for part in
+                                            item['command']))
+        print(colored.yellow(line + " (slow path)") if item['slow']
+              else line)
+
+    for name, hit in sorted(result['caches'].items()):
+        print("[*] Cache {} : {}".format(name, "hit" if hit else "miss"))
+
+    line = "[*] Estimated time : {:.2f}s".format(result['estimate'])
+    if result['unknown']:
+        line += " (no history for {})".format(", ".join(result['unknown']))
+    print(colored.green(line))
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+from os.path import join
+
+from alacrity import cache
+
+logger = logging.getLogger(__name__)
+
+# The capability cache lives next to persist.ini
+cache_path = join(os.path.dirname(os.path.abspath(__file__)), "tools.json")
+
+_lock = threading.RLock()
+_cache = None
+
+
+def environment_key():
+    """
+    Fingerprint the PATH contents so that installs and removals re-probe
+    :return: Hex digest of PATH and the modification times of its directories
+    """
+
+    search_path = os.environ.get('PATH', '')
+    parts = [search_path, sys.executable]
+
+    for directory in search_path.split(os.pathsep):
+        try:
+            parts.append(str(os.stat(directory).st_mtime_ns))
+        except OSError:
+            parts.append('-')
+
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+def load():
+    """
+    Load the capability cache, discarding it if PATH changed since it was
+    written
+    :return: Dictionary with the environment key and the probed tools
+    """
+
+    global _cache
+
+    with _lock:
+        if _cache is None:
+            key = environment_key()
+            try:
+                with open(cache_path, "r") as cache_file:
+                    data = json.load(cache_file)
+            except (IOError, ValueError):
+                data = {}
+
+            if data.get('environment') != key:
+                data = {'environment': key, 'tools': {}}
+            _cache = data
+
+        return _cache
+
+
+def save():
+    """
+    Write the capability cache atomically, ignoring read-only installs and
+    runs that leave the caches untouched (cache.read_only())
+    :return: None
+    """
+
+    with _lock:
+        if _cache is None or cache.is_read_only():
+            return
+
+        temp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        try:
+            with open(temp_path, "w") as cache_file:
+                json.dump(_cache, cache_file, indent=2)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            logger.debug("[-] Capability cache could not be written to "
+                         "{}".format(cache_path))
+
+
+def reset():
+    """
+    Forget every probed capability, forcing a re-probe on the next lookup
+    :return: None
+    """
+
+    global _cache
+
+    with _lock:
+        _cache = None
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+
+
+def is_fresh(entry):
+    """
+    Check that a cached tool was not replaced since it was probed
+    :param entry: The cached entry of the tool
+    :return: True or False
+    """
+
+    if entry.get('path') is None:
+        return True
+
+    try:
+        return os.stat(entry['path']).st_mtime_ns == entry.get('mtime')
+    except OSError:
+        return False
+
+
+def probe(name, version_args=None):
+    """
+    Resolve a tool and its version, running the probe only on a cache miss
+    :param name: The name of the executable
+    :param version_args: Arguments that make the tool print its version
+    :return: Dictionary with the path, mtime and version of the tool
+    """
+
+    with _lock:
+        tools = load()['tools']
+        entry = tools.get(name)
+
+        if entry is not None and is_fresh(entry):
+            return entry
+
+        path = shutil.which(name)
+        entry = {'path': path, 'mtime': None, 'version': None}
+
+        if path is not None:
+            entry['mtime'] = os.stat(path).st_mtime_ns
+            if version_args:
+                import subprocess
+                try:
+                    out = subprocess.check_output([path] + version_args,
+                                                  stderr=subprocess.STDOUT)
+                    entry['version'] = out.decode('utf-8').strip()
+                except (subprocess.CalledProcessError, OSError):
+                    logger.debug("[-] {} could not report its "
+                                 "version".format(name))
+
+        tools[name] = entry
+        save()
+
+        return entry
+
+
+def git():
+    """
+    Resolve the git executable
+    :return: Dictionary with the path, mtime and version of git
+    """
+
+    return probe('git', ['--version'])
+
+
+def sphinx():
+    """
+    Resolve sphinx-quickstart, marking it available only if it runs
+    :return: Dictionary with the path, version and availability of Sphinx
+    """
+
+    entry = probe('sphinx-quickstart', ['--version'])
+    version = entry['version'] or ''
+    return dict(entry, available=version.startswith('sphinx-quickstart'))
+
+
+def venv():
+    """
+    Resolve whether the running interpreter can create virtual environments
+    :return: Dictionary with the interpreter path, version and availability
+    """
+
+    with _lock:
+        tools = load()['tools']
+        entry = tools.get('venv')
+
+        if entry is not None and entry.get('path') == sys.executable and \
+                is_fresh(entry):
+            return entry
+
+        import importlib.util
+        entry = {
+            'path': sys.executable,
+            'mtime': os.stat(sys.executable).st_mtime_ns,
+            'version': '.'.join(str(i) for i in sys.version_info[:3]),
+            'available': importlib.util.find_spec('venv') is not None,
+            'ensurepip': importlib.util.find_spec('ensurepip') is not None
+        }
+
+        tools['venv'] = entry
+        save()
+
+        return entry
@@ -0,0 +1,102 @@
+import functools
+import locale
+import logging
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# sphinx-quickstart changes process wide state (locale, stdout), one run at
+# a time per process
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def available():
+    """
+    Check whether Sphinx is installed for this interpreter, without paying
+    for its import
+    :return: True or False
+    """
+
+    import importlib.util
+
+    return importlib.util.find_spec('sphinx') is not None
+
+
+@functools.lru_cache(maxsize=None)
+def load():
+    """
+    Import the quickstart of Sphinx, once per process
+    :return: sphinx.cmd.quickstart.main, or None if it cannot be imported
+    """
+
+    if not available():
+        return None
+
+    try:
+        from sphinx.cmd import quickstart
+    except Exception:
+        logger.exception("[!] Sphinx could not be imported, falling back "
+                         "to sphinx-quickstart")
+        return None
+
+    return quickstart.main
+
+
+class ThreadMutedStream(object):
+    """
+    Stream wrapper dropping what one thread writes, other threads (e.g. the
+    concurrent git and venv steps) still reach the wrapped stream
+    """
+
+    def __init__(self, stream, thread):
+        """
+        :param stream: The stream to wrap
+        :param thread: Identifier of the thread to silence
+        """
+
+        self.stream = stream
+        self.thread = thread
+
+    def write(self, data):
+        if threading.get_ident() == self.thread:
+            return len(data)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def run(path, project, author, version):
+    """
+    Create a Sphinx source dir at path, in-process when Sphinx is importable
+    and through the sphinx-quickstart executable otherwise
+    :param path: The directory of the documentation
+    :param project: The name of the project
+    :param author: The name of the author
+    :param version: The version of the project
+    :return: None, raises RuntimeError or CalledProcessError on failure
+    """
+
+    arguments = ['-q', '-p', project, '-a', author, '-v', version, path]
+
+    main = load()
+    if main is None:
+        import subprocess
+        subprocess.check_output(['sphinx-quickstart'] + arguments,
+                                stderr=subprocess.STDOUT)
+        return
+
+    with _lock:
+        saved_locale = locale.setlocale(locale.LC_ALL)
+        stdout = sys.stdout
+        sys.stdout = ThreadMutedStream(stdout, threading.get_ident())
+        try:
+            code = main(arguments)
+        finally:
+            sys.stdout = stdout
+            locale.setlocale(locale.LC_ALL, saved_locale)
+
+    if code:
+        raise RuntimeError("sphinx-quickstart exited with {}".format(code))
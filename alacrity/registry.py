@@ -0,0 +1,302 @@
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from os.path import join, expanduser
+
+from alacrity.cache import cache_dir, is_read_only
+from alacrity import templates
+
+logger = logging.getLogger(__name__)
+
+# Optional file of a template set giving its name, version and description
+manifest_name = 'template.json'
+# Bumped whenever the layout of the index or the compiled cache changes
+index_format = 2
+
+
+def search_paths():
+    """
+    List the directories holding user template sets, one set per
+    sub-directory: ALACRITY_TEMPLATE_PATH (os.pathsep separated) first, then
+    alacrity/templates in the user configuration directory
+    :return: List of directories
+    """
+
+    paths = [path for path in
+             os.environ.get('ALACRITY_TEMPLATE_PATH', '').split(os.pathsep)
+             if path]
+    config = os.environ.get('XDG_CONFIG_HOME') or expanduser('~/.config')
+    paths.append(join(config, 'alacrity', 'templates'))
+    return paths
+
+
+def parse_spec(spec):
+    """
+    Split a template set selector
+    :param spec: NAME or NAME@VERSION
+    :return: name, version or None for the latest one
+    """
+
+    name, _, version = spec.partition('@')
+    return name.strip(), version.strip() or None
+
+
+def version_key(version):
+    """
+    Sort key ordering versions numerically where they are numbers
+    :param version: Version string, e.g. 1.10.0
+    :return: Comparable tuple
+    """
+
+    return tuple((1, int(part), '') if part.isdigit() else (0, 0, part)
+                 for part in re.split(r'[.+-]', version))
+
+
+def mtime(path):
+    """
+    :param path: A file or directory
+    :return: Its modification time in nanoseconds, None if it is missing
+    """
+
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def scan(root):
+    """
+    Read the manifests of the template sets below a search directory
+    :param root: The search directory
+    :return: List of dictionaries with the name, version, description, path
+             and manifest modification time of each set
+    """
+
+    try:
+        entries = sorted(os.scandir(root), key=lambda item: item.name)
+    except OSError:
+        return []
+
+    sets = []
+    for entry in entries:
+        if entry.name.startswith('.') or not entry.is_dir():
+            continue
+        path = os.path.abspath(entry.path)
+        manifest = {}
+        try:
+            with open(join(path, manifest_name), "r") as obj:
+                manifest = json.load(obj)
+            if not isinstance(manifest, dict):
+                raise ValueError("Expected a JSON object")
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.warning("[!] Ignoring template set {} : {}".format(path, e))
+            continue
+        sets.append({'name': str(manifest.get('name') or entry.name),
+                     'version': str(manifest.get('version') or '0'),
+                     'description': str(manifest.get('description') or ''),
+                     'path': path,
+                     'manifest': mtime(join(path, manifest_name))})
+    return sets
+
+
+class TemplateRegistry(object):
+    """
+    Index of the user template sets by name and version, kept on disk so
+    that finding a set costs one file read and a stat per search directory,
+    with the compiled templates of each set cached next to it
+    """
+
+    def __init__(self, paths=None, cache=None):
+        """
+        :param paths: Search directories (None for search_paths())
+        :param cache: Directory of the index and compiled templates (None for
+                      the templates directory of the alacrity cache)
+        """
+
+        self.paths = [os.path.abspath(path) for path in
+                      (search_paths() if paths is None else paths)]
+        self.cache = cache
+        self.scans = 0
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def cache_path(self, *parts):
+        cache = self.cache or cache_dir('templates')
+        if not is_read_only():
+            os.makedirs(join(cache, *parts[:-1]), exist_ok=True)
+        return join(cache, *parts)
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as obj:
+                return obj.read()
+        except OSError:
+            return None
+
+    def _write(self, path, data):
+        if is_read_only():
+            return
+        # Concurrent runs may rebuild the same file, the last rename wins
+        partial = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(partial, "wb") as obj:
+                obj.write(data)
+            os.replace(partial, path)
+        except OSError:
+            logger.debug("[-] Could not write {}".format(path), exc_info=True)
+
+    def index(self, rebuild=(), rebuild_all=False):
+        """
+        List the template sets, rescanning only the search directories that
+        changed since the index was written
+        :param rebuild: Search directories to rescan regardless
+        :param rebuild_all: Rescan every search directory
+        :return: List of set dictionaries, sorted by name and version
+        """
+
+        with self._lock:
+            try:
+                stored = json.loads(
+                    (self._read(self.cache_path('index.json')) or
+                     b'{}').decode('utf-8'))
+            except ValueError:
+                stored = {}
+            if stored.get('format') != index_format:
+                stored = {'format': index_format, 'roots': {}}
+
+            changed = False
+            for root in self.paths:
+                key = mtime(root)
+                entry = stored['roots'].get(root)
+                if rebuild_all or root in rebuild or entry is None or \
+                        entry['key'] != key:
+                    self.scans += 1
+                    stored['roots'][root] = {'key': key, 'sets': scan(root)}
+                    changed = True
+
+            if changed:
+                self._write(self.cache_path('index.json'),
+                            json.dumps(stored, sort_keys=True).encode('utf-8'))
+
+        sets = {}
+        # Earlier search directories take precedence
+        for root in reversed(self.paths):
+            for item in stored['roots'][root]['sets']:
+                sets[(item['name'], item['version'])] = dict(item, root=root)
+        return sorted(sets.values(), key=lambda item: (
+            item['name'], version_key(item['version'])))
+
+    def lookup(self, spec):
+        """
+        Find a template set
+        :param spec: NAME for its latest version or NAME@VERSION
+        :return: The set dictionary, raises ValueError if it is unknown
+        """
+
+        name, version = parse_spec(spec)
+        for attempt in range(2):
+            matches = [item for item in self.index()
+                       if item['name'] == name and
+                       (version is None or item['version'] == version)]
+            if not matches:
+                break
+            found = matches[-1]
+            # Manifests edited in place leave the search directory untouched
+            if mtime(join(found['path'], manifest_name)) == \
+                    found['manifest']:
+                return found
+            self.index(rebuild=(found['root'],))
+            if attempt:
+                return found
+
+        raise ValueError("Unknown template set {}".format(spec))
+
+    def compiled_path(self, path):
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:20]
+        return self.cache_path('compiled', digest + '.json')
+
+    def store(self, spec):
+        """
+        Return the template store of a set, with the starters as fall back
+        for the files the set does not override and its templates preloaded
+        from the compiled cache
+        :param spec: NAME or NAME@VERSION
+        :return: TemplateStore, one per set and process
+        """
+
+        path = self.lookup(spec)['path']
+        with self._lock:
+            store = self._stores.get(path)
+            if store is not None:
+                return store
+            store = templates.TemplateStore(path, parent=templates.store)
+            self._stores[path] = store
+
+        data = self._read(self.compiled_path(path))
+        if data:
+            try:
+                cached = json.loads(data.decode('utf-8'))
+                if cached['format'] == index_format:
+                    store.preload(cached['templates'])
+            except Exception:
+                logger.debug("[-] Ignoring the compiled cache of {}".format(
+                    path), exc_info=True)
+        return store
+
+    def save(self, store):
+        """
+        Write the compiled templates of a set to the cache, if any template
+        was compiled since it was loaded
+        :param store: TemplateStore returned by store()
+        :return: None
+        """
+
+        if not store.dirty:
+            return
+        data = json.dumps({'format': index_format,
+                           'templates': store.export()}).encode('utf-8')
+        self._write(self.compiled_path(store.root), data)
+
+
+@functools.lru_cache(maxsize=None)
+def default():
+    """
+    Return the registry of the default search directories, once per process
+    :return: TemplateRegistry
+    """
+
+    return TemplateRegistry()
+
+
+def main(argv=None):
+    """
+    Entry point for alacrity templates, lists the user template sets
+    :param argv: The command line arguments after the templates keyword
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(prog="alacrity templates",
+                                     description="Alacrity : List the user "
+                                                 "template sets")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Rescan every search directory")
+    args = parser.parse_args(argv)
+
+    registry = default()
+    sets = registry.index(rebuild_all=args.rebuild)
+    if not sets:
+        print("[!] No template sets found in {}".format(
+            os.pathsep.join(registry.paths)))
+        return
+
+    for item in sets:
+        print("{}@{}  {}".format(item['name'], item['version'], item['path']))
+        if item['description']:
+            print("    {}".format(item['description']))
@@ -0,0 +1,301 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from alacrity import batch
+from alacrity import core
+from alacrity import lib
+from alacrity import probes
+from alacrity import quickstart
+from alacrity import templates
+from alacrity import venvs
+from alacrity.tree import durability_levels
+from alacrity.version import __version__
+
+# Options a request may set for its own package, everything else (root,
+# caches, wheelhouse) is fixed when the server starts
+request_options = ('snapshot', 'git_commit', 'durability', 'venv_without_pip',
+                   'venv_copies', 'venv_system_site_packages', 'template',
+                   'update')
+# Largest request body accepted, in bytes
+max_body = 1 << 20
+
+
+def warm(options):
+    """
+    Load everything a scaffold request reuses: templates, tool probes, Sphinx
+    and the cached template environment
+    :param options: Dictionary of server options
+    :return: None
+    """
+
+    for entry in os.scandir(templates.starters_path):
+        if entry.is_file():
+            templates.store.compiled(entry.name)
+
+    if options.get('template'):
+        from alacrity import registry
+        registry.default().store(options['template'])
+
+    lib.find_tool('git')
+    lib.git_identity()
+    probes.venv()
+    if quickstart.available():
+        quickstart.load()
+    else:
+        probes.sphinx()
+
+    if options.get('venv_cache'):
+        try:
+            venvs.ensure_template(**venvs.settings(options))
+        except Exception:
+            logging.exception("[!] Template environment could not be built")
+
+
+class ScaffoldHandler(BaseHTTPRequestHandler):
+    """
+    Serves POST /scaffold with a JSON body of answers, GET /health and
+    GET /stats
+    """
+
+    server_version = "alacrity/" + __version__
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'version': __version__})
+        elif self.path == '/stats':
+            self.send_json(200, {'templates': templates.store.stats(),
+                                 'active': self.server.active()})
+        else:
+            self.send_json(404, {'error': "Unknown path"})
+
+    def do_POST(self):
+        if self.path != '/scaffold':
+            self.send_json(404, {'error': "Unknown path"})
+            return
+
+        # Browsers add an Origin to cross-site requests, and only send JSON
+        # after a preflight the server never answers
+        if self.headers.get('Origin') is not None:
+            self.send_json(403, {'error': "Cross-origin requests are not "
+                                          "accepted"})
+            return
+        if self.headers.get_content_type() != 'application/json':
+            self.send_json(415, {'error': "Content-Type must be "
+                                          "application/json"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > max_body:
+                raise ValueError("Request body is too large")
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            answers = dict(body.get('answers') or body)
+            options = dict(body.get('options') or {})
+        except (ValueError, AttributeError, TypeError) as e:
+            self.send_json(400, {'error': "Invalid request : {}".format(e)})
+            return
+
+        package_name = str(answers.get('package_name') or
+                           answers.get('name') or '').strip()
+        if not lib.valid_name(package_name):
+            self.send_json(400, {'error': "Invalid package_name"})
+            return
+        answers['package_name'] = package_name
+
+        if 'venv_name' in answers and \
+                not lib.valid_venv_name(str(answers['venv_name'])):
+            self.send_json(400, {'error': "Invalid venv_name"})
+            return
+        if options.get('durability', 'none') not in durability_levels:
+            error = "Invalid durability, expected one of {}".format(
+                ", ".join(durability_levels))
+            self.send_json(400, {'error': error})
+            return
+
+        code, record = self.server.scaffold(answers, options)
+        self.send_json(code, record)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else '-'
+
+    def log_message(self, format, *args):
+        logging.debug("[-] {} {}".format(self.address_string(),
+                                         format % args))
+
+
+class ScaffoldMixIn(ThreadingMixIn):
+    """
+    Request threads share the warm caches, scaffolding itself is bounded by
+    a semaphore and a package name is only generated by one request at once
+    """
+
+    daemon_threads = True
+
+    def setup_scaffold(self, options, workers):
+        """
+        :param options: Dictionary of server options
+        :param workers: Number of packages generated concurrently
+        """
+
+        self.options = options
+        self.slots = threading.BoundedSemaphore(workers)
+        self.lock = threading.Lock()
+        self.building = set()
+
+    def active(self):
+        with self.lock:
+            return sorted(self.building)
+
+    def scaffold(self, answers, requested):
+        """
+        Generate one package
+        :param answers: Dictionary of answers for the package
+        :param requested: Dictionary of per-request options
+        :return: HTTP status code, status record
+        """
+
+        package_name = answers['package_name']
+        options = dict(self.options)
+        options.update((key, requested[key]) for key in request_options
+                       if key in requested)
+        path = os.path.abspath(core.target_path(package_name, options))
+
+        with self.lock:
+            if package_name in self.building or \
+                    (os.path.exists(path) and not options.get('update')):
+                record = batch.failed_record(answers, "A package by that "
+                                                      "name already exists")
+                record['path'] = path
+                return 409, record
+            self.building.add(package_name)
+
+        try:
+            with self.slots:
+                record = batch.run_entry(answers, options)
+        finally:
+            with self.lock:
+                self.building.discard(package_name)
+
+        record['path'] = path
+        return (500 if record['error'] else 200), record
+
+
+class ScaffoldServer(ScaffoldMixIn, HTTPServer):
+    """ Scaffold server on a localhost TCP port """
+
+
+if hasattr(socket, 'AF_UNIX'):
+    from socketserver import UnixStreamServer
+
+    class UnixScaffoldServer(ScaffoldMixIn, UnixStreamServer):
+        """ Scaffold server on a Unix domain socket """
+else:
+    UnixScaffoldServer = None
+
+
+def make_server(options, workers=None, socket_path=None,
+                host='127.0.0.1', port=8765):
+    """
+    Create a scaffold server with warm caches
+    :param options: Dictionary of server options
+    :param workers: Number of packages generated concurrently
+    :param socket_path: Listen on this Unix domain socket instead of TCP
+    :param host: The address to listen on
+    :param port: The TCP port to listen on (0 picks a free port)
+    :return: The server, not yet serving
+    """
+
+    if socket_path:
+        if UnixScaffoldServer is None:
+            raise ValueError("Unix domain sockets are not supported here")
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # Only a socket left by an earlier server is replaced
+            if not stat.S_ISSOCK(mode):
+                raise ValueError("{} exists and is not a socket".format(
+                    socket_path))
+            os.remove(socket_path)
+
+    if options.get('root'):
+        os.makedirs(options['root'], exist_ok=True)
+
+    warm(options)
+
+    if socket_path:
+        server = UnixScaffoldServer(socket_path, ScaffoldHandler)
+    else:
+        server = ScaffoldServer((host, port), ScaffoldHandler)
+
+    server.setup_scaffold(options, workers or os.cpu_count() or 1)
+    return server
+
+
+def main(argv=None):
+    """
+    Entry point for alacrity serve
+    :param argv: The command line arguments after the serve keyword
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(prog="alacrity serve",
+                                     description="Alacrity : Create packages "
+                                                 "on request over HTTP")
+    parser.add_argument('--debug', action='store_true', help="Display verbose "
+                                                             "debug messages")
+    parser.add_argument('--socket', metavar='PATH',
+                        help="Listen on a Unix domain socket")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Address to listen on (default 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="TCP port to listen on (default 8765)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Number of packages created concurrently")
+    core.add_options(parser)
+
+    args = parser.parse_args(argv)
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.CRITICAL)
+
+    try:
+        server = make_server(vars(args), workers=args.workers,
+                             socket_path=args.socket, host=args.host,
+                             port=args.port)
+    except ValueError as e:
+        print("[!] {}".format(e))
+        sys.exit(1)
+
+    print("[*] Serving on {}".format(
+        args.socket or "http://{}:{}".format(*server.server_address[:2])))
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[!] Ctrl+C : Stopping the server.")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
@@ -0,0 +1,159 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+from os.path import join, isdir
+
+from alacrity.cache import cache_dir
+from alacrity import templates
+from alacrity.trace import traced
+from alacrity.tree import copy_file
+
+logger = logging.getLogger(__name__)
+
+# Stand-in for the package sub-directory inside a snapshot
+package_placeholder = '__package__'
+# Files rendered from the package name, never stored in a snapshot
+name_dependent = ('setup.py', 'README.rst')
+# Answers that change the rendered tree
+answer_keys = ('version', 'desc', 'author', 'author_email', 'license')
+# Status keys a snapshot stands in for
+snapshot_tasks = ('structure_created', 'gitignore_created', 'license_created',
+                  'manifest_created', 'requirements_created', 'tests_created')
+
+
+def template_versions():
+    """
+    Fingerprint the templates of this thread by directory, name, size and
+    modification time
+    :return: List of [directory, name, size, mtime_ns]
+    """
+
+    versions = []
+    for root in templates.current().roots():
+        for entry in sorted(os.scandir(root), key=lambda item: item.name):
+            if entry.is_file():
+                stat = entry.stat()
+                versions.append([root, entry.name, stat.st_size,
+                                 stat.st_mtime_ns])
+    return versions
+
+
+def snapshot_key(answers):
+    """
+    Hash the template versions and the normalised answers of a package
+    :param answers: Dictionary of answers for the package
+    :return: Hex digest identifying the rendered tree
+    """
+
+    normalised = {key: str(answers.get(key) or '').strip()
+                  for key in answer_keys}
+    # The license text carries the year it was generated in
+    normalised['year'] = str(datetime.date.today().year)
+
+    payload = json.dumps([template_versions(), normalised], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def clone_file(source, destination):
+    """
+    Copy a file, sharing its blocks through a reflink where supported
+    :param source: The existing file
+    :param destination: The path to create
+    :return: None
+    """
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        copy_file(src.fileno(), dst.fileno())
+    shutil.copystat(source, destination)
+
+
+def copy_tree(source, destination, rename):
+    """
+    Copy a directory tree, renaming top level entries on the way
+    :param source: The directory to copy
+    :param destination: The directory to create
+    :param rename: Dictionary of top level names to replace
+    :return: None
+    """
+
+    os.makedirs(destination, exist_ok=True)
+    for entry in os.scandir(source):
+        target = join(destination, rename.get(entry.name, entry.name))
+        if entry.is_dir(follow_symlinks=False):
+            copy_tree(entry.path, target, {})
+        else:
+            clone_file(entry.path, target)
+
+
+@traced('snapshot.materialize')
+def materialize(answers, path, package_name, status):
+    """
+    Create the package tree at path from the cached snapshot, if any
+    :param answers: Dictionary of answers for the package
+    :param path: The directory of the package
+    :param package_name: The name of the package
+    :param status: Dictionary containing the workflow status
+    :return: True on a cache hit, False otherwise
+    """
+
+    snapshot = join(cache_dir('snapshots'), snapshot_key(answers))
+    if not isdir(snapshot):
+        return False
+
+    with open(join(snapshot, 'status.json'), "r") as status_file:
+        tasks = json.load(status_file)
+
+    copy_tree(join(snapshot, 'tree'), path,
+              {package_placeholder: package_name})
+
+    for task in tasks:
+        status[task] = True
+
+    logger.debug("[-] Package materialized from snapshot "
+                 "{}".format(snapshot))
+    return True
+
+
+@traced('snapshot.store')
+def store(answers, path, package_name, status):
+    """
+    Save the name independent files of a freshly generated package
+    :param answers: Dictionary of answers for the package
+    :param path: The directory of the package
+    :param package_name: The name of the package
+    :param status: Dictionary containing the workflow status
+    :return: None
+    """
+
+    snapshot = join(cache_dir('snapshots'), snapshot_key(answers))
+    if isdir(snapshot):
+        return
+
+    # Assemble next to the final location, publish with one rename
+    build_path = "{}.build-{}".format(snapshot, os.getpid())
+    tree = join(build_path, 'tree')
+    os.makedirs(tree)
+
+    try:
+        for entry in os.scandir(path):
+            if entry.name in name_dependent:
+                continue
+            target = join(tree, package_placeholder
+                          if entry.name == package_name else entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                copy_tree(entry.path, target, {})
+            else:
+                clone_file(entry.path, target)
+
+        with open(join(build_path, 'status.json'), "w") as status_file:
+            json.dump([task for task in snapshot_tasks if status.get(task)],
+                      status_file)
+
+        os.rename(build_path, snapshot)
+    except OSError:
+        logger.debug("[-] Snapshot could not be stored at "
+                     "{}".format(snapshot))
+        shutil.rmtree(build_path, ignore_errors=True)
@@ -0,0 +1,363 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from alacrity import cache
+from alacrity import lib
+from alacrity import templates
+from alacrity.trace import span
+
+logger = logging.getLogger(__name__)
+
+# files: render into the staged tree before it is published
+# external: run in the published package (git, venv, sphinx, ...)
+stages = ('files', 'external')
+
+
+class StepSkipped(RuntimeError):
+    """
+    Reported for a step that did not run because a step it waits for failed
+    """
+
+
+class Step(object):
+    """
+    A unit of the workflow: a function of the shared context, with the
+    artifacts it needs and the artifacts it produces
+    """
+
+    def __init__(self, name, func, stage='files', requires=(), provides=(),
+                 questions=(), snapshot=False):
+        """
+        :param name: Unique name of the step, also its timings key
+        :param func: Called with the context dictionary, may return a
+                     dictionary of values to add to the context
+        :param stage: One of stages
+        :param requires: Artifacts that must be produced before the step runs
+        :param provides: Artifacts the step produces (several steps may
+                         provide the same artifact, its consumers wait for
+                         all of them)
+        :param questions: (key, message, default) tuples asked before the
+                          stage starts, message may hold a {} for the default
+                          and default may be a callable
+        :param snapshot: Whether a package snapshot stands in for the output
+        """
+
+        if stage not in stages:
+            raise ValueError("Unknown stage {}".format(stage))
+
+        self.name = name
+        self.func = func
+        self.stage = stage
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        self.questions = tuple(questions)
+        self.snapshot = snapshot
+
+    def __repr__(self):
+        return "Step({!r}, stage={!r})".format(self.name, self.stage)
+
+
+class StepRegistry(object):
+    """
+    Ordered collection of the workflow steps, built-in and custom
+    """
+
+    def __init__(self):
+        # Registration order is the prompt order, dicts keep no order
+        # before Python 3.7
+        self._steps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, step):
+        """
+        Register a step, replacing any step of the same name
+        :param step: The Step to register
+        :return: The step
+        """
+
+        with self._lock:
+            self._steps.pop(step.name, None)
+            self._steps[step.name] = step
+        return step
+
+    def remove(self, name):
+        """
+        Unregister a step
+        :param name: The name of the step
+        :return: The removed Step, or None
+        """
+
+        with self._lock:
+            return self._steps.pop(name, None)
+
+    def get(self, name):
+        return self._steps.get(name)
+
+    def stage(self, stage, snapshot=None):
+        """
+        List the steps of a stage in registration order
+        :param stage: One of stages
+        :param snapshot: Only keep steps whose snapshot flag matches (None to
+                         keep every step)
+        :return: List of Step
+        """
+
+        with self._lock:
+            return [step for step in self._steps.values()
+                    if step.stage == stage and
+                    (snapshot is None or step.snapshot == snapshot)]
+
+
+# Process wide registry holding the built-in steps
+registry = StepRegistry()
+
+
+def register(name, stage='files', requires=(), provides=(), questions=(),
+             snapshot=False):
+    """
+    Decorate a function of the context as a workflow step
+    :param name: Unique name of the step
+    :param stage: One of stages
+    :param requires: Artifacts that must be produced before the step runs
+    :param provides: Artifacts the step produces
+    :param questions: (key, message, default) tuples asked up front
+    :param snapshot: Whether a package snapshot stands in for the output
+    :return: The decorator
+    """
+
+    def decorator(func):
+        registry.add(Step(name, func, stage, requires, provides, questions,
+                          snapshot))
+        return func
+    return decorator
+
+
+def dependencies(steps, provided=()):
+    """
+    Resolve which steps each step waits for
+    :param steps: List of Step
+    :param provided: Artifacts that are already available
+    :return: Dictionary of step name to the set of step names it waits for
+    """
+
+    providers = {}
+    for step in steps:
+        for artifact in step.provides:
+            providers.setdefault(artifact, set()).add(step.name)
+
+    waits = {}
+    for step in steps:
+        waits[step.name] = set()
+        for artifact in step.requires:
+            if artifact not in providers:
+                if artifact in provided:
+                    continue
+                raise ValueError("Step {} requires {}, which no step "
+                                 "provides".format(step.name, artifact))
+            waits[step.name] |= providers[artifact] - {step.name}
+
+    # Reject cycles up front rather than waiting forever
+    resolved = set()
+    remaining = dict(waits)
+    while remaining:
+        ready = [name for name, names in remaining.items()
+                 if names <= resolved]
+        if not ready:
+            raise ValueError("Steps {} depend on each other".format(
+                ", ".join(sorted(remaining))))
+        for name in ready:
+            resolved.add(name)
+            del remaining[name]
+
+    return waits
+
+
+def ask_questions(steps, answers=None, resolved=None):
+    """
+    Gather the answers of every step before any of them runs, so steps on
+    worker threads never wait on input()
+    :param steps: List of Step
+    :param answers: Dictionary of pre-supplied answers (None to prompt)
+    :param resolved: Dictionary of answers gathered so far
+    :return: Dictionary of answers covering every question
+    """
+
+    resolved = dict(answers or {}) if resolved is None else resolved
+    asked = set()
+    for step in steps:
+        for key, message, default in step.questions:
+            if key in asked:
+                continue
+            asked.add(key)
+            if callable(default):
+                default = default()
+            resolved[key] = lib.ask(message.format(default), answers, key,
+                                    default)
+    return resolved
+
+
+def run(steps, context, workers=None, provided=()):
+    """
+    Run steps concurrently on a thread pool, each as soon as the steps it
+    waits for have finished
+    :param steps: List of Step
+    :param context: Dictionary shared by the steps (status, timings, ...),
+                    extended with the values the steps return
+    :param workers: Maximum number of concurrent steps
+    :param provided: Artifacts that are already available
+    :return: Dictionary of step name to the exception it raised, steps
+             waiting on a failed step are skipped and reported as well
+    """
+
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    waits = dependencies(steps, provided)
+    by_name = {step.name: step for step in steps}
+    timings = context.get('timings')
+    silenced = lib.is_quiet()
+    store = templates.current()
+    frozen = cache.is_read_only()
+    lock = threading.Lock()
+
+    def execute(step):
+        # Worker threads inherit the output setting, templates and cache
+        # mode of the caller
+        with lib.quiet(silenced), templates.use(store), \
+                cache.read_only(frozen), span(step.name, 'step'):
+            start = time.perf_counter()
+            try:
+                values = step.func(context)
+            finally:
+                if timings is not None:
+                    timings[step.name] = time.perf_counter() - start
+        if values:
+            with lock:
+                context.update(values)
+
+    pending = [step.name for step in steps]
+    done = set()
+    failures = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers or len(steps) or 1) as pool:
+        while pending or running:
+            for name in list(pending):
+                if waits[name] & set(failures):
+                    pending.remove(name)
+                    failures[name] = StepSkipped("Skipped, {} failed".format(
+                        ", ".join(sorted(waits[name] & set(failures)))))
+                elif waits[name] <= done:
+                    pending.remove(name)
+                    running[pool.submit(execute, by_name[name])] = name
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    done.add(name)
+                else:
+                    logger.error("[!] Step {} failed".format(name),
+                                 exc_info=error)
+                    failures[name] = error
+
+    return failures
+
+
+@register('structure', provides=('structure',), snapshot=True)
+def structure_step(context):
+    lib.create_package_structure(context['package_name'], context['status'],
+                                 root=context['path'], tree=context['tree'])
+
+
+@register('gitignore', requires=('structure',), snapshot=True)
+def gitignore_step(context):
+    lib.create_git_ignore(context['path'], context['status'],
+                          tree=context['tree'])
+
+
+@register('setup', requires=('structure',), provides=('author', 'version'),
+          questions=(('version', "[*] Enter the initial version: ", ''),
+                     ('desc', "[*] Enter a brief description: ", ''),
+                     ('author', "[*] Enter author name [{}]: ",
+                      lambda: lib.git_identity()[0]),
+                     ('author_email', "[*] Enter author email [{}]: ",
+                      lambda: lib.git_identity()[1])))
+def setup_step(context):
+    author, version = lib.create_setup(context['path'], context['status'],
+                                       answers=context['answers'],
+                                       name=context['package_name'],
+                                       tree=context['tree'])
+    return {'author': author, 'version': version}
+
+
+@register('license', requires=('structure', 'author'), snapshot=True,
+          questions=(('license', "[*] Choose a license [mit/apache/gpl3]: ",
+                      ''),))
+def license_step(context):
+    lib.create_license(context['path'], context['author'], context['status'],
+                       answers=context['answers'], tree=context['tree'])
+
+
+@register('manifest', requires=('structure',), snapshot=True)
+def manifest_step(context):
+    lib.create_manifest(context['path'], context['status'],
+                        tree=context['tree'])
+
+
+@register('readme', requires=('structure',))
+def readme_step(context):
+    lib.create_readme(context['path'], context['status'],
+                      name=context['package_name'], tree=context['tree'])
+
+
+@register('requirements', requires=('structure',), snapshot=True)
+def requirements_step(context):
+    lib.create_requirements(context['path'], context['status'],
+                            tree=context['tree'])
+
+
+@register('tests', requires=('structure',), snapshot=True)
+def tests_step(context):
+    lib.create_tests_package(context['path'], context['status'],
+                             tree=context['tree'])
+
+
+@register('git', stage='external', provides=('git',))
+def git_step(context):
+    lib.git_init(context['path'], context['status'],
+                 answers=context['answers'], options=context['options'])
+
+
+@register('venv', stage='external', provides=('venv', 'tree'))
+def venv_step(context):
+    lib.venv_init(context['path'], context['status'],
+                  answers=context['answers'], options=context['options'],
+                  timings=context['timings'])
+
+
+@register('sphinx', stage='external', provides=('docs', 'tree'))
+def sphinx_step(context):
+    lib.sphinx_init(context['path'], context['author'], context['version'],
+                    context['status'], answers=context['answers'])
+
+
+@register('git_commit', stage='external', requires=('git', 'tree'))
+def git_commit_step(context):
+    import os
+
+    answers = context['answers']
+    # The first commit needs every step providing tree to have written
+    # its files
+    if (context['options'] or {}).get('git_commit') and \
+            answers.get('git') == 'y' and \
+            os.path.isdir(os.path.join(context['path'], '.git')):
+        exclude = [answers['venv_name']] if answers.get('venv') == 'y' \
+            else []
+        lib.git_commit(context['path'], context['author'], context['status'],
+                       answers=answers, exclude=exclude)
@@ -0,0 +1,337 @@
+import contextlib
+import os
+import re
+import threading
+from os.path import join
+
+starters_path = join(os.path.dirname(os.path.abspath(__file__)), "starters")
+
+# [@name] inserts a value, [@#name]...[@/name] renders a section once for a
+# truthy value or once per item of a list, [@^name]...[@/name] renders when
+# the value is missing or falsy and [@.] is the current item inside a loop
+token_pattern = re.compile(r"\[@([#^/]?)([\w.]+)\]")
+
+
+class TemplateSyntaxError(ValueError):
+    """
+    Raised when the sections of a template are not balanced
+    """
+
+
+def parse(text):
+    """
+    Parse the [@...] tokens of a template into a tree of nodes
+    :param text: The source of the template
+    :return: List of ('text', str), ('var', name, raw) and
+             ('section', name, inverted, children) nodes
+    """
+
+    root = []
+    stack = [(None, root)]
+    position = 0
+
+    for match in token_pattern.finditer(text):
+        if match.start() > position:
+            stack[-1][1].append(('text', text[position:match.start()]))
+        position = match.end()
+
+        kind, name = match.group(1), match.group(2)
+        if kind in ('#', '^'):
+            children = []
+            stack[-1][1].append(('section', name, kind == '^', children))
+            stack.append((name, children))
+        elif kind == '/':
+            if stack[-1][0] != name:
+                raise TemplateSyntaxError("Unexpected [@/{}] at offset "
+                                          "{}".format(name, match.start()))
+            stack.pop()
+        else:
+            stack[-1][1].append(('var', name, match.group(0)))
+
+    if len(stack) > 1:
+        raise TemplateSyntaxError("Unclosed section [@#{}]".format(
+            stack[-1][0]))
+
+    if position < len(text):
+        root.append(('text', text[position:]))
+
+    return root
+
+
+class CompiledTemplate(object):
+    """
+    A template parsed once and rendered in a single pass
+    """
+
+    def __init__(self, text):
+        """
+        :param text: The source of the template
+        """
+
+        self.text = text
+        self.nodes = parse(text)
+        # Templates without tokens are emitted as they are
+        self.verbatim = all(node[0] == 'text' for node in self.nodes)
+
+    @classmethod
+    def from_nodes(cls, text, nodes):
+        """
+        Rebuild a compiled template from nodes parsed earlier, without
+        parsing the text again
+        :param text: The source of the template
+        :param nodes: The nodes parse() returned for text, tuples may have
+                      been turned into lists by a JSON round trip
+        :return: CompiledTemplate
+        """
+
+        def thaw(nodes):
+            return [(node[0], node[1], node[2], thaw(node[3]))
+                    if node[0] == 'section' else tuple(node)
+                    for node in nodes]
+
+        template = cls.__new__(cls)
+        template.text = text
+        template.nodes = thaw(nodes)
+        template.verbatim = all(node[0] == 'text' for node in nodes)
+        return template
+
+    def render(self, context):
+        """
+        Render the template with the values in context
+        :param context: Dictionary of values for the tokens
+        :return: The rendered text
+        """
+
+        if self.verbatim:
+            return self.text
+
+        parts = []
+        self._render(self.nodes, [context], parts)
+        return ''.join(parts)
+
+    def _render(self, nodes, scopes, parts):
+        for node in nodes:
+            if node[0] == 'text':
+                parts.append(node[1])
+            elif node[0] == 'var':
+                value = lookup(node[1], scopes)
+                # Unknown tokens are left in place, like str.replace did
+                parts.append(node[2] if value is None else str(value))
+            else:
+                name, inverted, children = node[1], node[2], node[3]
+                value = lookup(name, scopes)
+                if inverted:
+                    if not value:
+                        self._render(children, scopes, parts)
+                elif isinstance(value, (list, tuple)):
+                    for item in value:
+                        self._render(children, scopes + [item], parts)
+                elif value:
+                    self._render(children, scopes + [value], parts)
+
+
+def lookup(name, scopes):
+    """
+    Resolve a token name against the innermost scope that defines it
+    :param name: The token name, '.' for the current item
+    :param scopes: List of contexts, innermost last
+    :return: The value or None
+    """
+
+    if name == '.':
+        return scopes[-1]
+    for scope in reversed(scopes):
+        if isinstance(scope, dict) and name in scope:
+            return scope[name]
+    return None
+
+
+class TemplateStore(object):
+    """
+    In-memory cache of template files, keyed by path and modification time
+    """
+
+    def __init__(self, root, parent=None):
+        """
+        :param root: The directory holding the template files
+        :param parent: TemplateStore serving the templates root does not
+                       hold (e.g. the bundled starters under a user set)
+        """
+
+        self.root = root
+        self.parent = parent
+        self.hits = 0
+        self.misses = 0
+        # Whether templates were compiled since the last preload or export
+        self.dirty = False
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def roots(self):
+        """
+        List the directories templates are looked up in
+        :return: List of directories, the first one wins
+        """
+
+        return [self.root] + (self.parent.roots() if self.parent else [])
+
+    def path(self, name):
+        """
+        Resolve the path of a template
+        :param name: The file name of the template
+        :return: The full path of the template
+        """
+
+        return join(self.root, name)
+
+    def locate(self, name):
+        """
+        Resolve the file a template is read from, in this store or a parent
+        :param name: The file name of the template
+        :return: The full path of the template
+        """
+
+        path = self.path(name)
+        if self.parent is not None and not os.path.exists(path):
+            return self.parent.locate(name)
+        return path
+
+    def get(self, name):
+        """
+        Return the text of a template, reading it only if it changed on disk
+        :param name: The file name of the template
+        :return: The contents of the template
+        """
+
+        return self._entry(name)[0]
+
+    def compiled(self, name):
+        """
+        Return the compiled form of a template, compiling it once per version
+        :param name: The file name of the template
+        :return: CompiledTemplate
+        """
+
+        entry = self._entry(name)
+        if entry[1] is None:
+            entry[1] = CompiledTemplate(entry[0])
+            self.dirty = True
+        return entry[1]
+
+    def render(self, name, context):
+        """
+        Render a template with the values in context
+        :param name: The file name of the template
+        :param context: Dictionary of values for the tokens
+        :return: The rendered text
+        """
+
+        return self.compiled(name).render(context)
+
+    def _entry(self, name):
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if self.parent is None:
+                raise
+            return self.parent._entry(name)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+
+        with open(path, "r") as template:
+            text = template.read()
+
+        # [text, compiled template]
+        entry = [text, None]
+        with self._lock:
+            # Stale entries for the same path are evicted by the overwrite
+            self._entries[path] = (key, entry)
+            self.misses += 1
+
+        return entry
+
+    def export(self):
+        """
+        Dump the compiled templates of this store, not of its parent
+        :return: Dictionary of path to (key, text, nodes)
+        """
+
+        with self._lock:
+            self.dirty = False
+            return {path: (key, entry[0], entry[1].nodes)
+                    for path, (key, entry) in self._entries.items()
+                    if entry[1] is not None}
+
+    def preload(self, exported):
+        """
+        Seed the store with templates compiled earlier, each one is still
+        checked against its file before use
+        :param exported: Dictionary as returned by export()
+        :return: None
+        """
+
+        with self._lock:
+            for path, (key, text, nodes) in exported.items():
+                self._entries.setdefault(
+                    path, (tuple(key),
+                           [text, CompiledTemplate.from_nodes(text, nodes)]))
+
+    def stats(self):
+        """
+        Report the cache counters
+        :return: Dictionary with hits, misses and the number of entries
+        """
+
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries)}
+
+    def clear(self):
+        """
+        Drop every cached template and reset the counters
+        :return: None
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Process wide store of the bundled starter templates
+store = TemplateStore(starters_path)
+
+# Store selected by use() for the current thread
+_active = threading.local()
+
+
+def current():
+    """
+    Return the store templates are rendered from on this thread
+    :return: TemplateStore, the starters unless use() selected another one
+    """
+
+    return getattr(_active, 'store', None) or store
+
+
+@contextlib.contextmanager
+def use(selected):
+    """
+    Render templates from another store on this thread while the context is
+    active
+    :param selected: TemplateStore (None keeps the current one)
+    """
+
+    previous = getattr(_active, 'store', None)
+    if selected is not None:
+        _active.store = selected
+    try:
+        yield current()
+    finally:
+        _active.store = previous
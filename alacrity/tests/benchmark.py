@@ -0,0 +1,303 @@
+# Benchmarks for the lib.py functions and end-to-end package creation
+#
+# Run with: python -m alacrity.tests.benchmark [--save] [--threshold 0.25]
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+from os.path import join
+
+from alacrity import core
+from alacrity import lib
+from alacrity.cache import cache_dir
+
+# Answers standing in for the interactive prompts
+answers = {'version': '0.1.0', 'desc': 'Benchmark package',
+           'author': 'Bench Mark', 'author_email': 'bench@example.com',
+           'license': 'mit', 'git': 'y', 'venv': 'y', 'venv_name': 'venv',
+           'sphinx': 'y'}
+# Latency differences below this many seconds are treated as noise
+noise_floor = 0.0002
+
+# Registered benchmarks in run order: (name, function, repeat)
+benchmarks = []
+
+
+def benchmark(name, repeat=20):
+    """
+    Register a benchmark, called once per run inside a fresh empty working
+    directory
+    :param name: The name of the benchmark
+    :param repeat: The default number of timed runs
+    :return: The decorator
+    """
+
+    def decorator(function):
+        benchmarks.append((name, function, repeat))
+        return function
+    return decorator
+
+
+@contextlib.contextmanager
+def stubbed():
+    """
+    Replace prompts, external tools and terminal output with stubs so only
+    alacrity itself is measured
+    :return: None
+    """
+
+    import subprocess
+
+    ask = lib.ask
+
+    def stub_ask(message, supplied=None, key=None, default=''):
+        return ask(message, answers if supplied is None else supplied, key,
+                   default)
+
+    with mock.patch.object(lib, 'ask', stub_ask), \
+            mock.patch.object(lib, 'git_identity',
+                              return_value=('Bench Mark',
+                                            'bench@example.com')), \
+            mock.patch.object(lib, 'find_tool',
+                              side_effect=lambda name: '/usr/bin/' + name), \
+            mock.patch.object(lib, 'sphinx_available', return_value=True), \
+            mock.patch.object(subprocess, 'check_output',
+                              return_value=b''), \
+            contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@benchmark('lib.create_setup')
+def bench_create_setup(path):
+    lib.create_setup(path, core.new_status(), answers=answers, name='bench')
+
+
+@benchmark('lib.create_readme')
+def bench_create_readme(path):
+    lib.create_readme(path, core.new_status(), name='bench')
+
+
+@benchmark('lib.mit_lic')
+def bench_mit_lic(path):
+    lib.mit_lic(path, 'Bench Mark', '2020', core.new_status())
+
+
+@benchmark('lib.apa_lic')
+def bench_apa_lic(path):
+    lib.apa_lic(path, 'Bench Mark', '2020', core.new_status())
+
+
+@benchmark('lib.gpl_lic')
+def bench_gpl_lic(path):
+    lib.gpl_lic(path, core.new_status())
+
+
+@benchmark('lib.create_starter_files')
+def bench_create_starter_files(path):
+    lib.create_starter_files(path, core.new_status(), answers=answers,
+                             name='bench')
+
+
+@benchmark('core.generate', repeat=10)
+def bench_generate(path):
+    core.generate('bench', core.new_status(), answers=answers)
+
+
+@benchmark('core.main', repeat=10)
+def bench_main(path):
+    with mock.patch.object(sys, 'argv', ['alacrity', 'bench']):
+        core.main()
+
+
+def measure(function, repeat):
+    """
+    Time a benchmark and record its peak memory
+    :param function: The benchmark function
+    :param repeat: The number of timed runs
+    :return: Dictionary with the median and minimum seconds and the peak
+             traced memory in bytes
+    """
+
+    root = tempfile.mkdtemp(prefix='alacrity-bench-')
+    cwd = os.getcwd()
+    durations = []
+
+    def fresh(index):
+        path = join(root, str(index))
+        os.mkdir(path)
+        os.chdir(path)
+        return path
+
+    try:
+        # One untimed run warms the template store and the imports
+        function(fresh('warmup'))
+
+        for index in range(repeat):
+            path = fresh(index)
+            start = time.perf_counter()
+            function(path)
+            durations.append(time.perf_counter() - start)
+
+        # Memory is traced in a separate run, tracing slows every allocation
+        path = fresh('memory')
+        tracemalloc.start()
+        try:
+            function(path)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {'median': statistics.median(durations), 'min': min(durations),
+            'peak_memory': peak}
+
+
+def run(selected=None, repeat=None):
+    """
+    Run the registered benchmarks with every external dependency stubbed
+    :param selected: Substring the benchmark names must contain (None for all)
+    :param repeat: Number of timed runs overriding the defaults
+    :return: Dictionary of results by benchmark name
+    """
+
+    results = {}
+    with stubbed():
+        for name, function, default_repeat in benchmarks:
+            if selected and selected not in name:
+                continue
+            results[name] = measure(function, repeat or default_repeat)
+    return results
+
+
+def baseline_path():
+    """
+    Locate the baseline of this interpreter, results are only comparable on
+    the machine and Python version that produced them
+    :return: The path of the baseline file
+    """
+
+    return join(cache_dir('benchmarks'), 'baseline-{}-{}.json'.format(
+        platform.python_implementation().lower(),
+        '.'.join(platform.python_version_tuple()[:2])))
+
+
+def load_baseline(path):
+    """
+    Read stored benchmark results
+    :param path: The path of the baseline file
+    :return: Dictionary of results by benchmark name, empty if missing
+    """
+
+    try:
+        with open(path, "r") as baseline:
+            return json.load(baseline)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_baseline(path, results):
+    """
+    Store benchmark results as the new baseline
+    :param path: The path of the baseline file
+    :param results: Dictionary of results by benchmark name
+    :return: None
+    """
+
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "w") as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def compare(results, baseline, threshold=0.25, memory_threshold=0.25):
+    """
+    Find the benchmarks that got slower or hungrier than their baseline
+    :param results: Dictionary of results by benchmark name
+    :param baseline: Dictionary of baseline results by benchmark name
+    :param threshold: Allowed relative increase of the median latency
+    :param memory_threshold: Allowed relative increase of the peak memory
+    :return: List of regression descriptions
+    """
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+
+        slower = result['median'] - base['median']
+        if slower > base['median'] * threshold and slower > noise_floor:
+            regressions.append("{} : median {:.3f}ms -> {:.3f}ms".format(
+                name, base['median'] * 1e3, result['median'] * 1e3))
+
+        if result['peak_memory'] > \
+                base['peak_memory'] * (1 + memory_threshold):
+            regressions.append("{} : peak memory {}B -> {}B".format(
+                name, base['peak_memory'], result['peak_memory']))
+
+    return regressions
+
+
+def main(argv=None):
+    """
+    Entry point for python -m alacrity.tests.benchmark
+    :param argv: The command line arguments
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description="Alacrity : benchmark the "
+                                                 "package creation workflow")
+    parser.add_argument('-k', dest='selected',
+                        help="Only run benchmarks whose name contains this")
+    parser.add_argument('--repeat', type=int,
+                        help="Number of timed runs per benchmark")
+    parser.add_argument('--baseline', default=None,
+                        help="Baseline file (defaults to the alacrity cache)")
+    parser.add_argument('--save', action='store_true',
+                        help="Store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed relative latency regression")
+    parser.add_argument('--memory-threshold', type=float, default=0.25,
+                        help="Allowed relative peak memory regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    path = args.baseline or baseline_path()
+    baseline = load_baseline(path)
+    results = run(args.selected, args.repeat)
+
+    for name, result in sorted(results.items()):
+        print("{:<28} median {:>9.3f}ms  min {:>9.3f}ms  peak {:>9}B".format(
+            name, result['median'] * 1e3, result['min'] * 1e3,
+            result['peak_memory']))
+
+    regressions = compare(results, baseline, args.threshold,
+                          args.memory_threshold)
+
+    if args.save or not baseline:
+        save_baseline(path, dict(baseline, **results))
+        print("Baseline stored in {}".format(path))
+
+    if regressions:
+        print("Regressions against {}:".format(path))
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Unittests for the api.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join
+import contextlib
+import io
+import shutil
+
+import alacrity
+from alacrity import lib
+from alacrity import probes
+from alacrity import quickstart
+
+
+class TestApi(unittest.TestCase):
+    """ Unittests for alacrity.scaffold """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_api_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.root = os.path.abspath('test_api_root')
+        os.mkdir(self.root)
+        self.options = {'root': self.root}
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_scaffold(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(output):
+            result = alacrity.scaffold('api_package',
+                                       {'license': 'mit', 'git': True,
+                                        'sphinx': False},
+                                       self.options)
+
+        # Nothing reaches the terminal, not even from the step threads
+        self.assertEqual(output.getvalue(), '')
+        self.assertIsNone(result['error'])
+        self.assertTrue(result['ok'])
+        self.assertTrue(result['status']['setup_created'])
+        self.assertTrue(result['status']['git_initialized'])
+        self.assertEqual(result['path'], join(self.root, 'api_package'))
+        self.assertIn('setup.py', result['files'])
+        self.assertIn('api_package/__init__.py', result['files'])
+        self.assertFalse(any(path.startswith('.git/')
+                             for path in result['files']))
+        for step in ('files', 'publish', 'git', 'venv', 'sphinx', 'total'):
+            self.assertIn(step, result['timings'])
+
+    def test_unavailable_tool(self):
+        # A tool that is not installed is skipped, not failed
+        with mock.patch.object(quickstart, 'available', return_value=False), \
+                mock.patch.object(probes, 'sphinx',
+                                  return_value={'available': False}):
+            result = alacrity.scaffold('api_package',
+                                       {'license': 'mit', 'sphinx': True},
+                                       self.options)
+        self.assertFalse(result['status']['sphinx_created'])
+        self.assertTrue(result['ok'])
+
+    def test_existing_package(self):
+        os.mkdir(join(self.root, 'api_package'))
+        result = alacrity.scaffold('api_package', options=self.options)
+        self.assertFalse(result['ok'])
+        self.assertIsNotNone(result['error'])
+
+    def test_quiet(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with lib.quiet():
+                lib.echo("hidden")
+                self.assertRaises(ValueError, lib.ask, "prompt")
+            lib.echo("shown")
+        self.assertEqual(output.getvalue(), "shown\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
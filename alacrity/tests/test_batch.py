@@ -0,0 +1,134 @@
+# Unittests for the batch.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+import json
+from os.path import isfile
+import logging
+import shutil
+
+from alacrity import batch
+from alacrity import lib
+
+
+class TestBatch(unittest.TestCase):
+    """ Unittests for alacrity.batch """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_batch_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def test_load_manifest_json(self):
+        self.path = 'test_manifest.json'
+
+        with open(self.path, 'w') as obj:
+            json.dump({'packages': [{'name': 'first'},
+                                    {'package_name': 'second'}]}, obj)
+
+        entries = batch.load_manifest(self.path)
+        self.assertEqual([e['package_name'] for e in entries],
+                         ['first', 'second'])
+        os.remove(self.path)
+
+    def test_load_manifest_jsonl(self):
+        self.path = 'test_manifest.jsonl'
+
+        with open(self.path, 'w') as obj:
+            obj.write('{"package_name": "first", "license": "mit"}\n\n')
+            obj.write('{"package_name": "second"}\n')
+
+        entries = batch.load_manifest(self.path)
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['license'], 'mit')
+        os.remove(self.path)
+
+    def test_load_manifest_csv(self):
+        self.path = 'test_manifest.csv'
+
+        with open(self.path, 'w') as obj:
+            obj.write('package_name,version,license\n')
+            obj.write('first,0.1.0,mit\n')
+
+        entries = batch.load_manifest(self.path)
+        self.assertEqual(entries[0]['version'], '0.1.0')
+        os.remove(self.path)
+
+    def test_load_manifest_missing_name(self):
+        self.path = 'test_manifest.jsonl'
+
+        with open(self.path, 'w') as obj:
+            obj.write('{"version": "0.1.0"}\n')
+
+        self.assertRaises(ValueError, batch.load_manifest, self.path)
+        os.remove(self.path)
+
+    def test_run_batch(self):
+        entries = [{'package_name': 'batch_first', 'version': '0.1.0',
+                    'license': 'mit', 'author': 'testname'},
+                   {'package_name': 'batch_second', 'license': 'gpl3'}]
+
+        records = batch.run_batch(entries)
+
+        # Records are returned in manifest order
+        self.assertEqual([r['package_name'] for r in records],
+                         ['batch_first', 'batch_second'])
+        for record in records:
+            self.assertIsNone(record['error'])
+            self.assertTrue(record['status']['setup_created'])
+            self.assertTrue(record['status']['license_created'])
+
+        self.assertTrue(isfile('batch_first/setup.py'))
+        with open('batch_first/LICENSE') as obj:
+            self.assertIn('testname', obj.read())
+
+        # Declined git, venv and sphinx steps are not failures
+        for record in records:
+            self.assertTrue(record['ok'])
+            self.assertIn('git_initialized', record['skipped'])
+        self.assertEqual(batch.report_batch(records), 0)
+
+        # Nothing is left behind in staging directories
+        self.assertEqual([name for name in os.listdir('.')
+                          if '.staging-' in name], [])
+
+        # An existing package is reported rather than overwritten
+        records = batch.run_batch(entries[:1])
+        self.assertIsNotNone(records[0]['error'])
+        self.assertFalse(records[0]['ok'])
+        self.assertEqual(batch.report_batch(records), 1)
+
+        lib.remove_package('batch_first')
+        lib.remove_package('batch_second')
+
+    def test_run_batch_jobs(self):
+        entries = [{'package_name': 'batch_par_{}'.format(i),
+                    'license': 'mit'} for i in range(3)]
+        entries.append({'package_name': 'batch_par_0'})
+
+        records = batch.run_batch(entries, jobs=2)
+
+        # Order follows the manifest whatever the number of workers
+        self.assertEqual([r['package_name'] for r in records],
+                         [e['package_name'] for e in entries])
+        for record in records[:3]:
+            self.assertIsNone(record['error'])
+            self.assertTrue(record['status']['license_created'])
+
+        # Duplicates are rejected deterministically
+        self.assertIsNotNone(records[3]['error'])
+        self.assertFalse(records[3]['status']['structure_created'])
+
+        for i in range(3):
+            lib.remove_package('batch_par_{}'.format(i))
+
+
+if __name__ == '__main__':
+    unittest.main()
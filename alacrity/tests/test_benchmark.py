@@ -0,0 +1,64 @@
+# Unittests for the benchmark.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+import shutil
+import subprocess
+
+from alacrity.tests import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """ Unittests for alacrity.tests.benchmark """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_benchmark_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.path = os.path.abspath('test_baseline.json')
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def test_run_is_stubbed(self):
+        cwd = os.getcwd()
+        results = benchmark.run('core.generate', repeat=2)
+
+        self.assertEqual(list(results), ['core.generate'])
+        self.assertGreater(results['core.generate']['median'], 0)
+        self.assertGreater(results['core.generate']['peak_memory'], 0)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertFalse(os.path.exists('bench'))
+        self.assertNotIsInstance(subprocess.check_output, benchmark.mock.Mock)
+
+    def test_baseline_round_trip(self):
+        results = {'lib.create_setup': {'median': 0.001, 'min': 0.001,
+                                        'peak_memory': 1000}}
+        self.assertEqual(benchmark.load_baseline(self.path), {})
+        benchmark.save_baseline(self.path, results)
+        self.assertEqual(benchmark.load_baseline(self.path), results)
+
+    def test_compare(self):
+        baseline = {'step': {'median': 0.010, 'min': 0.010,
+                             'peak_memory': 1000}}
+
+        same = {'step': {'median': 0.011, 'min': 0.010, 'peak_memory': 1100}}
+        self.assertEqual(benchmark.compare(same, baseline), [])
+
+        slower = {'step': {'median': 0.020, 'min': 0.020, 'peak_memory': 1000}}
+        self.assertEqual(len(benchmark.compare(slower, baseline)), 1)
+
+        hungrier = {'step': {'median': 0.010, 'min': 0.010,
+                             'peak_memory': 2000}}
+        self.assertEqual(len(benchmark.compare(hungrier, baseline)), 1)
+        self.assertEqual(benchmark.compare(hungrier, baseline,
+                                           memory_threshold=1.5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
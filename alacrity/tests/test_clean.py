@@ -0,0 +1,126 @@
+# Unittests for the clean.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, exists
+import shutil
+import logging
+
+from alacrity import clean
+from alacrity import core
+from alacrity import incremental
+from alacrity import lib
+
+
+class TestClean(unittest.TestCase):
+    """ Unittests for alacrity.clean """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_clean_cache')
+        self.root = os.path.abspath('test_clean_root')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        os.mkdir(self.root)
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def make_tree(self, name, files=50):
+        path = join(self.root, name)
+        os.makedirs(join(path, 'venv', 'lib'))
+        for index in range(files):
+            with open(join(path, 'venv', 'lib', str(index)), 'w') as fobj:
+                fobj.write('x')
+        return path
+
+    def test_purge_moves_then_deletes(self):
+        paths = [self.make_tree(name) for name in ('a', 'b', 'c')]
+        renamed = []
+        rename = os.rename
+
+        def record(source, destination):
+            renamed.append(source)
+            rename(source, destination)
+
+        with mock.patch.object(os, 'rename', side_effect=record):
+            self.assertEqual(lib.purge(paths + [join(self.root, 'none')],
+                                       workers=2), [])
+        self.assertEqual(renamed, paths)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_purge_trash_already_swept(self):
+        paths = [self.make_tree(name) for name in ('a', 'b')]
+        move_to_trash = lib.move_to_trash
+
+        def swept(path):
+            # Another clean sweeps the trash before this one deletes it
+            trash = move_to_trash(path)
+            shutil.rmtree(trash)
+            return trash
+
+        with mock.patch.object(lib, 'move_to_trash', side_effect=swept):
+            self.assertEqual(lib.purge(paths, workers=2), [])
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_remove_package_in_background(self):
+        path = self.make_tree('package')
+        with mock.patch('subprocess.Popen') as popen:
+            lib.remove_package(path)
+
+        # The package is gone at once, the trash is handed to a process
+        self.assertFalse(exists(path))
+        trash = popen.call_args[0][0][-1]
+        self.assertIn('.package.trash-', trash)
+        self.assertTrue(exists(trash))
+
+        lib.remove_package(trash, wait=True)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_clean_generated_packages(self):
+        answers = {'version': '0.1.0', 'author': 'testname',
+                   'license': 'mit', 'git': False, 'venv': False,
+                   'sphinx': False}
+        with lib.quiet():
+            for name in ('first', 'second'):
+                core.generate(name, core.new_status(), answers=answers,
+                              options={'root': self.root})
+        self.make_tree('.first.trash-0123456789ab')
+        # Trash of other packages may still be deleted by another process
+        self.make_tree('.other.trash-0123456789ab')
+        os.mkdir(join(self.root, 'unrelated'))
+
+        self.assertEqual(incremental.recorded(self.root),
+                         [join(self.root, 'first'),
+                          join(self.root, 'second')])
+
+        clean.main(['--root', self.root, '--generated'])
+
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         ['.other.trash-0123456789ab', 'unrelated'])
+        self.assertEqual(incremental.recorded(self.root), [])
+
+    def test_clean_refuses_unsafe_names(self):
+        os.mkdir(join(self.root, 'unrelated'))
+        os.mkdir(join(self.root, '.hidden'))
+        for name in ('.', '..', self.root, '../test_clean_root',
+                     'unrelated', '.hidden'):
+            with self.assertRaises(SystemExit):
+                clean.main(['--root', self.root, name])
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         ['.hidden', 'unrelated'])
+
+        # Only an explicit --force removes what alacrity did not generate
+        for name in ('.', self.root):
+            with self.assertRaises(SystemExit):
+                clean.main(['--root', self.root, '--force', name])
+        clean.main(['--root', self.root, '--force', 'unrelated', '.hidden'])
+        self.assertEqual(os.listdir(self.root), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# Unittests for the gitfast.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join
+import shutil
+import subprocess
+
+from alacrity import gitfast
+from alacrity import lib
+
+
+def git(path, *args):
+    return subprocess.check_output(['git'] + list(args), cwd=path,
+                                   stderr=subprocess.STDOUT).decode('utf-8')
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not installed")
+class TestGitFast(unittest.TestCase):
+    """ Unittests for alacrity.gitfast """
+
+    def setUp(self):
+        self.path = os.path.abspath('test_gitfast')
+        # Keep the global and system git config of the machine out
+        self.home = os.path.abspath('test_gitfast_home')
+        os.makedirs(self.home)
+        self.patcher = mock.patch.dict(os.environ, {
+            'HOME': self.home, 'XDG_CONFIG_HOME': join(self.home, '.config'),
+            'GIT_CONFIG_NOSYSTEM': '1'})
+        self.patcher.start()
+        os.makedirs(join(self.path, 'pkg'))
+        os.makedirs(join(self.path, 'venv', 'bin'))
+        os.makedirs(join(self.path, 'pkg', '__pycache__'))
+
+        files = {'.gitignore': '__pycache__/\n*.log\n',
+                 'setup.py': 'print("setup")\n',
+                 'pkg/__init__.py': '',
+                 'pkg/core.py': '# core\n',
+                 'pkg/__pycache__/core.pyc': 'bytecode',
+                 'debug.log': 'ignored',
+                 'venv/bin/python': 'excluded'}
+        for name, data in files.items():
+            with open(join(self.path, name), 'w') as obj:
+                obj.write(data)
+        os.chmod(join(self.path, 'setup.py'), 0o755)
+
+        git(self.path, 'init', '-q')
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.path)
+        shutil.rmtree(self.home)
+
+    def test_initial_commit(self):
+        sha = gitfast.initial_commit(self.path, 'testname', 'test@example.com',
+                                     exclude=['venv'])
+
+        self.assertEqual(git(self.path, 'rev-parse', 'HEAD').strip(), sha)
+        self.assertEqual(git(self.path, 'ls-files').split(),
+                         ['.gitignore', 'pkg/__init__.py', 'pkg/core.py',
+                          'setup.py'])
+        self.assertIn('100755', git(self.path, 'ls-tree', 'HEAD', 'setup.py'))
+
+        # The index matches the commit and the objects are well formed
+        self.assertEqual(git(self.path, 'status', '--porcelain',
+                             '--untracked-files=no'), '')
+        git(self.path, 'fsck', '--strict')
+        self.assertIn('testname <test@example.com>',
+                      git(self.path, 'log', '--format=%an <%ae>'))
+
+    def test_sha256_repository(self):
+        shutil.rmtree(join(self.path, '.git'))
+        try:
+            git(self.path, 'init', '-q', '--object-format=sha256')
+        except subprocess.CalledProcessError:
+            self.skipTest("git does not support sha256 repositories")
+
+        sha = gitfast.initial_commit(self.path, 'testname', 'test@example.com',
+                                     exclude=['venv'])
+        self.assertEqual(len(sha), 64)
+        self.assertEqual(git(self.path, 'rev-parse', 'HEAD').strip(), sha)
+        self.assertEqual(git(self.path, 'status', '--porcelain',
+                             '--untracked-files=no'), '')
+        git(self.path, 'fsck', '--strict')
+
+        # Unknown formats are refused rather than corrupted
+        with open(join(self.path, '.git', 'config'), 'a') as obj:
+            obj.write('[extensions]\n\tobjectFormat = sha512\n')
+        with self.assertRaises(ValueError):
+            gitfast.initial_commit(self.path, 'testname', 'test@example.com')
+
+    def test_commit_hooks(self):
+        self.assertEqual(gitfast.hooks(self.path, {}), [])
+
+        # A core.hooksPath from the global config counts as well
+        os.makedirs(join(self.home, 'hooks'))
+        hook = join(self.home, 'hooks', 'pre-commit')
+        with open(hook, 'w') as obj:
+            obj.write('#!/bin/sh\ntouch .git/hooked\n')
+        os.chmod(hook, 0o755)
+        git(self.path, 'config', '--global', 'core.hooksPath', '~/hooks')
+        settings = gitfast.git_settings(self.path)
+        self.assertEqual(settings, {'core.hookspath': join(self.home,
+                                                           'hooks')})
+        self.assertEqual(gitfast.hooks(self.path, settings), ['pre-commit'])
+
+        # With hooks installed the commit goes through git commit
+        status = {}
+        with lib.quiet():
+            lib.git_commit(self.path, 'testname', status,
+                           {'author_email': 'test@example.com'},
+                           exclude=['venv'])
+        self.assertTrue(status['git_committed'])
+        self.assertTrue(os.path.exists(join(self.path, '.git', 'hooked')))
+        self.assertEqual(git(self.path, 'ls-files').split(),
+                         ['.gitignore', 'pkg/__init__.py', 'pkg/core.py',
+                          'setup.py'])
+        self.assertIn('testname <test@example.com>',
+                      git(self.path, 'log', '--format=%an <%ae>'))
+
+    def test_ignore_sources(self):
+        settings = gitfast.git_settings(self.path)
+        self.assertEqual(gitfast.ignore_sources(self.path, settings,
+                                                ['venv']), [])
+
+        # Rules only git applies send the commit through git
+        with open(join(self.path, 'venv', '.gitignore'), 'w') as obj:
+            obj.write('*\n')
+        self.assertEqual(gitfast.ignore_sources(self.path, settings,
+                                                ['venv']), [])
+        sources = []
+        for name in (join('.git', 'info', 'exclude'),
+                     join('pkg', '.gitignore')):
+            with open(join(self.path, name), 'a') as obj:
+                obj.write('core.py\n')
+            sources.append(join(self.path, name))
+            self.assertEqual(gitfast.ignore_sources(self.path, settings,
+                                                    ['venv']), sources)
+
+        with open(join(self.home, 'excludes'), 'w') as obj:
+            obj.write('setup.py\n')
+        git(self.path, 'config', '--global', 'core.excludesFile',
+            '~/excludes')
+        settings = gitfast.git_settings(self.path)
+        self.assertIn(join(self.home, 'excludes'),
+                      gitfast.ignore_sources(self.path, settings))
+
+        status = {}
+        with lib.quiet():
+            lib.git_commit(self.path, 'testname', status,
+                           {'author_email': 'test@example.com'},
+                           exclude=['venv'])
+        self.assertTrue(status['git_committed'])
+        self.assertEqual(git(self.path, 'ls-files').split(),
+                         ['.gitignore', 'pkg/.gitignore', 'pkg/__init__.py'])
+
+    def test_anchored_patterns(self):
+        with open(join(self.path, '.gitignore'), 'w') as obj:
+            obj.write('/core.py\nbuild/\n')
+        patterns = gitfast.ignore_patterns(self.path)
+        self.assertTrue(gitfast.is_ignored('core.py', False, patterns))
+        self.assertFalse(gitfast.is_ignored('pkg/core.py', False, patterns))
+        self.assertTrue(gitfast.is_ignored('pkg/build', True, patterns))
+
+    def test_write_tree_order(self):
+        git_dir = join(self.path, '.git')
+        blob = gitfast.write_object(git_dir, 'blob', b'')
+        tree = gitfast.write_tree(git_dir, [('a.b', 0o100644, blob),
+                                            ('a/c', 0o100644, blob),
+                                            ('a0', 0o100644, blob)])
+
+        # Directories sort as if their name ended with a slash
+        names = [line.split('\t')[1] for line in
+                 git(self.path, 'ls-tree', tree).splitlines()]
+        self.assertEqual(names, ['a.b', 'a', 'a0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Unittests for the incremental.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isfile
+import shutil
+import logging
+
+from alacrity import core
+from alacrity import incremental
+
+
+class TestIncremental(unittest.TestCase):
+    """ Unittests for alacrity.incremental """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_incremental_cache')
+        self.root = os.path.abspath('test_incremental_root')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.answers = {'version': '0.1.0', 'author': 'testname',
+                        'license': 'mit', 'git': False, 'venv': False,
+                        'sphinx': False}
+        self.options = {'root': self.root}
+        self.path = join(self.root, 'inc_package')
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def generate(self, answers, options):
+        status = core.new_status()
+        result = core.generate('inc_package', status, answers=answers,
+                               options=options)
+        return status, result
+
+    def test_update_rewrites_only_changed_files(self):
+        os.mkdir(self.root)
+        status, result = self.generate(self.answers, self.options)
+        self.assertIsNone(result)
+        self.assertIn('setup.py', incremental.load_manifest(self.path))
+
+        # The user edits one file, removes another and owns .git
+        with open(join(self.path, 'README.rst'), 'a') as fobj:
+            fobj.write("Edited\n")
+        os.remove(join(self.path, 'MANIFEST.in'))
+        os.makedirs(join(self.path, '.git'))
+        with open(join(self.path, '.git', 'HEAD'), 'w') as fobj:
+            fobj.write("ref: refs/heads/master\n")
+        os.chmod(join(self.path, 'setup.py'), 0o755)
+        inode = os.stat(join(self.path, 'setup.py')).st_ino
+
+        answers = dict(self.answers, version='0.2.0')
+        status, result = self.generate(answers,
+                                       dict(self.options, update=True))
+
+        self.assertEqual(sorted(result['written']),
+                         ['MANIFEST.in', 'setup.py'])
+        self.assertEqual(result['kept'], ['README.rst'])
+        self.assertIn('LICENSE', result['unchanged'])
+        self.assertTrue(status['setup_created'])
+        self.assertFalse(status['git_initialized'])
+
+        with open(join(self.path, 'setup.py'), 'r') as fobj:
+            self.assertIn('0.2.0', fobj.read())
+        # Changed files are renamed into place, not truncated
+        stat = os.stat(join(self.path, 'setup.py'))
+        self.assertNotEqual(stat.st_ino, inode)
+        self.assertEqual(stat.st_mode & 0o777, 0o755)
+        self.assertEqual([name for name in os.listdir(self.path)
+                          if name.endswith('.tmp')], [])
+        with open(join(self.path, 'README.rst'), 'r') as fobj:
+            self.assertTrue(fobj.read().endswith("Edited\n"))
+        self.assertTrue(isfile(join(self.path, '.git', 'HEAD')))
+
+        # A second update finds nothing to do
+        status, result = self.generate(answers,
+                                       dict(self.options, update=True))
+        self.assertEqual(result['written'], [])
+        self.assertEqual(result['kept'], ['README.rst'])
+
+    def test_manifest_covers_snapshot_files(self):
+        os.mkdir(self.root)
+        options = dict(self.options, snapshot=True)
+        self.generate(self.answers, options)
+        shutil.rmtree(self.path)
+
+        # Materialized from the snapshot this time
+        with mock.patch('alacrity.lib.create_starter_files') as starters:
+            self.generate(self.answers, options)
+            self.assertFalse(starters.called)
+
+        on_disk = sorted(os.path.relpath(join(directory, name), self.path)
+                         .replace(os.sep, '/')
+                         for directory, dirs, names in os.walk(self.path)
+                         for name in names)
+        manifest = incremental.load_manifest(self.path)
+        self.assertEqual(sorted(manifest), on_disk)
+        self.assertEqual(manifest['LICENSE'], incremental.file_digest(
+            join(self.path, 'LICENSE')))
+
+    def test_update_without_package_generates(self):
+        os.mkdir(self.root)
+        status, result = self.generate(self.answers,
+                                       dict(self.options, update=True))
+        self.assertIsNone(result)
+        self.assertTrue(isfile(join(self.path, 'setup.py')))
+
+
+if __name__ == '__main__':
+    unittest.main()
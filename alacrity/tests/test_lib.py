@@ -1,11 +1,14 @@
 # Unittests for the lib.py functions to be placed here
 
 import unittest
+from unittest import mock
 import os
+import subprocess
 from os.path import join, isdir, isfile
 import logging
 
 from alacrity import lib
+from alacrity import quickstart
 
 
 class TestParser(unittest.TestCase):
@@ -39,6 +42,14 @@ class TestParser(unittest.TestCase):
 
         # Test creation of file
         self.assertTrue(isfile(self.persist))
+
+        # Declining the clean make keeps the tool cache
+        for choice, resets in (('n', 0), ('y', 1)):
+            with mock.patch('builtins.input', return_value=choice), \
+                    mock.patch('builtins.print'), \
+                    mock.patch.object(lib.probes, 'reset') as reset:
+                lib.rebuild_persistence(self.path, silent=True)
+            self.assertEqual(reset.call_count, resets)
         os.remove(self.persist)
 
     def test_read_from_paths(self):
@@ -52,6 +63,15 @@ class TestParser(unittest.TestCase):
         self.assertEqual(self.data, "#Testdata#")
         os.remove(self.test_path)
 
+    def test_ask(self):
+        answers = {'version': '1.0.0', 'git': True, 'venv': False}
+
+        # Answers are used without prompting, booleans map to y/n
+        self.assertEqual(lib.ask("", answers, 'version'), '1.0.0')
+        self.assertEqual(lib.ask("", answers, 'git'), 'y')
+        self.assertEqual(lib.ask("", answers, 'venv'), 'n')
+        self.assertEqual(lib.ask("", answers, 'desc', 'default'), 'default')
+
     def test_remove_package(self):
         self.test_path = 'test_dir'
         os.mkdir(self.test_path)
@@ -59,6 +79,30 @@ class TestParser(unittest.TestCase):
 
         self.assertFalse(isdir(self.test_path))
 
+    def test_discard(self):
+        self.test_path = 'test_discard_dir'
+        os.mkdir(self.test_path)
+        lib.discard(self.test_path)
+
+        # The path is freed immediately, deletion happens in the background
+        self.assertFalse(os.path.lexists(self.test_path))
+
+    def test_publish(self):
+        self.test_path = 'test_publish_dir'
+        self.staging = lib.staging_path(self.test_path)
+
+        os.mkdir(self.test_path)
+        os.mkdir(self.staging)
+        with open(join(self.staging, 'marker'), 'w') as obj:
+            obj.write("#Testdata#")
+
+        # An existing package is replaced by the staged one
+        lib.publish(self.staging, self.test_path)
+        self.assertFalse(isdir(self.staging))
+        self.assertTrue(isfile(join(self.test_path, 'marker')))
+
+        lib.remove_package(self.test_path)
+
     def test_create_package_structure(self):
         self.test_name = 'sample_package'
         self.sub_directory = '{0}/{0}'.format(self.test_name)
@@ -196,6 +240,21 @@ class TestParser(unittest.TestCase):
 
         lib.remove_package(self.path)
 
+    def test_copy_template(self):
+        from alacrity import templates
+        from alacrity.tree import TreeWriter
+
+        tree = TreeWriter()
+        lib.copy_template("GPL_LICENSE", "LICENSE", tree, 'license_created')
+        lib.copy_template("setup.py", "setup.py", tree)
+
+        # Templates without tokens are copied, the others written as text
+        if os.linesep == '\n':
+            self.assertEqual(tree.copies, {
+                "LICENSE": templates.store.path("GPL_LICENSE")})
+        self.assertEqual(list(tree.files), ["setup.py"])
+        self.assertEqual(tree.tasks, {"LICENSE": 'license_created'})
+
     def test_git_init(self):
         self.path = join(os.path.dirname(__file__), "testpath")
 
@@ -222,7 +281,66 @@ class TestParser(unittest.TestCase):
         self.assertTrue(status)
         self.assertTrue(isdir(join(self.path, "testenv")))
 
+        # Names that leave the package are refused
+        status = {}
+        with lib.quiet():
+            lib.venv_init(self.path, status,
+                          answers={'venv': 'y', 'venv_name': '../escaped'})
+        self.assertNotIn('venv_created', status)
+        self.assertFalse(os.path.exists(join(self.path, '..', 'escaped')))
+        self.assertTrue(lib.valid_venv_name('.venv'))
+        self.assertFalse(lib.valid_venv_name('/tmp/venv'))
+        self.assertTrue(lib.valid_name('package'))
+        for name in ('', '.', '..', '.hidden', '../escape', 'a/b'):
+            self.assertFalse(lib.valid_name(name))
+
+        lib.remove_package(self.path)
+
+    def test_run_external_steps(self):
+        self.path = join(os.path.dirname(__file__), "testpath")
+
         lib.remove_package(self.path)
+        os.mkdir(self.path)
+
+        answers = {'git': 'y', 'venv': 'n', 'sphinx': 'n'}
+        lib.run_external_steps(self.path, "testauthor", "1.0.0", self.status,
+                               answers=answers)
+
+        # Each step reports into the shared status dictionary
+        self.assertTrue(isdir(join(self.path, ".git")))
+        self.assertTrue(self.status['git_initialized'])
+        self.assertTrue(self.status['venv_created'])
+
+        lib.remove_package(self.path)
+
+    def test_sphinx_init_in_process(self):
+        self.path = "testpath"
+        answers = {'sphinx': 'y'}
+        quickstart_main = mock.Mock(return_value=0)
+
+        with mock.patch.object(quickstart, 'available', return_value=True), \
+                mock.patch.object(quickstart, 'load',
+                                  return_value=quickstart_main), \
+                mock.patch.object(subprocess, 'check_output') as check_output:
+            lib.sphinx_init(self.path, "testauthor", "1.0.0", self.status,
+                            answers=answers)
+        quickstart_main.assert_called_once_with(
+            ['-q', '-p', 'testpath', '-a', 'testauthor', '-v', '1.0.0',
+             'testpath'])
+        self.assertFalse(check_output.called)
+        self.assertTrue(self.status['sphinx_created'])
+
+        # Without an importable Sphinx the executable is used instead
+        self.status['sphinx_created'] = False
+        with mock.patch.object(quickstart, 'available', return_value=False), \
+                mock.patch.object(quickstart, 'load', return_value=None), \
+                mock.patch.object(lib.probes, 'sphinx',
+                                  return_value={'available': True}), \
+                mock.patch.object(subprocess, 'check_output') as check_output:
+            lib.sphinx_init(self.path, "testauthor", "1.0.0", self.status,
+                            answers=answers)
+        self.assertEqual(check_output.call_args[0][0][0], 'sphinx-quickstart')
+        self.assertTrue(self.status['sphinx_created'])
 
     def sphinx_init(self):
         self.path = join(os.path.dirname(__file__), "testpath")
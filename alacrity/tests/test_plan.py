@@ -0,0 +1,107 @@
+# Unittests for the plan.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join
+import shutil
+import logging
+
+from alacrity import core
+from alacrity import lib
+from alacrity import plan
+from alacrity import probes
+
+
+class TestPlan(unittest.TestCase):
+    """ Unittests for alacrity.plan """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_plan_cache')
+        self.root = os.path.abspath('test_plan_root')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        os.mkdir(self.root)
+        self.answers = {'version': '0.1.0', 'author': 'testname',
+                        'license': 'gpl3', 'git': False, 'venv': True,
+                        'sphinx': False}
+        self.options = {'root': self.root}
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_record_history(self):
+        plan.record([{'files': 1.0, 'venv': 4.0}, {'files': 3.0}],
+                    {'venv_cache': True})
+        history = plan.load_history()
+        self.assertEqual(history['files'], {'count': 2, 'mean': 2.0})
+        self.assertEqual(history['venv:clone']['mean'], 4.0)
+        self.assertIsNone(plan.estimate(history, 'venv', {}))
+
+    def test_plan_writes_nothing(self):
+        plan.record([{'files': 0.5, 'publish': 0.1, 'venv': 2.0}],
+                    self.options)
+        result = plan.plan('planned', self.answers, self.options)
+
+        self.assertEqual(os.listdir(self.root), [])
+        files = {item['path']: item for item in result['files']}
+        self.assertEqual(files['setup.py']['action'], 'created')
+        self.assertGreater(files['setup.py']['bytes'], 0)
+        self.assertEqual(files['LICENSE']['bytes'], os.path.getsize(
+            join(os.path.dirname(lib.__file__), 'starters', 'GPL_LICENSE')))
+        self.assertEqual(result['bytes'],
+                         sum(item['bytes'] for item in result['files']))
+
+        # Building a venv with pip is the slow path
+        self.assertEqual([item['step'] for item in result['external']],
+                         ['venv'])
+        self.assertTrue(result['external'][0]['slow'])
+        self.assertAlmostEqual(result['estimate'], 2.6)
+        self.assertEqual(result['unknown'], [])
+
+    def test_plan_leaves_caches_alone(self):
+        tools = join(self.cache, 'tools.json')
+        with mock.patch.object(probes, 'cache_path', tools), \
+                mock.patch.object(probes, '_cache', None):
+            plan.plan('planned', self.answers,
+                      dict(self.options, snapshot=True, venv_cache=True))
+        self.assertFalse(os.path.exists(self.cache))
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_plan_prompts_for_external_steps(self):
+        def ask(message, answers=None, key=None, default=''):
+            if answers is not None:
+                return answers.get(key) or default
+            return 'y' if key == 'venv' else default
+
+        # Without answers the external steps are asked about, like a run
+        with mock.patch.object(lib, 'ask', side_effect=ask):
+            result = plan.plan('planned', None, self.options)
+        self.assertIn('venv', [item['step'] for item in result['external']])
+
+    def test_plan_update(self):
+        with lib.quiet():
+            core.generate('planned', core.new_status(),
+                          answers=dict(self.answers, venv=False),
+                          options=self.options)
+        with open(join(self.root, 'planned', 'README.rst'), 'a') as fobj:
+            fobj.write("Edited\n")
+
+        result = plan.plan('planned', dict(self.answers, version='0.2.0'),
+                           dict(self.options, update=True))
+        actions = {item['path']: item['action'] for item in result['files']}
+        self.assertEqual(actions['setup.py'], 'written')
+        self.assertEqual(actions['README.rst'], 'kept')
+        self.assertEqual(actions['LICENSE'], 'unchanged')
+        self.assertEqual(result['external'], [])
+        self.assertEqual(result['bytes'], [item['bytes'] for item in
+                                           result['files']
+                                           if item['path'] == 'setup.py'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Unittests for the probes.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import isfile
+import subprocess
+
+from alacrity import probes
+
+
+class TestProbes(unittest.TestCase):
+    """ Unittests for alacrity.probes """
+
+    def setUp(self):
+        self.cache_path = os.path.abspath('test_tools.json')
+        self.patcher = mock.patch.object(probes, 'cache_path',
+                                         self.cache_path)
+        self.patcher.start()
+        probes.reset()
+
+    def tearDown(self):
+        probes.reset()
+        self.patcher.stop()
+
+    def test_probe_is_persisted(self):
+        entry = probes.git()
+        self.assertTrue(isfile(self.cache_path))
+
+        # A warm lookup in a new process runs no probe subprocess
+        probes._cache = None
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            self.assertEqual(probes.git(), entry)
+            self.assertFalse(check_output.called)
+
+    def test_missing_tool(self):
+        entry = probes.probe('alacrity-missing-tool', ['--version'])
+        self.assertIsNone(entry['path'])
+        self.assertIsNone(entry['version'])
+
+    def test_path_change_invalidates(self):
+        probes.probe('alacrity-missing-tool')
+        probes._cache = None
+
+        with mock.patch.dict(os.environ, {'PATH': os.defpath}):
+            self.assertEqual(probes.load()['tools'], {})
+
+    def test_reset(self):
+        probes.venv()
+        probes.reset()
+
+        self.assertFalse(isfile(self.cache_path))
+        self.assertEqual(probes.load()['tools'], {})
+
+    def test_venv(self):
+        entry = probes.venv()
+        self.assertTrue(entry['available'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# Unittests for the registry.py functions to be placed here
+
+import unittest
+import os
+from os.path import join
+import json
+import shutil
+
+from alacrity import lib
+from alacrity import registry
+from alacrity import templates
+
+
+class TestTemplateRegistry(unittest.TestCase):
+    """ Unittests for alacrity.registry """
+
+    def setUp(self):
+        self.root = os.path.abspath('test_registry')
+        self.sets = join(self.root, 'sets')
+        self.cache = join(self.root, 'cache')
+        os.makedirs(self.sets)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def make_set(self, directory, manifest=None, files=None):
+        path = join(self.sets, directory)
+        os.makedirs(path)
+        if manifest is not None:
+            with open(join(path, registry.manifest_name), 'w') as obj:
+                json.dump(manifest, obj)
+        for name, text in (files or {}).items():
+            with open(join(path, name), 'w') as obj:
+                obj.write(text)
+        return path
+
+    def registry(self):
+        return registry.TemplateRegistry([self.sets], cache=self.cache)
+
+    def test_index_is_read_from_disk(self):
+        self.make_set('acme-1', {'name': 'acme', 'version': '1.2'})
+        self.make_set('acme-10', {'name': 'acme', 'version': '1.10'})
+        self.make_set('plain')
+
+        first = self.registry()
+        sets = first.index()
+        self.assertEqual([(item['name'], item['version']) for item in sets],
+                         [('acme', '1.2'), ('acme', '1.10'), ('plain', '0')])
+        self.assertEqual(first.scans, 1)
+
+        # A new process finds the sets without scanning again
+        second = self.registry()
+        self.assertEqual(second.index(), sets)
+        self.assertEqual(second.scans, 0)
+
+        self.assertEqual(second.lookup('acme')['version'], '1.10')
+        self.assertEqual(second.lookup('acme@1.2')['path'],
+                         join(self.sets, 'acme-1'))
+        self.assertRaises(ValueError, second.lookup, 'acme@2')
+
+        # Adding a set changes the search directory and triggers a rescan
+        self.make_set('other')
+        self.assertIn('other', [item['name'] for item in second.index()])
+        self.assertEqual(second.scans, 1)
+
+    def test_manifest_edited_in_place(self):
+        path = self.make_set('acme', {'name': 'acme', 'version': '1'})
+        self.registry().index()
+
+        with open(join(path, registry.manifest_name), 'w') as obj:
+            json.dump({'name': 'acme', 'version': '2'}, obj)
+        stat = os.stat(join(path, registry.manifest_name))
+        os.utime(join(path, registry.manifest_name),
+                 ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(self.registry().lookup('acme')['version'], '2')
+
+    def test_store_overrides_starters(self):
+        self.make_set('acme', {'name': 'acme'},
+                      {'README.rst': "ACME [@package_name][@#tags] "
+                                     "[@.][@/tags]\n"})
+
+        first = self.registry()
+        store = first.store('acme')
+        with templates.use(store):
+            self.assertEqual(lib.render_template(
+                'README.rst', {'package_name': 'demo'}), "ACME demo\n")
+            # Files the set leaves out come from the starters
+            self.assertEqual(lib.load_template('MANIFEST.in'),
+                             templates.store.get('MANIFEST.in'))
+        self.assertIs(templates.current(), templates.store)
+        self.assertTrue(store.dirty)
+        first.save(store)
+
+        # The cache is plain JSON, never unpickled
+        path = first.compiled_path(store.root)
+        self.assertTrue(path.endswith('.json'))
+        with open(path) as obj:
+            self.assertEqual(json.load(obj)['format'], registry.index_format)
+
+        # The compiled template is loaded rather than parsed again
+        preloaded = self.registry().store('acme')
+        self.assertFalse(preloaded.dirty)
+        self.assertEqual(preloaded.render('README.rst',
+                                          {'package_name': 'other'}),
+                         "ACME other\n")
+        self.assertEqual(preloaded.stats()['hits'], 1)
+        self.assertFalse(preloaded.dirty)
+
+        # Sections come back as the same tuples parse() builds
+        self.assertEqual(preloaded.render('README.rst',
+                                          {'package_name': 'x',
+                                           'tags': ['a', 'b']}),
+                         "ACME x a b\n")
+        self.assertEqual(preloaded.compiled('README.rst').nodes,
+                         templates.parse(store.get('README.rst')))
+
+
+if __name__ == '__main__':
+    unittest.main()
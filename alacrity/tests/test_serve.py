@@ -0,0 +1,145 @@
+# Unittests for the serve.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isfile
+import http.client
+import json
+import shutil
+import socket
+import threading
+import logging
+
+from alacrity import serve
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """ HTTP client connection over a Unix domain socket """
+
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self, 'localhost')
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class TestServe(unittest.TestCase):
+    """ Unittests for alacrity.serve """
+
+    def setUp(self):
+        logging.basicConfig(level=logging.CRITICAL)
+        self.cache = os.path.abspath('test_serve_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.root = os.path.abspath('test_serve_root')
+        self.options = {'root': self.root}
+        self.answers = {'license': 'mit', 'version': '0.1.0',
+                        'author': 'testname'}
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def start(self, **kwargs):
+        self.server = serve.make_server(self.options, workers=2, **kwargs)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+
+    def request(self, connection, method, path, body=None, headers=None):
+        data = None if body is None else json.dumps(body)
+        if headers is None:
+            headers = {'Content-Type': 'application/json'}
+        connection.request(method, path, body=data, headers=headers)
+        response = connection.getresponse()
+        result = response.status, json.loads(response.read().decode('utf-8'))
+        connection.close()
+        return result
+
+    def test_scaffold_over_http(self):
+        self.start(port=0)
+
+        def connection():
+            return http.client.HTTPConnection(
+                *self.server.server_address[:2])
+
+        code, body = self.request(connection(), 'GET', '/health')
+        self.assertEqual(code, 200)
+
+        request = dict(self.answers, package_name='served')
+        code, record = self.request(connection(), 'POST', '/scaffold',
+                                    request)
+        self.assertEqual(code, 200)
+        self.assertIsNone(record['error'])
+        self.assertEqual(record['path'], join(self.root, 'served'))
+        self.assertTrue(isfile(join(self.root, 'served', 'setup.py')))
+
+        # The same name is refused rather than replaced
+        code, record = self.request(connection(), 'POST', '/scaffold',
+                                    request)
+        self.assertEqual(code, 409)
+
+        code, record = self.request(connection(), 'POST', '/scaffold',
+                                    dict(self.answers,
+                                         package_name='../escape'))
+        self.assertEqual(code, 400)
+
+    def test_invalid_requests(self):
+        self.start(port=0)
+
+        def post(body, headers=None):
+            connection = http.client.HTTPConnection(
+                *self.server.server_address[:2])
+            return self.request(connection, 'POST', '/scaffold', body,
+                                headers)[0]
+
+        request = dict(self.answers, package_name='refused')
+        for venv_name in ('../../escaped_venv', '/tmp/escaped', '..'):
+            self.assertEqual(post(dict(request, venv='y',
+                                       venv_name=venv_name)), 400)
+        self.assertEqual(post({'answers': request,
+                               'options': {'durability': 'always'}}), 400)
+
+        # Browsers cannot reach the server from another site
+        self.assertEqual(post(request, {'Content-Type': 'text/plain'}), 415)
+        self.assertEqual(post(request, {'Content-Type': 'application/json',
+                                        'Origin': 'http://example.com'}),
+                         403)
+        self.assertFalse(os.path.exists(join(self.root, 'refused')))
+
+    @unittest.skipUnless(serve.UnixScaffoldServer, "No Unix sockets")
+    def test_scaffold_over_unix_socket(self):
+        os.makedirs(self.root)
+        path = join(self.root, 'alacrity.sock')
+        self.start(socket_path=path)
+
+        code, record = self.request(UnixHTTPConnection(path), 'POST',
+                                    '/scaffold',
+                                    {'answers': dict(self.answers,
+                                                     package_name='unix')})
+        self.assertEqual(code, 200)
+        self.assertTrue(isfile(join(self.root, 'unix', 'LICENSE')))
+
+    @unittest.skipUnless(serve.UnixScaffoldServer, "No Unix sockets")
+    def test_socket_path_is_not_a_socket(self):
+        os.makedirs(self.root)
+        path = join(self.root, 'keep.txt')
+        with open(path, 'w') as fobj:
+            fobj.write('keep')
+
+        with self.assertRaises(ValueError):
+            serve.make_server(self.options, socket_path=path)
+        with open(path) as fobj:
+            self.assertEqual(fobj.read(), 'keep')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# Unittests for the snapshots.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isdir, isfile
+import shutil
+import logging
+
+from alacrity import core
+from alacrity import lib
+from alacrity import snapshots
+
+
+class TestSnapshots(unittest.TestCase):
+    """ Unittests for alacrity.snapshots """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_snapshot_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.answers = {'version': '0.1.0', 'author': 'testname',
+                        'license': 'mit'}
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        for name in ('snap_first', 'snap_second_longer'):
+            lib.remove_package(name)
+
+    def test_key_ignores_package_name(self):
+        first = dict(self.answers, package_name='a')
+        second = dict(self.answers, package_name='b')
+        self.assertEqual(snapshots.snapshot_key(first),
+                         snapshots.snapshot_key(second))
+        self.assertNotEqual(snapshots.snapshot_key(first),
+                            snapshots.snapshot_key(dict(first,
+                                                        license='gpl3')))
+
+    def test_generate_from_snapshot(self):
+        options = {'snapshot': True}
+
+        status = core.new_status()
+        core.generate('snap_first', status, answers=self.answers,
+                      options=options)
+        self.assertEqual(len(os.listdir(join(self.cache, 'snapshots'))), 1)
+
+        status = core.new_status()
+        with mock.patch.object(lib, 'create_starter_files') as starters:
+            core.generate('snap_second_longer', status, answers=self.answers,
+                          options=options)
+            self.assertFalse(starters.called)
+
+        # Every snapshot task is reported done and the tree is renamed
+        for task in snapshots.snapshot_tasks:
+            self.assertTrue(status[task])
+        self.assertTrue(isfile(join('snap_second_longer',
+                                    'snap_second_longer', 'core.py')))
+        self.assertFalse(isdir('snap_second_longer/' +
+                               snapshots.package_placeholder))
+
+        # Name dependent files are rendered for the new name
+        with open('snap_second_longer/README.rst') as obj:
+            self.assertEqual(obj.readline().strip(),
+                             '=' * len('snap_second_longer'))
+        with open('snap_second_longer/setup.py') as obj:
+            self.assertIn('name="snap_second_longer"', obj.read())
+        with open('snap_second_longer/LICENSE') as obj:
+            self.assertIn('testname', obj.read())
+
+    def test_key_uses_effective_author(self):
+        options = {'snapshot': True}
+        answers = {'version': '0.1.0', 'license': 'mit'}
+
+        for name, author in (('snap_first', 'Old Name'),
+                             ('snap_second_longer', 'New Name')):
+            with mock.patch.object(lib, 'git_identity',
+                                   return_value=(author, 'a@example.com')):
+                core.generate(name, core.new_status(), answers=answers,
+                              options=options)
+
+        # A changed git identity misses the snapshot of the old one
+        self.assertEqual(len(os.listdir(join(self.cache, 'snapshots'))), 2)
+        with open('snap_second_longer/LICENSE') as obj:
+            self.assertIn('New Name', obj.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# Startup time checks for the alacrity entry point
+
+import unittest
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed for alacrity.core on trivial commands
+IMPORT_BUDGET_US = int(os.environ.get('ALACRITY_IMPORT_BUDGET_US', 50000))
+
+# Modules that must not be loaded to answer --version or -h
+HEAVY_MODULES = ('clint', 'alacrity.lib', 'alacrity.batch', 'subprocess',
+                 'configparser', 'datetime')
+
+ENTRY = "import sys; from alacrity import core; sys.argv[0] = 'alacrity'; " \
+        "core.main()"
+
+
+def import_times(*args):
+    """
+    Run the entry point with -X importtime
+    :param args: The command line arguments passed to alacrity
+    :return: Dictionary of module name to cumulative import time in us
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    command = [sys.executable, '-X', 'importtime', '-c', ENTRY] + list(args)
+    process = subprocess.run(command, cwd=root, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+
+    times = {}
+    for line in process.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime needs Python 3.7")
+class TestStartup(unittest.TestCase):
+    """ Import time budget of alacrity.core """
+
+    def check_command(self, *args):
+        times = import_times(*args)
+
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+        self.assertIn('alacrity.core', times)
+        self.assertLess(times['alacrity.core'], IMPORT_BUDGET_US)
+
+    def test_version(self):
+        self.check_command('--version')
+
+    def test_help(self):
+        self.check_command('-h')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Unittests for the steps.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isfile
+import shutil
+import threading
+import logging
+
+from alacrity import core
+from alacrity import lib
+from alacrity import steps
+from alacrity.steps import Step
+
+
+class TestSteps(unittest.TestCase):
+    """ Unittests for alacrity.steps """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_steps_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        steps.registry.remove('changelog')
+        lib.remove_package('steps_package')
+
+    def test_dependencies(self):
+        first = Step('first', None, provides=('a',))
+        second = Step('second', None, requires=('a',), provides=('b',))
+        self.assertEqual(steps.dependencies([first, second]),
+                         {'first': set(), 'second': {'first'}})
+
+        # Artifacts that are already available need no provider
+        self.assertEqual(steps.dependencies([second], provided={'a'}),
+                         {'second': set()})
+        self.assertRaises(ValueError, steps.dependencies, [second])
+
+        loop = Step('loop', None, requires=('b',), provides=('a',))
+        self.assertRaises(ValueError, steps.dependencies, [loop, second])
+
+    def test_independent_steps_overlap(self):
+        # Both steps must be running at once to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        order = []
+
+        def wait(context):
+            barrier.wait()
+
+        def last(context):
+            order.append('last')
+            return {'result': 42}
+
+        failures = steps.run([Step('one', wait, provides=('done',)),
+                              Step('two', wait, provides=('done',)),
+                              Step('last', last, requires=('done',))],
+                             context={})
+        self.assertEqual(failures, {})
+        self.assertEqual(order, ['last'])
+
+    def test_failure_skips_dependents(self):
+        def fail(context):
+            raise KeyError('broken')
+
+        context = {'timings': {}}
+        failures = steps.run([Step('fail', fail, provides=('a',)),
+                              Step('after', lambda c: None, requires=('a',)),
+                              Step('other', lambda c: {'x': 1})], context)
+        self.assertIsInstance(failures['fail'], KeyError)
+        self.assertIsInstance(failures['after'], steps.StepSkipped)
+        self.assertNotIn('other', failures)
+        self.assertEqual(context['x'], 1)
+        self.assertIn('other', context['timings'])
+
+    def test_ask_questions(self):
+        step = Step('custom', None, questions=(('extra', "[*] {}: ",
+                                                lambda: 'fallback'),))
+        self.assertEqual(steps.ask_questions([step], {})['extra'],
+                         'fallback')
+        self.assertEqual(steps.ask_questions([step], {'extra': 'x'})['extra'],
+                         'x')
+
+    def test_custom_step(self):
+        @steps.register('changelog', requires=('structure', 'version'))
+        def changelog(context):
+            lib.write_file(join(context['path'], 'CHANGELOG.rst'),
+                           "{}\n".format(context['version']),
+                           context['tree'])
+
+        status = core.new_status()
+        timings = {}
+        core.generate('steps_package', status,
+                      answers={'version': '1.2.3', 'license': 'mit'},
+                      timings=timings)
+
+        with open(join('steps_package', 'CHANGELOG.rst')) as fobj:
+            self.assertEqual(fobj.read(), "1.2.3\n")
+        self.assertTrue(isfile(join('steps_package', 'setup.py')))
+        self.assertIn('changelog', timings)
+        self.assertIn('setup', timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# Unittests for the templates.py functions to be placed here
+
+import unittest
+import os
+from os.path import join
+import shutil
+
+from alacrity import templates
+
+
+class TestTemplateStore(unittest.TestCase):
+    """ Unittests for alacrity.templates """
+
+    def setUp(self):
+        self.root = 'test_templates'
+        os.mkdir(self.root)
+        self.store = templates.TemplateStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_get_counts_hits_and_misses(self):
+        with open(join(self.root, 'sample'), 'w') as obj:
+            obj.write("#Testdata#")
+
+        self.assertEqual(self.store.get('sample'), "#Testdata#")
+        self.assertEqual(self.store.get('sample'), "#Testdata#")
+
+        stats = self.store.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_get_reloads_on_change(self):
+        path = join(self.root, 'sample')
+        with open(path, 'w') as obj:
+            obj.write("old")
+        self.assertEqual(self.store.get('sample'), "old")
+
+        with open(path, 'w') as obj:
+            obj.write("newer")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(self.store.get('sample'), "newer")
+        self.assertEqual(self.store.stats()['misses'], 2)
+        self.assertEqual(self.store.stats()['entries'], 1)
+
+    def test_clear(self):
+        with open(join(self.root, 'sample'), 'w') as obj:
+            obj.write("#Testdata#")
+
+        self.store.get('sample')
+        self.store.clear()
+        self.assertEqual(self.store.stats(),
+                         {'hits': 0, 'misses': 0, 'entries': 0})
+
+    def test_bundled_store(self):
+        self.assertIn('[@package_name]', templates.store.get('setup.py'))
+
+    def test_compiled_cached_per_version(self):
+        with open(join(self.root, 'sample'), 'w') as obj:
+            obj.write("[@name]")
+
+        compiled = self.store.compiled('sample')
+        self.assertIs(self.store.compiled('sample'), compiled)
+        self.assertEqual(self.store.render('sample', {'name': 'x'}), 'x')
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    """ Unittests for alacrity.templates.CompiledTemplate """
+
+    def test_render_variables(self):
+        template = templates.CompiledTemplate("name=[@name] v=[@version]")
+        self.assertEqual(template.render({'name': 'pkg', 'version': '1.0'}),
+                         "name=pkg v=1.0")
+
+    def test_render_single_pass(self):
+        # Values are never re-scanned for tokens
+        template = templates.CompiledTemplate("[@a][@b]")
+        self.assertEqual(template.render({'a': '[@b]', 'b': 'x'}), "[@b]x")
+
+    def test_unknown_tokens_kept(self):
+        template = templates.CompiledTemplate("[@known] [@unknown]")
+        self.assertEqual(template.render({'known': 'k'}), "k [@unknown]")
+
+    def test_sections(self):
+        template = templates.CompiledTemplate(
+            "[@#docs]docs [@/docs][@^docs]nodocs [@/docs]end")
+        self.assertEqual(template.render({'docs': True}), "docs end")
+        self.assertEqual(template.render({'docs': False}), "nodocs end")
+        self.assertEqual(template.render({}), "nodocs end")
+
+    def test_loops(self):
+        template = templates.CompiledTemplate(
+            "[@#deps][@name]==[@version]\n[@/deps][@#tags]-[@.][@/tags]")
+        context = {'deps': [{'name': 'a', 'version': '1'},
+                            {'name': 'b', 'version': '2'}],
+                   'tags': ['x', 'y']}
+        self.assertEqual(template.render(context), "a==1\nb==2\n-x-y")
+
+    def test_verbatim(self):
+        text = "no tokens [here]"
+        template = templates.CompiledTemplate(text)
+        self.assertTrue(template.verbatim)
+        self.assertIs(template.render({}), text)
+
+    def test_unbalanced(self):
+        self.assertRaises(templates.TemplateSyntaxError,
+                          templates.CompiledTemplate, "[@#a]open")
+        self.assertRaises(templates.TemplateSyntaxError,
+                          templates.CompiledTemplate, "[@#a][@/b]")
+
+
+if __name__ == '__main__':
+    unittest.main()
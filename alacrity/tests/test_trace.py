@@ -0,0 +1,88 @@
+# Unittests for the trace.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+import json
+import logging
+import shutil
+
+from alacrity import batch
+from alacrity import lib
+from alacrity import trace
+
+
+class TestTrace(unittest.TestCase):
+    """ Unittests for alacrity.trace """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_trace_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        logging.basicConfig(level=logging.CRITICAL)
+        trace.enable()
+
+    def tearDown(self):
+        trace.disable()
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        for path in ('test_trace.json', 'test_trace.jsonl'):
+            if os.path.isfile(path):
+                os.remove(path)
+        for name in ('trace_first', 'trace_second'):
+            lib.remove_package(name)
+
+    def test_span(self):
+        with trace.span('step', package='name'):
+            pass
+        with self.assertRaises(KeyError):
+            with trace.span('failing'):
+                raise KeyError()
+
+        first, second = trace.events()
+        self.assertEqual(first['name'], 'step')
+        self.assertEqual(first['ph'], 'X')
+        self.assertEqual(first['args'], {'package': 'name'})
+        self.assertEqual(second['args'], {'error': 'KeyError'})
+
+    def test_disabled(self):
+        trace.disable()
+        with trace.span('step'):
+            pass
+        self.assertEqual(trace.events(), [])
+
+    def test_export(self):
+        lib.load_template('gitignore.txt')
+
+        trace.export('test_trace.json')
+        with open('test_trace.json', 'r') as fobj:
+            events = json.load(fobj)['traceEvents']
+        self.assertEqual(events[0]['name'], 'template.load')
+
+        trace.export('test_trace.jsonl')
+        with open('test_trace.jsonl', 'r') as fobj:
+            lines = [json.loads(line) for line in fobj]
+        self.assertEqual(lines, events)
+
+    def test_worker_events_are_merged(self):
+        entries = [{'package_name': 'trace_first', 'license': 'mit'},
+                   {'package_name': 'trace_second', 'license': 'mit'}]
+        # Recorded before the workers fork, it must not come back with them
+        with trace.span('parent'):
+            pass
+        batch.run_batch(entries, jobs=2)
+        self.assertEqual([event['name'] for event in trace.events()
+                          if event['name'] == 'parent'], ['parent'])
+
+        generated = [event for event in trace.events()
+                     if event['name'] == 'generate']
+        self.assertEqual(sorted(event['args']['package']
+                                for event in generated),
+                         ['trace_first', 'trace_second'])
+        self.assertNotIn(os.getpid(), [event['pid'] for event in generated])
+        self.assertIn('write', [event['name'] for event in trace.events()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# Unittests for the tree.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isfile
+import shutil
+import logging
+
+from alacrity import core
+from alacrity import lib
+from alacrity import tree as tree_module
+from alacrity.tree import TreeWriter
+
+
+class TestTree(unittest.TestCase):
+    """ Unittests for alacrity.tree """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_tree_cache')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+        self.path = os.path.abspath('test_tree')
+        logging.basicConfig(level=logging.CRITICAL)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+        lib.remove_package('tree_package')
+
+    def test_unknown_durability(self):
+        with self.assertRaises(ValueError):
+            TreeWriter('always')
+
+    def test_nothing_written_before_flush(self):
+        tree = TreeWriter()
+        tree.mkdir(self.path)
+        tree.write(join(self.path, 'a.txt'), 'first\n')
+        self.assertFalse(os.path.exists(self.path))
+
+        self.assertEqual(tree.flush(), [])
+        with open(join(self.path, 'a.txt'), 'r') as fobj:
+            self.assertEqual(fobj.read(), 'first\n')
+
+    def test_durability_levels(self):
+        # Two files and their directory, never a host wide sync
+        for durability, syncfs, fsyncs, synced in (
+                ('none', True, 0, 0), ('tree', True, 0, 1),
+                ('tree', False, 3, 1), ('file', True, 3, 0)):
+            tree = TreeWriter(durability)
+            tree.mkdir(self.path)
+            tree.write(join(self.path, 'a.txt'), 'a')
+            tree.write(join(self.path, 'b.txt'), '')
+            with mock.patch.object(os, 'sync', create=True) as sync, \
+                    mock.patch.object(os, 'fsync') as fsync, \
+                    mock.patch.object(tree_module, 'sync_filesystem',
+                                      return_value=syncfs) as filesystem:
+                self.assertEqual(tree.flush(), [])
+            self.assertFalse(sync.called)
+            self.assertEqual(fsync.call_count, fsyncs)
+            self.assertEqual(filesystem.call_count, synced)
+            shutil.rmtree(self.path)
+
+    def test_sync_filesystem(self):
+        os.makedirs(self.path)
+        if tree_module.libc_syncfs() is not None:
+            self.assertTrue(tree_module.sync_filesystem(self.path))
+        self.assertFalse(tree_module.sync_filesystem(join(self.path,
+                                                          'missing')))
+
+    def test_copy_without_reading(self):
+        source = join(self.path, 'source.txt')
+        os.makedirs(self.path)
+        data = b'verbatim\r\n' * 10000
+        with open(source, 'wb') as fobj:
+            fobj.write(data)
+
+        tree = TreeWriter()
+        tree.write(join(self.path, 'copy.txt'), 'replaced')
+        tree.copy(join(self.path, 'copy.txt'), source, 'copy_created')
+        self.assertEqual(tree.written(), [join(self.path, 'copy.txt')])
+        self.assertEqual(tree.flush(), [])
+        with open(join(self.path, 'copy.txt'), 'rb') as fobj:
+            self.assertEqual(fobj.read(), data)
+
+    @unittest.skipUnless(os.name == 'posix', "fcntl is POSIX only")
+    def test_copy_file_fallbacks(self):
+        source = join(self.path, 'source.txt')
+        os.makedirs(self.path)
+        data = os.urandom(100000)
+        with open(source, 'wb') as fobj:
+            fobj.write(data)
+
+        def unsupported(*args):
+            raise OSError(tree_module.errno.EXDEV, "Cross-device link")
+
+        # Every in-kernel copy failing leaves plain reads and writes
+        for disabled in ((), ('copy_file_range',),
+                         ('copy_file_range', 'sendfile')):
+            target = join(self.path, 'target.txt')
+            patches = [mock.patch.object(os, name, unsupported, create=True)
+                       for name in disabled]
+            for patch in patches:
+                patch.start()
+            try:
+                with mock.patch('fcntl.ioctl', side_effect=OSError):
+                    with open(source, 'rb') as src, \
+                            open(target, 'wb') as dst:
+                        tree_module.copy_file(src.fileno(), dst.fileno())
+            finally:
+                for patch in patches:
+                    patch.stop()
+            with open(target, 'rb') as fobj:
+                self.assertEqual(fobj.read(), data)
+            os.remove(target)
+
+    def test_failed_file_resets_task(self):
+        status = {'readme_created': True}
+        tree = TreeWriter()
+        missing = join(self.path, 'missing', 'README.rst')
+        tree.write(missing, 'text', 'readme_created')
+
+        self.assertEqual(tree.flush(status), [missing])
+        self.assertFalse(status['readme_created'])
+
+    def test_generate_flushes_once(self):
+        answers = {'version': '0.1.0', 'author': 'testname',
+                   'license': 'mit'}
+        status = core.new_status()
+        with mock.patch.object(TreeWriter, 'flush',
+                               autospec=True,
+                               side_effect=TreeWriter.flush) as flush:
+            core.generate('tree_package', status, answers=answers,
+                          options={'durability': 'file'})
+        self.assertEqual(flush.call_count, 1)
+        self.assertTrue(status['structure_created'])
+        self.assertTrue(isfile(join('tree_package', 'tree_package',
+                                    'core.py')))
+        self.assertTrue(isfile(join('tree_package', 'tests',
+                                    'test_lib.py')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Unittests for the venvs.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isdir, isfile
+import shutil
+import subprocess
+
+from alacrity import venvs
+
+
+class TestVenvs(unittest.TestCase):
+    """ Unittests for alacrity.venvs """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_venv_cache')
+        self.path = os.path.abspath('test_venv_target')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_template_is_built_once(self):
+        template = venvs.ensure_template(with_pip=False)
+        self.assertTrue(isfile(join(template, 'pyvenv.cfg')))
+
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            self.assertEqual(venvs.ensure_template(with_pip=False), template)
+            self.assertFalse(check_output.called)
+
+    def test_template_key(self):
+        self.assertNotEqual(venvs.template_key(with_pip=True),
+                            venvs.template_key(with_pip=False))
+        self.assertNotEqual(venvs.template_key(system_site_packages=True),
+                            venvs.template_key())
+
+    def test_settings(self):
+        self.assertEqual(venvs.settings(),
+                         {'with_pip': True,
+                          'symlinks': venvs.default_symlinks,
+                          'system_site_packages': False})
+
+        settings = venvs.settings({'venv_without_pip': True,
+                                   'venv_copies': True,
+                                   'venv_system_site_packages': True})
+        self.assertEqual(settings, {'with_pip': False, 'symlinks': False,
+                                    'system_site_packages': True})
+
+        # Seeding from a wheelhouse keeps pip
+        self.assertTrue(venvs.settings({'venv_without_pip': True,
+                                        'wheelhouse': 'wheels'})['with_pip'])
+
+    def test_build_in_process(self):
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            venvs.build(self.path, with_pip=False, symlinks=False,
+                        system_site_packages=True)
+            self.assertFalse(check_output.called)
+
+        with open(join(self.path, 'pyvenv.cfg')) as cfg:
+            self.assertIn('include-system-site-packages = true', cfg.read())
+        scripts = 'Scripts' if os.name == 'nt' else 'bin'
+        self.assertFalse(os.path.islink(join(self.path, scripts, 'python')))
+
+    def test_prompt_needs_python_36(self):
+        import venv
+        for version, prompt in (((3, 5, 9), None), ((3, 6, 0), 'name')):
+            with mock.patch.object(venvs.sys, 'version_info', version), \
+                    mock.patch.object(venv, 'EnvBuilder') as builder:
+                venvs.build(self.path, prompt='name')
+            self.assertEqual(builder.call_args[1].get('prompt'), prompt)
+
+    def test_create(self):
+        venvs.create(self.path, with_pip=False)
+
+        # The clone points at itself, not at the template
+        with open(join(self.path, 'pyvenv.cfg')) as cfg:
+            self.assertNotIn(venvs.prompt_placeholder, cfg.read())
+        self.assertFalse(isfile(join(self.path, venvs.marker_name)))
+
+        scripts = 'Scripts' if os.name == 'nt' else 'bin'
+        with open(join(self.path, scripts, 'activate')) as activate:
+            data = activate.read()
+        self.assertIn(self.path, data)
+        self.assertNotIn(venvs.prompt_placeholder, data)
+
+        python = join(self.path, scripts, 'python')
+        out = subprocess.check_output([python, '-c',
+                                       'import sys; print(sys.prefix)'])
+        self.assertEqual(os.path.realpath(out.decode('utf-8').strip()),
+                         os.path.realpath(self.path))
+        self.assertTrue(isdir(join(self.path, 'lib')) or
+                        isdir(join(self.path, 'Lib')))
+
+
+if __name__ == '__main__':
+    unittest.main()
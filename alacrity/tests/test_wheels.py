@@ -0,0 +1,69 @@
+# Unittests for the wheels.py functions to be placed here
+
+import unittest
+from unittest import mock
+import os
+from os.path import join, isfile
+import shutil
+import subprocess
+
+from alacrity import wheels
+
+
+class TestWheels(unittest.TestCase):
+    """ Unittests for alacrity.wheels """
+
+    def setUp(self):
+        self.cache = os.path.abspath('test_wheel_cache')
+        self.houses = [os.path.abspath('test_wheelhouse_a'),
+                       os.path.abspath('test_wheelhouse_b')]
+        for house in self.houses:
+            os.mkdir(house)
+            with open(join(house, 'sample-1.0-py3-none-any.whl'), 'wb') as obj:
+                obj.write(b'wheel contents')
+        self.patcher = mock.patch.dict(os.environ,
+                                       {'ALACRITY_CACHE_DIR': self.cache})
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.cache, ignore_errors=True)
+        for house in self.houses:
+            shutil.rmtree(house, ignore_errors=True)
+
+    def test_import_wheelhouse(self):
+        index = wheels.import_wheelhouse(self.houses[0])
+        named = join(index, 'sample-1.0-py3-none-any.whl')
+        self.assertTrue(isfile(named))
+
+        # Identical wheels from other wheelhouses share one cached object
+        other = wheels.import_wheelhouse(self.houses[1])
+        objects = os.listdir(join(self.cache, 'wheels', 'objects'))
+        self.assertEqual(objects, [wheels.digest(named)])
+
+        # but each wheelhouse only exposes its own wheels to pip
+        self.assertNotEqual(index, other)
+        with open(join(self.houses[1], 'extra-2.0-py3-none-any.whl'),
+                  'wb') as obj:
+            obj.write(b'other wheel')
+        wheels.import_wheelhouse(self.houses[1])
+        self.assertEqual(os.listdir(wheels.import_wheelhouse(self.houses[0])),
+                         ['sample-1.0-py3-none-any.whl'])
+
+        os.remove(join(self.houses[1], 'extra-2.0-py3-none-any.whl'))
+        self.assertEqual(os.listdir(wheels.import_wheelhouse(self.houses[1])),
+                         ['sample-1.0-py3-none-any.whl'])
+
+    def test_install_requirements_offline(self):
+        with mock.patch.object(subprocess, 'check_output') as check_output:
+            elapsed = wheels.install_requirements('env', 'requirements.txt',
+                                                  self.houses[0])
+
+        command = check_output.call_args[0][0]
+        self.assertIn('--no-index', command)
+        self.assertEqual(command[-2:], ['-r', 'requirements.txt'])
+        self.assertGreaterEqual(elapsed, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
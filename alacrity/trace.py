@@ -0,0 +1,156 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Recorded events while tracing is enabled, None when it is off so an
+# untraced run only pays for one attribute check per span
+_events = None
+_lock = threading.Lock()
+
+
+def enable():
+    """
+    Start recording spans in this process
+    :return: None
+    """
+
+    global _events
+    with _lock:
+        if _events is None:
+            _events = []
+
+
+def disable():
+    """
+    Stop recording spans and drop the recorded events
+    :return: None
+    """
+
+    global _events
+    with _lock:
+        _events = None
+
+
+def enabled():
+    """
+    Check whether spans are being recorded
+    :return: True or False
+    """
+
+    return _events is not None
+
+
+def events():
+    """
+    List the events recorded so far
+    :return: List of Chrome trace event dictionaries
+    """
+
+    with _lock:
+        return list(_events or [])
+
+
+def drain():
+    """
+    Hand over the events recorded so far and start a fresh list, used by
+    worker processes to send their events back to the parent
+    :return: List of Chrome trace event dictionaries
+    """
+
+    global _events
+    with _lock:
+        recorded = _events or []
+        if _events is not None:
+            _events = []
+    return recorded
+
+
+def merge(recorded):
+    """
+    Add events recorded elsewhere (e.g. in a worker process)
+    :param recorded: List of Chrome trace event dictionaries
+    :return: None
+    """
+
+    with _lock:
+        if _events is not None:
+            _events.extend(recorded)
+
+
+@contextlib.contextmanager
+def span(name, category='alacrity', **args):
+    """
+    Time the enclosed block as a complete ("X") trace event
+    :param name: The name of the step
+    :param category: The category shown by trace viewers
+    :param args: Extra values attached to the event
+    :return: None
+    """
+
+    if _events is None:
+        yield
+        return
+
+    # Wall clock start so events of several processes line up, monotonic
+    # clock for the duration
+    ts = time.time() * 1e6
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        args['error'] = type(e).__name__
+        raise
+    finally:
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': ts,
+                 'dur': (time.perf_counter() - start) * 1e6,
+                 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        with _lock:
+            if _events is not None:
+                _events.append(event)
+
+
+def traced(name, category='alacrity'):
+    """
+    Decorate a function so every call is recorded as a span
+    :param name: The name of the step
+    :param category: The category shown by trace viewers
+    :return: The decorator
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return function(*args, **kwargs)
+            with span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export(path, recorded=None):
+    """
+    Write events as Chrome trace JSON, or as one JSON event per line when
+    path ends in .jsonl
+    :param path: The file to write
+    :param recorded: The events to write (defaults to the recorded ones)
+    :return: None
+    """
+
+    import json
+
+    if recorded is None:
+        recorded = events()
+    recorded = sorted(recorded, key=lambda event: event['ts'])
+
+    with open(path, "w") as trace_file:
+        if path.lower().endswith('.jsonl'):
+            for event in recorded:
+                trace_file.write(json.dumps(event, sort_keys=True) + "\n")
+        else:
+            json.dump({'traceEvents': recorded, 'displayTimeUnit': 'ms'},
+                      trace_file)
@@ -0,0 +1,364 @@
+import ctypes
+import errno
+import functools
+import logging
+import os
+import shutil
+
+from alacrity.trace import traced
+
+logger = logging.getLogger(__name__)
+
+# none: leave flushing to the OS, tree: sync the filesystem holding the tree
+# once it is all written, file: fsync every file as it is written
+durability_levels = ('none', 'tree', 'file')
+# ioctl sharing the blocks of one file with another (Linux reflink)
+ficlone = 0x40049409
+# Errors of an in-kernel copy the filesystem or platform does not support
+unsupported = {getattr(errno, name) for name in
+               ('EXDEV', 'EINVAL', 'ENOSYS', 'EOPNOTSUPP', 'ENOTSUP', 'EBADF')
+               if hasattr(errno, name)}
+
+
+def fsync_directory(path):
+    """
+    Flush the entries of a directory (the names created in it) to stable
+    storage, where the platform can open directories
+    :param path: The path of the directory
+    :return: None
+    """
+
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@functools.lru_cache(maxsize=None)
+def libc_syncfs():
+    """
+    :return: The syncfs function of the C library, None where there is none
+    """
+
+    try:
+        return getattr(ctypes.CDLL(None, use_errno=True), 'syncfs', None)
+    except (OSError, TypeError):
+        return None
+
+
+def sync_filesystem(path):
+    """
+    Flush every pending write of the filesystem holding a path in a single
+    call (Linux syncfs)
+    :param path: A directory on the filesystem
+    :return: True if the filesystem was synced, False if it could not be
+    """
+
+    function = libc_syncfs()
+    if function is None:
+        return False
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        return function(fd) == 0
+    finally:
+        os.close(fd)
+
+
+def copy_file(source, destination):
+    """
+    Copy the contents of one file to another without reading them into
+    Python: a reflink where the filesystem shares blocks, otherwise
+    copy_file_range or sendfile, and plain reads only as the last resort
+    :param source: File descriptor open for reading, at offset 0
+    :param destination: Empty file descriptor open for writing
+    :return: None
+    """
+
+    try:
+        import fcntl
+        fcntl.ioctl(destination, ficlone, source)
+        return
+    except (ImportError, OSError):
+        pass
+
+    size = os.fstat(source).st_size
+    for name in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, name):
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if name == 'copy_file_range':
+                    sent = os.copy_file_range(source, destination,
+                                              size - offset)
+                else:
+                    sent = os.sendfile(destination, source, offset,
+                                       size - offset)
+                if not sent:
+                    # The file shrank while it was copied
+                    break
+                offset += sent
+            return
+        except OSError as e:
+            # Only an untouched destination can be retried another way
+            if offset or e.errno not in unsupported:
+                raise
+
+    os.lseek(source, 0, os.SEEK_SET)
+    while True:
+        chunk = os.read(source, 1 << 20)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(destination, view):]
+
+
+class TreeWriter(object):
+    """
+    Collects a planned directory tree in memory and writes it in one pass
+    """
+
+    def __init__(self, durability='none'):
+        """
+        :param durability: One of durability_levels
+        """
+
+        if durability not in durability_levels:
+            raise ValueError("Unknown durability {}".format(durability))
+
+        self.durability = durability
+        self.dirs = []
+        self.files = {}
+        # Files copied as they are from another file, never read into memory
+        self.copies = {}
+        self.tasks = {}
+
+    def mkdir(self, path):
+        """
+        Plan a directory
+        :param path: The path of the directory
+        :return: None
+        """
+
+        self.dirs.append(path)
+
+    def write(self, path, data, task=None):
+        """
+        Plan a file, replacing any earlier plan for the same path
+        :param path: The path of the file
+        :param data: The text of the file
+        :param task: The status key reporting this file
+        :return: None
+        """
+
+        self.copies.pop(path, None)
+        self.files[path] = data
+        if task is not None:
+            self.tasks[path] = task
+
+    def copy(self, path, source, task=None):
+        """
+        Plan a file holding the exact bytes of another file, replacing any
+        earlier plan for the same path
+        :param path: The path of the file
+        :param source: The path of the file to copy
+        :param task: The status key reporting this file
+        :return: None
+        """
+
+        self.files.pop(path, None)
+        self.copies[path] = source
+        if task is not None:
+            self.tasks[path] = task
+
+    def drop(self, path):
+        """
+        Forget the plan of a file
+        :param path: The path of the file
+        :return: None
+        """
+
+        self.files.pop(path, None)
+        self.copies.pop(path, None)
+        self.tasks.pop(path, None)
+
+    def digest(self, path):
+        """
+        Hash the bytes a planned file will hold
+        :param path: The path of the file
+        :return: sha256 hex digest
+        """
+
+        import hashlib
+
+        digest = hashlib.sha256()
+        if path in self.copies:
+            with open(self.copies[path], "rb") as source:
+                for chunk in iter(lambda: source.read(1 << 20), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(self.encode(self.files[path]))
+        return digest.hexdigest()
+
+    def encode(self, data):
+        """
+        Convert planned text to the bytes written to disk
+        :param data: The text of the file
+        :return: bytes
+        """
+
+        if os.linesep != '\n':
+            data = data.replace('\n', os.linesep)
+        return data.encode('utf-8')
+
+    @traced('write')
+    def flush(self, status=None, replace=False):
+        """
+        Write every planned directory and file with as few syscalls as
+        possible, then apply the durability level
+        :param status: Dictionary containing the workflow status, tasks of
+                       files that fail to be written are reset to False
+        :param replace: Write each file to a temporary sibling and rename it
+                        over the existing one, so that no reader ever sees a
+                        truncated file
+        :return: List of the paths that could not be written
+        """
+
+        failed = []
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | \
+            getattr(os, 'O_BINARY', 0)
+
+        for path in self.dirs:
+            try:
+                os.mkdir(path)
+            except OSError:
+                logger.exception("[!] Directory {} could not be "
+                                 "created".format(path))
+                failed.append(path)
+
+        for path in self.written():
+            destination = "{}.{}.tmp".format(path, os.getpid()) if replace \
+                else path
+            try:
+                fd = os.open(destination, flags, 0o666)
+                try:
+                    if path in self.copies:
+                        source = os.open(self.copies[path],
+                                         os.O_RDONLY |
+                                         getattr(os, 'O_BINARY', 0))
+                        try:
+                            copy_file(source, fd)
+                        finally:
+                            os.close(source)
+                    elif self.files[path]:
+                        view = memoryview(self.encode(self.files[path]))
+                        while view:
+                            view = view[os.write(fd, view):]
+                    if self.durability == 'file':
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
+                if replace:
+                    if os.path.exists(path):
+                        # Keep the permissions of the file being replaced
+                        shutil.copymode(path, destination)
+                    os.replace(destination, path)
+            except OSError:
+                logger.exception("[!] File {} could not be "
+                                 "written".format(path))
+                failed.append(path)
+                if replace:
+                    try:
+                        os.remove(destination)
+                    except OSError:
+                        pass
+                if status is not None and path in self.tasks:
+                    status[self.tasks[path]] = False
+
+        if self.durability == 'tree':
+            # One syncfs per filesystem covers the files and the directory
+            # entries, each file is synced in turn only where it fails
+            if not self.sync_filesystems():
+                self.fsync_files()
+                self.fsync_dirs()
+        elif self.durability == 'file':
+            self.fsync_dirs()
+
+        return failed
+
+    def parents(self):
+        """
+        :return: Set of the directories holding the written files
+        """
+
+        parents = set(self.dirs)
+        parents.update(os.path.dirname(path) for path in self.written())
+        return parents
+
+    def sync_filesystems(self):
+        """
+        Flush the written tree with one sync_filesystem() call per
+        filesystem it spans
+        :return: True if every filesystem was synced
+        """
+
+        devices = {}
+        for path in sorted(self.parents()):
+            try:
+                devices.setdefault(os.stat(path).st_dev, path)
+            except OSError:
+                pass
+        return bool(devices) and \
+            all([sync_filesystem(path) for path in devices.values()])
+
+    def fsync_files(self):
+        """
+        Flush every written file to stable storage one by one
+        :return: None
+        """
+
+        for path in self.written():
+            try:
+                fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+    def fsync_dirs(self):
+        """
+        Flush the directories holding the written files, so that their
+        names survive a crash along with their contents
+        :return: None
+        """
+
+        for path in sorted(self.parents()):
+            fsync_directory(path)
+
+    def written(self):
+        """
+        List the planned files, written and copied
+        :return: List of paths in write order
+        """
+
+        return list(self.files) + list(self.copies)
+
+    def paths(self):
+        """
+        List the planned directories and files
+        :return: List of paths in write order
+        """
+
+        return list(self.dirs) + self.written()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from os.path import join, isdir
+
+from alacrity.cache import cache_dir
+from alacrity.trace import traced
+
+logger = logging.getLogger(__name__)
+
+# Placeholder prompt of template environments, replaced by the target name
+prompt_placeholder = '__alacrity_venv_prompt__'
+# Records the path a template was built at, excluded from clones
+marker_name = 'alacrity-template.json'
+# Only these files embed the environment path
+rewrite_files = ('pyvenv.cfg',)
+rewrite_dirs = ('bin', 'Scripts')
+# Like python -m venv, symlink the interpreter except on Windows
+default_symlinks = os.name != 'nt'
+
+
+def settings(options=None):
+    """
+    Translate the run options into EnvBuilder settings
+    :param options: Dictionary of run options (venv_without_pip, venv_copies,
+                    venv_system_site_packages, wheelhouse)
+    :return: Dictionary of with_pip, symlinks and system_site_packages
+    """
+
+    options = options or {}
+    return {
+        # Seeding from a wheelhouse needs pip inside the environment
+        'with_pip': not options.get('venv_without_pip') or
+        bool(options.get('wheelhouse')),
+        'symlinks': default_symlinks and not options.get('venv_copies'),
+        'system_site_packages': bool(options.get('venv_system_site_packages')),
+    }
+
+
+@traced('venv.build')
+def build(target, with_pip=True, symlinks=default_symlinks,
+          system_site_packages=False, prompt=None):
+    """
+    Create a virtual environment in-process with venv.EnvBuilder
+    :param target: The path of the new environment
+    :param with_pip: Whether to bootstrap pip with ensurepip
+    :param symlinks: Whether to symlink the interpreter instead of copying
+    :param system_site_packages: Whether the global site-packages is visible
+    :param prompt: The prompt of the environment (defaults to its name,
+                   and is always its name before Python 3.6)
+    :return: None
+    """
+
+    import venv
+
+    kwargs = {'with_pip': with_pip, 'symlinks': symlinks,
+              'system_site_packages': system_site_packages}
+    # EnvBuilder takes a prompt from Python 3.6 on
+    if prompt is not None and sys.version_info >= (3, 6):
+        kwargs['prompt'] = prompt
+
+    venv.EnvBuilder(**kwargs).create(target)
+
+
+def pip_version():
+    """
+    Find the version of pip that ensurepip bootstraps
+    :return: The version string or None
+    """
+
+    try:
+        import ensurepip
+    except ImportError:
+        return None
+    return ensurepip.version()
+
+
+def template_key(with_pip=True, symlinks=default_symlinks,
+                 system_site_packages=False):
+    """
+    Fingerprint the interpreter, pip version and settings a template is
+    valid for
+    :param with_pip: Whether the template has pip installed
+    :param symlinks: Whether the template symlinks the interpreter
+    :param system_site_packages: Whether the global site-packages is visible
+    :return: Hex digest identifying the template
+    """
+
+    parts = [os.path.realpath(sys.executable), sys.version,
+             str(pip_version()), str(with_pip), str(symlinks),
+             str(system_site_packages)]
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def template_path(with_pip=True, symlinks=default_symlinks,
+                  system_site_packages=False):
+    """
+    Resolve where the template of this interpreter lives
+    :param with_pip: Whether the template has pip installed
+    :param symlinks: Whether the template symlinks the interpreter
+    :param system_site_packages: Whether the global site-packages is visible
+    :return: The path of the template environment
+    """
+
+    return join(cache_dir('venvs'), template_key(with_pip, symlinks,
+                                                 system_site_packages))
+
+
+@traced('venv.template')
+def ensure_template(with_pip=True, symlinks=default_symlinks,
+                    system_site_packages=False):
+    """
+    Build the pristine template environment if it does not exist yet
+    :param with_pip: Whether the template has pip installed
+    :param symlinks: Whether the template symlinks the interpreter
+    :param system_site_packages: Whether the global site-packages is visible
+    :return: The path of the template environment
+    """
+
+    path = template_path(with_pip, symlinks, system_site_packages)
+    if isdir(path):
+        return path
+
+    # Build beside the final location and publish with one rename so that
+    # concurrent builders never see a half built template
+    build_path = "{}.build-{}".format(path, os.getpid())
+
+    logger.debug("[-] Building template environment at {}".format(path))
+    build(build_path, with_pip=with_pip, symlinks=symlinks,
+          system_site_packages=system_site_packages,
+          prompt=prompt_placeholder)
+
+    with open(join(build_path, marker_name), "w") as marker:
+        json.dump({'path': build_path}, marker)
+
+    try:
+        os.rename(build_path, path)
+    except OSError:
+        # Another process published the template first
+        shutil.rmtree(build_path, ignore_errors=True)
+
+    return path
+
+
+@traced('venv.clone')
+def clone(template, target):
+    """
+    Materialise a new environment from a template by hardlinking its files
+    and rewriting the few that embed the environment path
+    :param template: The path of the template environment
+    :param target: The path of the new environment
+    :return: None
+    """
+
+    with open(join(template, marker_name), "r") as marker:
+        build_path = json.load(marker)['path']
+
+    target = os.path.abspath(target)
+    replacements = [
+        (build_path.encode('utf-8'), target.encode('utf-8')),
+        (prompt_placeholder.encode('utf-8'),
+         os.path.basename(target).encode('utf-8')),
+        # Before Python 3.6 the prompt is the name of the build directory
+        (os.path.basename(build_path).encode('utf-8'),
+         os.path.basename(target).encode('utf-8')),
+    ]
+
+    for root, dirs, files in os.walk(template):
+        relative = os.path.relpath(root, template)
+        destination = os.path.normpath(join(target, relative))
+        os.makedirs(destination, exist_ok=True)
+
+        top = relative.split(os.sep)[0]
+
+        for name in dirs + files:
+            source = join(root, name)
+            copy = join(destination, name)
+
+            if os.path.islink(source):
+                link = os.readlink(source)
+                if link.startswith(build_path):
+                    link = target + link[len(build_path):]
+                os.symlink(link, copy)
+                # os.walk does not descend into symlinked directories
+                continue
+
+            if name in dirs:
+                continue
+            if relative == '.' and name == marker_name:
+                continue
+
+            if top in rewrite_dirs or (relative == '.' and
+                                       name in rewrite_files):
+                with open(source, "rb") as source_file:
+                    data = source_file.read()
+                rewritten = data
+                for old, new in replacements:
+                    rewritten = rewritten.replace(old, new)
+                if rewritten != data:
+                    with open(copy, "wb") as copy_file:
+                        copy_file.write(rewritten)
+                    shutil.copymode(source, copy)
+                    continue
+
+            try:
+                os.link(source, copy)
+            except OSError:
+                # Different filesystem or no hardlink support
+                shutil.copy2(source, copy)
+
+
+def create(target, with_pip=True, symlinks=default_symlinks,
+           system_site_packages=False):
+    """
+    Create a virtual environment at target from the cached template
+    :param target: The path of the new environment
+    :param with_pip: Whether the environment needs pip installed
+    :param symlinks: Whether the environment symlinks the interpreter
+    :param system_site_packages: Whether the global site-packages is visible
+    :return: None
+    """
+
+    clone(ensure_template(with_pip, symlinks, system_site_packages), target)
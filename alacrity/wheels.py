@@ -0,0 +1,144 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from os.path import join, basename, isfile
+
+from alacrity.cache import cache_dir
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def digest(path):
+    """
+    Compute the sha256 of a file
+    :param path: The path of the file
+    :return: Hex digest of the contents
+    """
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as wheel:
+        for block in iter(lambda: wheel.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """
+    Hardlink source to destination, copying when links are not possible
+    :param source: The existing file
+    :param destination: The path to create
+    :return: None
+    """
+
+    temp_path = "{}.{}.tmp".format(destination, os.getpid())
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+def import_wheelhouse(wheelhouse):
+    """
+    Add the wheels of a wheelhouse to the shared content-addressed cache
+    :param wheelhouse: The directory holding .whl files
+    :return: The find-links directory exposing the cached wheels of this
+             wheelhouse (and only those) by name
+    """
+
+    root = cache_dir('wheels')
+    objects = cache_dir('wheels', 'objects')
+    # Objects are shared, but every wheelhouse gets its own index so that
+    # pip never resolves wheels another wheelhouse brought in
+    house_key = hashlib.sha256(
+        os.path.abspath(wheelhouse).encode('utf-8')).hexdigest()[:16]
+    index = cache_dir('wheels', 'index', house_key)
+    digests_path = join(root, 'digests.json')
+
+    with _lock:
+        try:
+            with open(digests_path, "r") as digests_file:
+                digests = json.load(digests_file)
+        except (IOError, ValueError):
+            digests = {}
+
+        changed = False
+        names = set()
+        for wheel in sorted(glob.glob(join(wheelhouse, '*.whl'))):
+            names.add(basename(wheel))
+            stat = os.stat(wheel)
+            key = "{}:{}:{}".format(os.path.abspath(wheel), stat.st_size,
+                                    stat.st_mtime_ns)
+
+            # Only hash wheels that are new or changed in the wheelhouse
+            sha = digests.get(key)
+            if sha is None:
+                sha = digest(wheel)
+                digests[key] = sha
+                changed = True
+
+            stored = join(objects, sha)
+            if not isfile(stored):
+                link_or_copy(wheel, stored)
+
+            # pip finds wheels by file name, the index links names to objects
+            named = join(index, basename(wheel))
+            if not isfile(named) or not os.path.samefile(named, stored):
+                link_or_copy(stored, named)
+
+        # Wheels removed from the wheelhouse leave its index as well
+        for name in os.listdir(index):
+            if name.endswith('.whl') and name not in names:
+                os.remove(join(index, name))
+
+        if changed:
+            temp_path = "{}.{}.tmp".format(digests_path, os.getpid())
+            with open(temp_path, "w") as digests_file:
+                json.dump(digests, digests_file)
+            os.replace(temp_path, digests_path)
+
+    return index
+
+
+def venv_python(venv_path):
+    """
+    Locate the interpreter of a virtual environment
+    :param venv_path: The path of the virtual environment
+    :return: The path of its python executable
+    """
+
+    if sys.platform == 'win32':
+        return join(venv_path, 'Scripts', 'python.exe')
+    return join(venv_path, 'bin', 'python')
+
+
+def install_requirements(venv_path, requirements_path, wheelhouse):
+    """
+    Install a requirements file into a virtual environment without network
+    access, from the wheels of a local wheelhouse
+    :param venv_path: The path of the virtual environment
+    :param requirements_path: The path of the requirements.txt
+    :param wheelhouse: The directory holding .whl files
+    :return: Seconds spent installing
+    """
+
+    import subprocess
+
+    start = time.perf_counter()
+    index = import_wheelhouse(wheelhouse)
+
+    command = [venv_python(venv_path), '-m', 'pip', 'install', '--no-index',
+               '--find-links', index, '--disable-pip-version-check', '-q',
+               '-r', requirements_path]
+    logger.debug("[-] Installing requirements : {}".format(command))
+    subprocess.check_output(command, stderr=subprocess.STDOUT)
+
+    return time.perf_counter() - start